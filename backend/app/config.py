@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # App settings
@@ -20,16 +20,104 @@ class Settings(BaseSettings):
     # Which AI provider to use
     ai_provider: str = "gemini"  # "openai", "claude", or "gemini"
     
+    # MCP metrics server sessions kept warm for chat
+    mcp_transport: str = "stdio"  # "stdio" (subprocess) or "inprocess" (served from live memory)
+    mcp_pool_size: int = 2
+    mcp_health_check_interval_seconds: float = 30
+    
+    # Chat tool loop: rounds of tool calls per question, and the time limit for each round
+    chat_max_tool_rounds: int = 4
+    chat_tool_round_timeout_seconds: float = 15
+    
     # Kafka settings
     kafka_bootstrap_servers: str = "localhost:9092"
     kafka_auto_offset_reset: str = "earliest"
     
+    # Kafka consumer settings
+    kafka_max_poll_records: int = 2000
+    kafka_fetch_min_bytes: int = 1024  # Let the broker gather a batch...
+    kafka_fetch_max_wait_ms: int = 100  # ...for at most this long
+    kafka_consumer_workers: int = 4  # Partitions of one poll handled in parallel
+    kafka_consumer_commit_timeout_seconds: float = 5  # Wait on shutdown for the writer to flush committed batches
+    
+    # Kafka producer settings
+    kafka_async_emit: bool = True  # Queue telemetry and send from a background thread
+    kafka_emit_queue_size: int = 10000
+    kafka_emit_max_batch: int = 500
+    kafka_backpressure_threshold: float = 0.8  # Queue fill ratio counted as backpressure
+    kafka_producer_acks: str = "1"  # "0", "1" or "all"; telemetry only, synchronous sends always use "all"
+    kafka_linger_ms: int = 20
+    kafka_batch_size: int = 65536
+    kafka_compression_type: Optional[str] = "gzip"  # None, "gzip", "snappy", "lz4"
+    kafka_wire_format: str = "json"  # "json" or "msgpack-v1" (api-metrics and system-metrics only)
+    
     # Database settings (optional for now)
     database_url: Optional[str] = None
+    db_writer_batch_rows: int = 5000  # Flush a topic once this many rows are buffered
+    db_writer_flush_interval_ms: int = 250  # ...or at least this often
+    db_writer_max_flush_attempts: int = 5  # Failed flushes are retried on that interval, then dropped
+    
+    # Production SQLite mode: WAL, one serialized writer connection, read-only reader pool
+    sqlite_production_mode: bool = False
+    sqlite_mmap_size: int = 268435456  # 256 MB
+    sqlite_cache_size_kb: int = 65536
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 8
+    
+    # Retention: raw api_metrics rows older than this are deleted in batches (0 keeps them
+    # forever); rollups keep long-window queries answerable after raw rows are gone
+    raw_retention_hours: float = 48
+    # System metrics and error logs have no rollups, so they are kept unless set here
+    system_metrics_retention_hours: float = 0
+    error_log_retention_hours: float = 0
+    rollup_1m_retention_days: float = 7
+    rollup_5m_retention_days: float = 30
+    rollup_1h_retention_days: float = 365
+    retention_interval_seconds: int = 300
+    rollup_query_min_hours: float = 6  # MCP summaries read rollups for windows at least this long
+    
+    # Historical series: responses never exceed this many points; LTTB reads at most
+    # this many raw rows before pre-averaging them in SQL
+    series_max_points: int = 2000
+    series_lttb_max_input_points: int = 100000
+    
+    # Memory snapshots: the live windows and the Kafka offsets they reflect are written
+    # periodically; restarts load a snapshot younger than the max age instead of the database
+    memory_snapshot_enabled: bool = True
+    memory_snapshot_interval_seconds: float = 30
+    memory_snapshot_max_age_seconds: float = 900
+    
+    # Items API: paged lists (with limit or cursor) default to and are capped at these
+    # sizes; unpaged lists and NDJSON exports read this many rows per keyset query
+    items_page_size: int = 100
+    items_max_page_size: int = 1000
+    items_export_batch_size: int = 1000
+    
+    # Item cache: serialized GET /api/v1/items/{id} responses, invalidated on writes
+    item_cache_enabled: bool = True
+    item_cache_max_entries: int = 10000
+    item_cache_ttl_seconds: float = 60
     
     # Metrics settings
     collect_metrics: bool = True
-    metrics_sample_rate: float = 1.0
+    metrics_sample_rate: float = 1.0  # Share of ordinary requests sent; errors and slow ones always are
+    metrics_max_routes: int = 200  # Distinct paths tracked before new ones share an overflow bucket
+    metrics_preaggregate: bool = False  # Emit per-route summaries instead of one event per request
+    metrics_aggregate_interval_seconds: float = 1.0
+    metrics_outlier_threshold_ms: float = 1000  # Slower requests are always sent individually
+    metrics_route_outlier_thresholds_ms: Dict[str, float] = {}  # Per-route overrides, by route template
+    metrics_adaptive_sampling: bool = False  # Lower the sample rate when events exceed the budget
+    metrics_event_budget_per_second: float = 500
+    
+    # System metrics: sampled off the event loop every sample interval, emitted as one
+    # aggregate (averages, max event-loop lag, IO rates) every emit interval
+    system_metrics_sample_interval_seconds: float = 1.0
+    system_metrics_emit_interval_seconds: float = 30.0
+    
+    # Dashboard snapshots: rebuilt at most once per interval when data changed,
+    # and at least every max age (window eviction changes them without writes)
+    dashboard_snapshot_interval_ms: int = 1000
+    dashboard_snapshot_max_age_seconds: float = 10
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from app.models.database import Base
 from app.config import settings
+from app.database.sqlite_tuning import apply_sqlite_pragmas
 import os
 from pathlib import Path
 
@@ -31,6 +33,33 @@ async_engine = create_async_engine(
     connect_args={"check_same_thread": False}
 )
 
+if settings.sqlite_production_mode:
+    apply_sqlite_pragmas(sync_engine)
+    apply_sqlite_pragmas(async_engine.sync_engine)
+    
+    # All metric writes share one connection, so writers queue here instead of on SQLite locks
+    writer_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0
+    )
+    apply_sqlite_pragmas(writer_engine)
+    
+    # Dashboards and history queries read through read-only connections
+    read_engine = create_engine(
+        f"sqlite:///file:{db_path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0
+    )
+    apply_sqlite_pragmas(read_engine, read_only=True)
+else:
+    writer_engine = sync_engine
+    read_engine = sync_engine
+
 # Session makers
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
@@ -39,6 +68,8 @@ def create_tables():
     """Create all database tables"""
     try:
         Base.metadata.create_all(bind=sync_engine)
+        add_missing_columns()
+        add_missing_indexes()
         print(f"Database tables created successfully at {db_path}")
     except Exception as e:
         print(f"Error creating database tables: {e}")
@@ -48,6 +79,27 @@ def create_tables():
         print(f"Directory permissions: {oct(os.stat(data_dir).st_mode)}")
         raise
 
+def add_missing_columns():
+    """Add model columns that existing tables predate (create_all never alters tables)"""
+    inspector = inspect(sync_engine)
+    with sync_engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=sync_engine.dialect)
+                default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+                print(f"Added column {table.name}.{column.name}")
+
+def add_missing_indexes():
+    """Create model indexes that existing tables predate"""
+    with sync_engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
 async def get_async_session():
     """Get async database session"""
     async with AsyncSessionLocal() as session:
@@ -1,5 +1,7 @@
 import logging
 import asyncio
+import time
+import psutil
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -10,7 +12,11 @@ from app.routers.chat import chat as chat_router
 from app.middleware.metrics_middleware import MetricsMiddleware
 from app.services.kafka_consumer import kafka_consumer_service
 from app.services.message_handler import message_handler
-from app.services.metrics_service import metrics_service
+from app.services.kafka_service import kafka_service
+from app.services.metrics_aggregator import metrics_aggregator
+from app.services.memory_snapshots import memory_snapshotter
+from app.services.system_collector import system_collector
+from app.services.chat_service import chat_service
 from app.database.connection import create_tables
 
 # Configure logging
@@ -18,43 +24,77 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-
-async def emit_system_metrics():
-    """Emit system metrics every 30 seconds"""
-    while True:
-        try:
-            metrics_service.send_system_metrics()
-            await asyncio.sleep(60)  # 30 second interval
-        except Exception as e:
-            print(f"Error emitting system metrics: {e}")
-            await asyncio.sleep(60)
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Everything before this point (interpreter start and module imports) is import time;
+    # `python -m benchmarks.startup_profile` breaks it down per module
+    startup_started = time.perf_counter()
+    import_seconds = time.time() - psutil.Process().create_time()
+    
     # Startup: Create database tables and start Kafka consumers
     create_tables()
     
+    # Services connect and start their threads here rather than at import
+    kafka_service.start()
+    message_handler.start()
+    
+    # Load the live windows from the last snapshot (or the database), then have
+    # consumers catch up from the offsets that snapshot reflects
+    start_offsets = memory_snapshotter.restore()
+    
     # Start Kafka consumers with message handler
     kafka_consumer_service.start_consumer(
         topics=["api-metrics", "system-metrics", "api-errors"],
         group_id="backend-consumer",
-        message_handler=message_handler.handle_kafka_message
+        batch_handler=message_handler.handle_kafka_batch,
+        decoders=message_handler.decoders,
+        replay_handler=message_handler.handle_replay_batch,
+        persist_handler=message_handler.handle_persist_batch,
+        start_offsets=start_offsets,
+        write_barrier=message_handler.db_writer
     )
     
     kafka_consumer_service.start_consumer(
         topics=["ui-errors"],
         group_id="frontend-consumer", 
-        message_handler=message_handler.handle_kafka_message
+        batch_handler=message_handler.handle_kafka_batch,
+        decoders=message_handler.decoders,
+        replay_handler=message_handler.handle_replay_batch,
+        persist_handler=message_handler.handle_persist_batch,
+        start_offsets=start_offsets,
+        write_barrier=message_handler.db_writer
     )
+    memory_snapshotter.start()
+    
+    # Sample system metrics on a background thread; it also measures this loop's lag
+    system_collector.start(asyncio.get_running_loop())
+    
+    # Flush per-route API metric summaries when pre-aggregation is on
+    if settings.metrics_preaggregate:
+        metrics_aggregator.start()
     
-    # Start system metrics emission
-    asyncio.create_task(emit_system_metrics())
+    # Warm up MCP sessions for the chat assistant
+    await chat_service.start()
+    
+    logger.info(
+        f"Startup complete: {import_seconds:.2f}s to import, "
+        f"{time.perf_counter() - startup_started:.2f}s in lifespan"
+    )
     
     yield
     
-    # Shutdown: Stop Kafka consumers and flush remaining batches
-    message_handler.flush_all_batches()
+    await chat_service.stop()
+    
+    # Shutdown: consumers stop (finishing their in-flight batches) before the writer
+    # drains, so no batch arrives after the last flush; the final snapshot comes last
+    system_collector.stop()
+    metrics_aggregator.stop()
     kafka_consumer_service.stop_all_consumers()
+    message_handler.flush_all_batches()
+    memory_snapshotter.stop()
+    kafka_service.close()
 
 app = FastAPI(
     title=settings.app_name,
@@ -73,6 +113,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -1,3 +1,8 @@
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
 from fastmcp import FastMCP
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
@@ -10,46 +15,107 @@ mcp = FastMCP("AppPulse Metrics Server")
 # Database setup
 project_root = Path(__file__).resolve().parent.parent.parent
 db_path = project_root / "data" / "pulse.db"
-engine = create_engine(f"sqlite:///{db_path}")
 
-@mcp.tool()
-def get_api_metrics_summary(hours: int = 24) -> dict[str, Any]:
+# Run as a standalone script, so make the app package importable
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.config import settings
+from app.database.sqlite_tuning import apply_sqlite_pragmas
+from app.services.latency_sketch import LatencySketch
+from app.services.rollups import LATENCY_BUCKET_COLUMNS, choose_rollup_resolution, histogram_quantiles
+
+if settings.sqlite_production_mode:
+    # Read-only connections so assistant queries never take the write lock
+    engine = create_engine(
+        f"sqlite:///file:{db_path}?mode=ro&uri=true",
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0
+    )
+    apply_sqlite_pragmas(engine, read_only=True)
+else:
+    engine = create_engine(f"sqlite:///{db_path}")
+
+# Set when the server is mounted inside the backend; recent windows are then
+# answered from the live in-memory aggregates instead of SQLite
+live_storage = None
+
+def attach_live_storage(storage, db_engine=None):
+    """Serve recent windows from a MemoryStorage (and optionally share the app's engine)"""
+    global live_storage, engine
+    live_storage = storage
+    if db_engine is not None:
+        engine = db_engine
+
+def live_covers(window_name: str, hours: int) -> bool:
+    """Check whether a live in-memory window holds the whole requested range"""
+    if live_storage is None:
+        return False
+    return hours * 3600 <= getattr(live_storage, window_name).max_age_seconds
+
+def use_rollups(hours: int) -> bool:
+    """Long windows read pre-aggregated rollups instead of scanning raw rows"""
+    return hours >= settings.rollup_query_min_hours
+
+def raw_expired(hours: int) -> bool:
+    """Check whether raw api_metrics rows for the range may have been deleted"""
+    return 0 < settings.raw_retention_hours < hours
+
+# Paths past settings.metrics_max_routes share an overflow sketch
+OVERFLOW_PATH = "__overflow__"
+
+def _db_get_api_metrics_summary(hours: int = 24) -> dict[str, Any]:
     """Get comprehensive API metrics including request counts, response times, and success rates"""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
     
     with engine.connect() as conn:
-        query = text("""
-            SELECT 
-                COUNT(*) as total_requests,
-                AVG(response_time_ms) as avg_response_time,
-                COUNT(*) FILTER (WHERE success = 1) as successful_requests,
-                COUNT(*) FILTER (WHERE success = 0) as failed_requests,
-                MIN(response_time_ms) as min_response_time,
-                MAX(response_time_ms) as max_response_time,
-                COUNT(DISTINCT path) as unique_endpoints
-            FROM api_metrics 
-            WHERE timestamp >= :cutoff_time
-        """)
+        if use_rollups(hours):
+            query = text("""
+                SELECT 
+                    SUM(request_count) as total_requests,
+                    SUM(response_time_sum) / SUM(request_count) as avg_response_time,
+                    SUM(request_count) - SUM(error_count) as successful_requests,
+                    SUM(error_count) as failed_requests,
+                    MIN(response_time_min) as min_response_time,
+                    MAX(response_time_max) as max_response_time,
+                    COUNT(DISTINCT path) as unique_endpoints
+                FROM api_metric_rollups 
+                WHERE resolution_seconds = :resolution AND bucket_start >= :cutoff_time
+            """)
+            params = {"cutoff_time": cutoff_time, "resolution": choose_rollup_resolution(hours)}
+        else:
+            query = text("""
+                SELECT 
+                    SUM(COALESCE(weight, 1)) as total_requests,
+                    SUM(response_time_ms * COALESCE(weight, 1)) / SUM(COALESCE(weight, 1)) as avg_response_time,
+                    SUM(COALESCE(weight, 1)) FILTER (WHERE success = 1) as successful_requests,
+                    SUM(COALESCE(weight, 1)) FILTER (WHERE success = 0) as failed_requests,
+                    MIN(COALESCE(response_time_min, response_time_ms)) as min_response_time,
+                    MAX(COALESCE(response_time_max, response_time_ms)) as max_response_time,
+                    COUNT(DISTINCT path) as unique_endpoints
+                FROM api_metrics 
+                WHERE timestamp >= :cutoff_time
+            """)
+            params = {"cutoff_time": cutoff_time}
         
-        result = conn.execute(query, {"cutoff_time": cutoff_time}).fetchone()
+        result = conn.execute(query, params).fetchone()
         
         total = result[0] if result[0] else 0
         success_rate = (result[2] / total * 100) if total > 0 else 0
         
         return {
-            "total_requests": total,
+            "total_requests": round(total),
             "avg_response_time_ms": round(result[1], 2) if result[1] else 0,
             "success_rate_percent": round(success_rate, 2),
-            "successful_requests": result[2] or 0,
-            "failed_requests": result[3] or 0,
+            "successful_requests": round(result[2] or 0),
+            "failed_requests": round(result[3] or 0),
             "min_response_time_ms": result[4] or 0,
             "max_response_time_ms": result[5] or 0,
             "unique_endpoints": result[6] or 0,
             "time_period_hours": hours
         }
 
-@mcp.tool()
-def get_system_metrics_summary(hours: int = 24) -> dict[str, Any]:
+def _db_get_system_metrics_summary(hours: int = 24) -> dict[str, Any]:
     """Get system health metrics including CPU, memory, and disk usage"""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
     
@@ -61,7 +127,10 @@ def get_system_metrics_summary(hours: int = 24) -> dict[str, Any]:
                 AVG(memory_percent) as avg_memory,
                 MAX(memory_percent) as max_memory,
                 AVG(disk_usage) as avg_disk,
-                COUNT(*) as data_points
+                COUNT(*) as data_points,
+                AVG(event_loop_lag_ms) as avg_loop_lag,
+                MAX(event_loop_lag_max_ms) as max_loop_lag,
+                MAX(process_threads) as max_threads
             FROM system_metrics 
             WHERE timestamp >= :cutoff_time
         """)
@@ -75,11 +144,14 @@ def get_system_metrics_summary(hours: int = 24) -> dict[str, Any]:
             "max_memory_percent": round(result[3], 2) if result[3] else 0,
             "avg_disk_usage_percent": round(result[4], 2) if result[4] else 0,
             "data_points": result[5] or 0,
+            # Only set by collector readings
+            "avg_event_loop_lag_ms": round(result[6], 2) if result[6] is not None else None,
+            "max_event_loop_lag_ms": round(result[7], 2) if result[7] is not None else None,
+            "max_process_threads": result[8],
             "time_period_hours": hours
         }
 
-@mcp.tool()
-def get_error_analysis(hours: int = 24) -> dict[str, Any]:
+def _db_get_error_analysis(hours: int = 24) -> dict[str, Any]:
     """Analyze API and UI errors, get error counts and types"""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
     
@@ -114,40 +186,270 @@ def get_error_analysis(hours: int = 24) -> dict[str, Any]:
             "time_period_hours": hours
         }
 
-@mcp.tool()
-def get_performance_trends(hours: int = 24) -> dict[str, Any]:
+def _db_get_performance_trends(hours: int = 24) -> dict[str, Any]:
     """Get performance trends and identify bottlenecks"""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
     
     with engine.connect() as conn:
-        query = text("""
-            SELECT 
-                path,
-                COUNT(*) as request_count,
-                AVG(response_time_ms) as avg_response_time,
-                MAX(response_time_ms) as max_response_time,
-                COUNT(*) FILTER (WHERE success = 0) as error_count
-            FROM api_metrics 
-            WHERE timestamp >= :cutoff_time
-            GROUP BY path
-            ORDER BY avg_response_time DESC
-            LIMIT 10
-        """)
+        if use_rollups(hours):
+            query = text("""
+                SELECT 
+                    path,
+                    SUM(request_count) as request_count,
+                    SUM(response_time_sum) / SUM(request_count) as avg_response_time,
+                    MAX(response_time_max) as max_response_time,
+                    SUM(error_count) as error_count
+                FROM api_metric_rollups 
+                WHERE resolution_seconds = :resolution AND bucket_start >= :cutoff_time
+                GROUP BY path
+                ORDER BY avg_response_time DESC
+                LIMIT 10
+            """)
+            params = {"cutoff_time": cutoff_time, "resolution": choose_rollup_resolution(hours)}
+        else:
+            query = text("""
+                SELECT 
+                    path,
+                    SUM(COALESCE(weight, 1)) as request_count,
+                    SUM(response_time_ms * COALESCE(weight, 1)) / SUM(COALESCE(weight, 1)) as avg_response_time,
+                    MAX(COALESCE(response_time_max, response_time_ms)) as max_response_time,
+                    COALESCE(SUM(COALESCE(weight, 1)) FILTER (WHERE success = 0), 0) as error_count
+                FROM api_metrics 
+                WHERE timestamp >= :cutoff_time
+                GROUP BY path
+                ORDER BY avg_response_time DESC
+                LIMIT 10
+            """)
+            params = {"cutoff_time": cutoff_time}
         
-        results = conn.execute(query, {"cutoff_time": cutoff_time}).fetchall()
+        results = conn.execute(query, params).fetchall()
         
         return {
             "slowest_endpoints": [
                 {
                     "path": row[0],
-                    "request_count": row[1],
+                    "request_count": round(row[1]),
                     "avg_response_time_ms": round(row[2], 2),
                     "max_response_time_ms": round(row[3], 2),
-                    "error_count": row[4]
+                    "error_count": round(row[4])
                 } for row in results
             ],
             "time_period_hours": hours
         }
 
+def _db_get_latency_percentiles(hours: int = 24) -> dict[str, Any]:
+    """Get p50/p90/p99/p999 response times overall and for each endpoint"""
+    if raw_expired(hours):
+        return _rollup_latency_percentiles(hours)
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    
+    overall = LatencySketch()
+    endpoints: dict[str, LatencySketch] = {}
+    
+    with engine.connect() as conn:
+        query = text("""
+            SELECT path, response_time_ms, COALESCE(weight, 1), latency_bins
+            FROM api_metrics 
+            WHERE timestamp >= :cutoff_time
+        """)
+        
+        # Stream rows into bounded-size sketches instead of sorting them
+        result = conn.execution_options(stream_results=True).execute(query, {"cutoff_time": cutoff_time})
+        for path, response_time_ms, weight, latency_bins in result:
+            if response_time_ms is None:
+                continue
+            sketch = endpoints.get(path)
+            if sketch is None:
+                if len(endpoints) >= settings.metrics_max_routes:
+                    path = OVERFLOW_PATH
+                sketch = endpoints.setdefault(path, LatencySketch())
+            if latency_bins:
+                # Summary rows merge their distribution rather than their mean
+                bins = json.loads(latency_bins)
+                latency = LatencySketch.from_bins(bins, max(weight - sum(bins.values()), 0))
+                overall.merge(latency)
+                sketch.merge(latency)
+            else:
+                overall.add(response_time_ms, weight)
+                sketch.add(response_time_ms, weight)
+    
+    endpoint_summaries = [{"path": path, **sketch.summary()} for path, sketch in endpoints.items()]
+    endpoint_summaries.sort(key=lambda e: e["p99"] or 0, reverse=True)
+    
+    return {
+        "overall_ms": overall.summary(),
+        "slowest_endpoints_by_p99_ms": endpoint_summaries[:10],
+        "time_period_hours": hours
+    }
+
+def _rollup_latency_percentiles(hours: int) -> dict[str, Any]:
+    """Percentiles from the rollup latency histograms, for ranges past raw retention"""
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    bucket_sums = ", ".join(f"SUM({column})" for column in LATENCY_BUCKET_COLUMNS)
+    
+    with engine.connect() as conn:
+        query = text(f"""
+            SELECT path, MIN(response_time_min), MAX(response_time_max), {bucket_sums}
+            FROM api_metric_rollups
+            WHERE resolution_seconds = :resolution AND bucket_start >= :cutoff_time
+            GROUP BY path
+        """)
+        rows = conn.execute(query, {"cutoff_time": cutoff_time, "resolution": choose_rollup_resolution(hours)}).fetchall()
+    
+    # path -> [min, max, bucket counts]
+    histograms: dict[str, list] = {}
+    for path, minimum, maximum, *buckets in rows:
+        if path not in histograms and len(histograms) >= settings.metrics_max_routes:
+            path = OVERFLOW_PATH
+        histograms[path] = _merge_histogram(histograms.get(path), minimum, maximum, buckets)
+    overall = None
+    for histogram in histograms.values():
+        overall = _merge_histogram(overall, *histogram)
+    
+    def summary(histogram) -> dict[str, Any]:
+        minimum, maximum, buckets = histogram
+        p50, p90, p99, p999 = histogram_quantiles(buckets, minimum, maximum, [0.5, 0.9, 0.99, 0.999])
+        return {
+            "count": round(sum(buckets)),
+            "p50": round(p50, 2) if p50 is not None else None,
+            "p90": round(p90, 2) if p90 is not None else None,
+            "p99": round(p99, 2) if p99 is not None else None,
+            "p999": round(p999, 2) if p999 is not None else None
+        }
+    
+    endpoint_summaries = [{"path": path, **summary(histogram)} for path, histogram in histograms.items()]
+    endpoint_summaries.sort(key=lambda e: e["p99"] or 0, reverse=True)
+    
+    return {
+        "overall_ms": summary(overall) if overall else LatencySketch().summary(),
+        "slowest_endpoints_by_p99_ms": endpoint_summaries[:10],
+        "time_period_hours": hours,
+        # Bucketed counts give coarser percentiles than the raw-row sketches
+        "data_source": "rollups"
+    }
+
+def _merge_histogram(histogram, minimum: float, maximum: float, buckets) -> list:
+    if histogram is None:
+        return [minimum, maximum, list(buckets)]
+    return [min(histogram[0], minimum), max(histogram[1], maximum), [a + b for a, b in zip(histogram[2], buckets)]]
+
+def _live_api_metrics_summary(hours: int) -> dict[str, Any]:
+    summary = live_storage.api_metrics.summarize_since(time.time() - hours * 3600)
+    total = summary["count"]
+    successful = summary["success"]
+    
+    return {
+        "total_requests": round(total),
+        "avg_response_time_ms": round(summary["response_time_sum"] / total, 2) if total else 0,
+        "success_rate_percent": round(successful / total * 100, 2) if total else 0,
+        "successful_requests": round(successful),
+        "failed_requests": round(total - successful),
+        "min_response_time_ms": round(summary["response_time_min"], 2) if total else 0,
+        "max_response_time_ms": round(summary["response_time_max"], 2) if total else 0,
+        "unique_endpoints": len(summary["paths"]),
+        "time_period_hours": hours,
+        "data_source": "memory"
+    }
+
+def _live_system_metrics_summary(hours: int) -> dict[str, Any]:
+    metrics = [item.get('data', {}) for item in live_storage.system_metrics.get_since(time.time() - hours * 3600)]
+    cpu_values = [m.get('cpu_percent') or 0 for m in metrics]
+    memory_values = [m.get('memory_percent') or 0 for m in metrics]
+    disk_values = [m.get('disk_usage') or 0 for m in metrics]
+    lag_values = [m['event_loop_lag_ms'] for m in metrics if m.get('event_loop_lag_ms') is not None]
+    lag_max_values = [m['event_loop_lag_max_ms'] for m in metrics if m.get('event_loop_lag_max_ms') is not None]
+    thread_values = [m['process_threads'] for m in metrics if m.get('process_threads') is not None]
+    
+    return {
+        "avg_cpu_percent": round(sum(cpu_values) / len(cpu_values), 2) if cpu_values else 0,
+        "max_cpu_percent": round(max(cpu_values), 2) if cpu_values else 0,
+        "avg_memory_percent": round(sum(memory_values) / len(memory_values), 2) if memory_values else 0,
+        "max_memory_percent": round(max(memory_values), 2) if memory_values else 0,
+        "avg_disk_usage_percent": round(sum(disk_values) / len(disk_values), 2) if disk_values else 0,
+        "data_points": len(metrics),
+        "avg_event_loop_lag_ms": round(sum(lag_values) / len(lag_values), 2) if lag_values else None,
+        "max_event_loop_lag_ms": round(max(lag_max_values), 2) if lag_max_values else None,
+        "max_process_threads": max(thread_values) if thread_values else None,
+        "time_period_hours": hours,
+        "data_source": "memory"
+    }
+
+def _live_error_analysis(hours: int) -> dict[str, Any]:
+    cutoff = time.time() - hours * 3600
+    api_counts = Counter(item.get('data', {}).get('error_type') for item in live_storage.api_errors.get_since(cutoff))
+    ui_counts = Counter(item.get('data', {}).get('error_type') for item in live_storage.ui_errors.get_since(cutoff))
+    
+    return {
+        "total_api_errors": sum(api_counts.values()),
+        "api_error_types": [{"type": t, "count": c} for t, c in api_counts.most_common()],
+        "total_ui_errors": sum(ui_counts.values()),
+        "ui_error_types": [{"type": t, "count": c} for t, c in ui_counts.most_common()],
+        "time_period_hours": hours,
+        "data_source": "memory"
+    }
+
+def _live_performance_trends(hours: int) -> dict[str, Any]:
+    summary = live_storage.api_metrics.summarize_since(time.time() - hours * 3600)
+    endpoints = [
+        {
+            "path": path,
+            "request_count": round(stats["count"]),
+            "avg_response_time_ms": round(stats["response_time_sum"] / stats["count"], 2),
+            "max_response_time_ms": round(stats["response_time_max"], 2),
+            "error_count": round(stats["errors"])
+        } for path, stats in summary["paths"].items()
+    ]
+    endpoints.sort(key=lambda e: e["avg_response_time_ms"], reverse=True)
+    
+    return {
+        "slowest_endpoints": endpoints[:10],
+        "time_period_hours": hours,
+        "data_source": "memory"
+    }
+
+def _live_latency_percentiles(hours: int) -> dict[str, Any]:
+    percentiles = live_storage.get_latency_percentiles(window_minutes=hours * 60)
+    
+    return {
+        "overall_ms": percentiles["overall"],
+        "slowest_endpoints_by_p99_ms": percentiles["endpoints"][:10],
+        "time_period_hours": hours,
+        "data_source": "memory"
+    }
+
+# Tools answer from memory when the live window covers the range and fall back
+# to SQLite otherwise. Both paths scan rows (the live one under the ingest lock),
+# so they run off the event loop and an in-process server never blocks it
+
+@mcp.tool()
+async def get_api_metrics_summary(hours: int = 24) -> dict[str, Any]:
+    """Get comprehensive API metrics including request counts, response times, and success rates"""
+    summarize = _live_api_metrics_summary if live_covers("api_metrics", hours) else _db_get_api_metrics_summary
+    return await asyncio.to_thread(summarize, hours)
+
+@mcp.tool()
+async def get_system_metrics_summary(hours: int = 24) -> dict[str, Any]:
+    """Get system health metrics including CPU, memory, disk usage and event-loop lag"""
+    summarize = _live_system_metrics_summary if live_covers("system_metrics", hours) else _db_get_system_metrics_summary
+    return await asyncio.to_thread(summarize, hours)
+
+@mcp.tool()
+async def get_error_analysis(hours: int = 24) -> dict[str, Any]:
+    """Analyze API and UI errors, get error counts and types"""
+    summarize = _live_error_analysis if live_covers("api_errors", hours) and live_covers("ui_errors", hours) else _db_get_error_analysis
+    return await asyncio.to_thread(summarize, hours)
+
+@mcp.tool()
+async def get_performance_trends(hours: int = 24) -> dict[str, Any]:
+    """Get performance trends and identify bottlenecks"""
+    summarize = _live_performance_trends if live_covers("api_metrics", hours) else _db_get_performance_trends
+    return await asyncio.to_thread(summarize, hours)
+
+@mcp.tool()
+async def get_latency_percentiles(hours: int = 24) -> dict[str, Any]:
+    """Get p50/p90/p99/p999 response times overall and for each endpoint"""
+    summarize = _live_latency_percentiles if live_covers("api_metrics", hours) else _db_get_latency_percentiles
+    return await asyncio.to_thread(summarize, hours)
+
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
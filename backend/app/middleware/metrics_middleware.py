@@ -1,77 +1,97 @@
+import asyncio
 import time
 import logging
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Any, Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.services.metrics_service import metrics_service
+from app.services.metrics_aggregator import metrics_aggregator
+from app.services.metrics_sampler import metrics_sampler
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Only collect metrics for /api/v1 endpoints
-        if not request.url.path.startswith("/api/v1"):
-            return await call_next(request)
+UNMATCHED_ROUTE = "__unmatched__"
+
+def get_route_template(scope: Dict[str, Any]) -> str:
+    """Get the matched route template (e.g. /api/v1/items/{item_id}) for a request scope"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    # Unmatched URLs are unbounded, so they share one key
+    return path or UNMATCHED_ROUTE
+
+def record_request(method: str, route_path: str, status_code: int, process_time: float,
+                   raw_path: str, exception: Optional[Exception] = None):
+    """Hand one finished request (process_time in seconds) to the telemetry pipeline"""
+    if exception is None and settings.metrics_preaggregate and not metrics_sampler.is_tail(route_path, status_code, process_time):
+        # Folded into the route's next summary event
+        metrics_aggregator.add(method, route_path, status_code, process_time)
+    else:
+        # Errors, exceptions and slow requests are always kept; the rest are sampled
+        weight = 1.0 if exception is not None else metrics_sampler.sample(route_path, status_code, process_time)
+        if weight is not None:
+            metrics_service.send_api_metrics(
+                method=method,
+                path=route_path,
+                status_code=status_code,
+                response_time=process_time,
+                weight=weight
+            )
+    
+    if status_code >= 400 or exception is not None:
+        metrics_service.send_api_error(
+            method=method,
+            path=route_path,
+            status_code=status_code,
+            response_time=process_time,
+            exception=exception,
+            raw_path=raw_path
+        )
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing /api/v1 requests until the last response body chunk is sent"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Only collect metrics for /api/v1 endpoints, and only when enabled
+        if scope["type"] != "http" or not settings.collect_metrics or not scope["path"].startswith("/api/v1"):
+            await self.app(scope, receive, send)
+            return
         
-        # Skip if metrics collection is disabled
-        if not settings.collect_metrics:
-            return await call_next(request)
+        # The scope arrives with the request head, i.e. when the first receive is available
+        start_ns = time.perf_counter_ns()
+        end_ns = 0
+        status_code = 500
         
-        # Record start time
-        start_time = time.time()
+        async def send_wrapper(message: Message):
+            nonlocal status_code, end_ns
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Streaming bodies are timed to their final chunk, not to the headers
+                end_ns = time.perf_counter_ns()
         
-        # Process the request
         try:
-            response = await call_next(request)
-            
-            # Calculate response time
-            process_time = time.time() - start_time
-            
-            # Send metrics to Kafka
-            metrics_service.send_api_metrics(
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
-                response_time=process_time
-            )
-            
-            # Send API error if status code >= 400
-            if response.status_code >= 400:
-                metrics_service.send_api_error(
-                    method=request.method,
-                    path=request.url.path,
-                    status_code=response.status_code,
-                    response_time=process_time
-                )
-            
-            # Add response time header for debugging
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Handle errors and still send metrics
-            process_time = time.time() - start_time
-            
-            # Send error metrics
-            metrics_service.send_api_metrics(
-                method=request.method,
-                path=request.url.path,
-                status_code=500,
-                response_time=process_time
-            )
-            
-            # Send API error
-            metrics_service.send_api_error(
-                method=request.method,
-                path=request.url.path,
-                status_code=500,
-                response_time=process_time,
-                exception=e
-            )
-            
-            # Log the error
-            logger.error(f"Error processing request {request.method} {request.url.path}: {e}")
-            
-            # Re-raise the exception
-            raise e
\ No newline at end of file
+            process_time = ((end_ns or time.perf_counter_ns()) - start_ns) / 1e9
+            self._record(scope, status_code, process_time, e)
+            logger.error(f"Error processing request {scope['method']} {scope['path']}: {e}")
+            raise
+        
+        process_time = ((end_ns or time.perf_counter_ns()) - start_ns) / 1e9
+        self._record(scope, status_code, process_time)
+    
+    def _record(self, scope: Scope, status_code: int, process_time: float, exception: Optional[Exception] = None):
+        """Record without awaiting I/O: the async emit path only enqueues"""
+        args = (scope["method"], get_route_template(scope), status_code, process_time, scope["path"], exception)
+        try:
+            if settings.kafka_async_emit:
+                record_request(*args)
+            else:
+                # Synchronous sends wait on the broker, so keep them off the event loop
+                asyncio.get_running_loop().run_in_executor(None, record_request, *args)
+        except Exception as e:
+            logger.error(f"Error recording metrics for {scope['path']}: {e}")
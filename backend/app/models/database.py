@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -7,6 +7,13 @@ Base = declarative_base()
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # Keyset listing: each filter/order combination walks an index in order
+        Index("ix_items_category_id", "category", "id"),
+        Index("ix_items_updated_at_id", "updated_at", "id"),
+        Index("ix_items_category_updated_at_id", "category", "updated_at", "id"),
+        Index("ix_items_price_id", "price", "id"),  # Price-range filters
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
@@ -18,6 +25,9 @@ class Item(Base):
 
 class APIMetric(Base):
     __tablename__ = "api_metrics"
+    __table_args__ = (
+        Index("ix_api_metrics_path_timestamp", "path", "timestamp"),  # Per-route range queries
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
@@ -26,6 +36,40 @@ class APIMetric(Base):
     status_code = Column(Integer)
     response_time_ms = Column(Float)
     success = Column(Boolean)
+    weight = Column(Float, default=1.0, server_default="1")  # Requests the row stands for
+    # Summary rows keep their spread (response_time_ms is their mean); empty for single requests
+    response_time_min = Column(Float)
+    response_time_max = Column(Float)
+    latency_bins = Column(Text)  # JSON LatencySketch bins
+
+class APIMetricRollup(Base):
+    __tablename__ = "api_metric_rollups"
+    __table_args__ = (
+        UniqueConstraint("resolution_seconds", "bucket_start", "path", name="uq_api_metric_rollup_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    resolution_seconds = Column(Integer, nullable=False)  # 60, 300 or 3600
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    path = Column(String(255))
+    # Counts are sums of sampling weights, so they can be fractional
+    request_count = Column(Float, default=0)
+    error_count = Column(Float, default=0)
+    response_time_sum = Column(Float, default=0.0)
+    response_time_min = Column(Float)
+    response_time_max = Column(Float)
+    # Latency histogram: requests per bucket by upper bound in ms (not cumulative)
+    bucket_le_5 = Column(Float, default=0)
+    bucket_le_10 = Column(Float, default=0)
+    bucket_le_25 = Column(Float, default=0)
+    bucket_le_50 = Column(Float, default=0)
+    bucket_le_100 = Column(Float, default=0)
+    bucket_le_250 = Column(Float, default=0)
+    bucket_le_500 = Column(Float, default=0)
+    bucket_le_1000 = Column(Float, default=0)
+    bucket_le_2500 = Column(Float, default=0)
+    bucket_le_5000 = Column(Float, default=0)
+    bucket_le_inf = Column(Float, default=0)
 
 class SystemMetric(Base):
     __tablename__ = "system_metrics"
@@ -36,6 +80,19 @@ class SystemMetric(Base):
     memory_percent = Column(Float)
     disk_usage = Column(Float)
     process_memory = Column(Float)
+    cpu_per_core = Column(Text, nullable=True)  # JSON list
+    event_loop_lag_ms = Column(Float, nullable=True)
+    event_loop_lag_max_ms = Column(Float, nullable=True)
+    process_threads = Column(Integer, nullable=True)
+    process_fds = Column(Integer, nullable=True)
+    gc_collections = Column(Integer, nullable=True)
+    gc_pause_ms = Column(Float, nullable=True)
+    disk_read_bytes_per_sec = Column(Float, nullable=True)
+    disk_write_bytes_per_sec = Column(Float, nullable=True)
+    net_sent_bytes_per_sec = Column(Float, nullable=True)
+    net_recv_bytes_per_sec = Column(Float, nullable=True)
+    emit_queue_depth = Column(Integer, nullable=True)
+    db_writer_queued_rows = Column(Integer, nullable=True)
 
 class APIError(Base):
     __tablename__ = "api_errors"
@@ -0,0 +1,214 @@
+import time
+import msgspec
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Union
+
+# Typed Kafka event schemas. Decoding straight into these structs skips the
+# intermediate dicts; unknown fields are ignored so producers can add fields, and
+# unset fields are left out when encoding.
+
+API_METRICS_SUMMARY_TYPE = "api_metrics_summary"
+
+class APIMetricData(msgspec.Struct, omit_defaults=True):
+    method: Optional[str] = None
+    path: Optional[str] = None
+    status_code: Optional[int] = None
+    response_time_ms: Optional[float] = None  # Mean latency for summaries
+    success: Optional[bool] = None
+    # Requests this event stands for (a summary's size, or a sample weight);
+    # summaries also carry their latency distribution as LatencySketch bins
+    count: float = 1.0
+    response_time_min: Optional[float] = None
+    response_time_max: Optional[float] = None
+    latency_bins: Optional[Dict[int, float]] = None
+    latency_zero_count: float = 0.0
+
+class APIMetricEvent(msgspec.Struct, omit_defaults=True):
+    timestamp: Union[str, float, None] = None  # ISO string, or epoch seconds from binary records
+    service: Optional[str] = None
+    type: Optional[str] = None
+    data: APIMetricData = msgspec.field(default_factory=APIMetricData)
+
+class SystemMetricData(msgspec.Struct, omit_defaults=True):
+    cpu_percent: Optional[float] = None
+    memory_percent: Optional[float] = None
+    disk_usage: Optional[float] = None
+    process_memory: Optional[float] = None
+    # From the off-loop collector; each is the aggregate over one emit interval
+    cpu_per_core: Optional[List[float]] = None
+    event_loop_lag_ms: Optional[float] = None
+    event_loop_lag_max_ms: Optional[float] = None
+    process_threads: Optional[int] = None
+    process_fds: Optional[int] = None
+    gc_collections: Optional[int] = None
+    gc_pause_ms: Optional[float] = None
+    disk_read_bytes_per_sec: Optional[float] = None
+    disk_write_bytes_per_sec: Optional[float] = None
+    net_sent_bytes_per_sec: Optional[float] = None
+    net_recv_bytes_per_sec: Optional[float] = None
+    emit_queue_depth: Optional[int] = None
+    db_writer_queued_rows: Optional[int] = None
+
+class SystemMetricEvent(msgspec.Struct, omit_defaults=True):
+    timestamp: Union[str, float, None] = None
+    service: Optional[str] = None
+    type: Optional[str] = None
+    data: SystemMetricData = msgspec.field(default_factory=SystemMetricData)
+
+class ErrorData(msgspec.Struct, omit_defaults=True):
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+    stack_trace: Optional[str] = None
+    user_id: Optional[str] = None
+    additional_data: Optional[Dict[str, Any]] = None
+
+class ErrorEvent(msgspec.Struct, omit_defaults=True):
+    timestamp: Optional[str] = None
+    service: Optional[str] = None
+    type: Optional[str] = None
+    data: ErrorData = msgspec.field(default_factory=ErrorData)
+
+# Binary wire format. Records carry a wire-format header naming the encoding and
+# its version; records without one are JSON. A layout may only gain trailing
+# fields with defaults; any other change gets a new version, so old records stay
+# readable.
+
+WIRE_FORMAT_HEADER = "wire-format"
+WIRE_FORMAT_JSON = "json"
+WIRE_FORMAT_MSGPACK_V1 = "msgpack-v1"
+
+def _to_epoch(timestamp: Union[str, float, None]) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if timestamp:
+        parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return time.time()
+
+class APIMetricRecordV1(msgspec.Struct, array_like=True, omit_defaults=True):
+    """api-metrics v1: positional msgpack array with an epoch timestamp"""
+    timestamp: float
+    method: Optional[str]
+    path: Optional[str]
+    status_code: Optional[int]
+    response_time_ms: Optional[float]
+    success: Optional[bool]
+    service: Optional[str] = None
+    count: float = 1.0  # Sample weight
+    
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "APIMetricRecordV1":
+        data = message.get("data") or {}
+        return cls(
+            _to_epoch(message.get("timestamp")),
+            data.get("method"),
+            data.get("path"),
+            data.get("status_code"),
+            data.get("response_time_ms"),
+            data.get("success"),
+            message.get("service"),
+            data.get("count", 1.0)
+        )
+    
+    def to_event(self) -> APIMetricEvent:
+        return APIMetricEvent(
+            timestamp=self.timestamp,
+            service=self.service,
+            type="api_metrics",
+            data=APIMetricData(self.method, self.path, self.status_code, self.response_time_ms, self.success,
+                               count=self.count)
+        )
+
+class SystemMetricRecordV1(msgspec.Struct, array_like=True):
+    """system-metrics v1: positional msgpack array with an epoch timestamp"""
+    timestamp: float
+    cpu_percent: Optional[float]
+    memory_percent: Optional[float]
+    disk_usage: Optional[float]
+    process_memory: Optional[float]
+    service: Optional[str] = None
+    cpu_per_core: Optional[List[float]] = None
+    event_loop_lag_ms: Optional[float] = None
+    event_loop_lag_max_ms: Optional[float] = None
+    process_threads: Optional[int] = None
+    process_fds: Optional[int] = None
+    gc_collections: Optional[int] = None
+    gc_pause_ms: Optional[float] = None
+    disk_read_bytes_per_sec: Optional[float] = None
+    disk_write_bytes_per_sec: Optional[float] = None
+    net_sent_bytes_per_sec: Optional[float] = None
+    net_recv_bytes_per_sec: Optional[float] = None
+    emit_queue_depth: Optional[int] = None
+    db_writer_queued_rows: Optional[int] = None
+    
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "SystemMetricRecordV1":
+        data = message.get("data") or {}
+        return cls(
+            _to_epoch(message.get("timestamp")),
+            data.get("cpu_percent"),
+            data.get("memory_percent"),
+            data.get("disk_usage"),
+            data.get("process_memory"),
+            message.get("service"),
+            *(data.get(field) for field in SYSTEM_METRIC_EXTRA_FIELDS)
+        )
+    
+    def to_event(self) -> SystemMetricEvent:
+        return SystemMetricEvent(
+            timestamp=self.timestamp,
+            service=self.service,
+            type="system_metrics",
+            data=SystemMetricData(self.cpu_percent, self.memory_percent, self.disk_usage, self.process_memory,
+                                  *(getattr(self, field) for field in SYSTEM_METRIC_EXTRA_FIELDS))
+        )
+
+# Collector fields appended to system-metrics v1 (trailing, so older records still decode)
+SYSTEM_METRIC_EXTRA_FIELDS = SystemMetricRecordV1.__struct_fields__[6:]
+
+BINARY_RECORD_TYPES = {
+    "api-metrics": APIMetricRecordV1,
+    "system-metrics": SystemMetricRecordV1
+}
+
+TOPIC_EVENT_TYPES = {
+    "api-metrics": APIMetricEvent,
+    "system-metrics": SystemMetricEvent,
+    "api-errors": ErrorEvent,
+    "ui-errors": ErrorEvent
+}
+
+# Shared encoders for producers; the JSON one encodes dicts and structs alike
+_encoder = msgspec.json.Encoder()
+_msgpack_encoder = msgspec.msgpack.Encoder()
+
+def encode_event(event: Any) -> bytes:
+    """Encode an event (dict or struct) to JSON bytes"""
+    return _encoder.encode(event)
+
+def encode_binary_event(topic: str, message: Dict[str, Any]) -> bytes:
+    """Encode an event dict with the topic's msgpack-v1 record layout"""
+    return _msgpack_encoder.encode(BINARY_RECORD_TYPES[topic].from_message(message))
+
+def get_event_decoder(topic: str) -> msgspec.json.Decoder:
+    """Get a JSON decoder that builds the topic's event struct directly"""
+    return msgspec.json.Decoder(TOPIC_EVENT_TYPES[topic])
+
+def get_event_decoders(topic: str) -> Dict[str, Callable[[bytes], Any]]:
+    """Get the topic's decoders by wire format; all of them return event structs"""
+    decoders = {WIRE_FORMAT_JSON: get_event_decoder(topic).decode}
+    record_type = BINARY_RECORD_TYPES.get(topic)
+    if record_type:
+        decode_record = msgspec.msgpack.Decoder(record_type).decode
+        decoders[WIRE_FORMAT_MSGPACK_V1] = lambda value: decode_record(value).to_event()
+    return decoders
+
+def event_to_dict(event: Any) -> Dict[str, Any]:
+    """Convert an event struct to plain dicts (for storage and API responses)"""
+    result = msgspec.to_builtins(event)
+    if isinstance(result.get("timestamp"), float):
+        # Binary records carry epoch seconds; stored dicts keep ISO strings
+        result["timestamp"] = datetime.utcfromtimestamp(result["timestamp"]).isoformat()
+    return result
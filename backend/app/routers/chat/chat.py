@@ -1,4 +1,6 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from app.services.chat_service import chat_service
@@ -18,17 +20,20 @@ class ChatResponse(BaseModel):
     success: bool
     error: Optional[str] = None
 
+def _to_history(request: ChatRequest) -> List[Dict[str, str]]:
+    """Convert conversation history to the format expected by chat service"""
+    if not request.conversation_history:
+        return []
+    return [
+        {"role": msg.role, "content": msg.content} 
+        for msg in request.conversation_history
+    ]
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(request: ChatRequest):
     """Chat with AI assistant about metrics"""
     try:
-        # Convert conversation history to the format expected by chat service
-        history = []
-        if request.conversation_history:
-            history = [
-                {"role": msg.role, "content": msg.content} 
-                for msg in request.conversation_history
-            ]
+        history = _to_history(request)
         
         # Get response from chat service
         response = await chat_service.chat_with_metrics(
@@ -46,4 +51,22 @@ async def chat_with_ai(request: ChatRequest):
             response="Sorry, I encountered an error processing your request.",
             success=False,
             error=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.post("/chat/stream")
+async def stream_chat_with_ai(request: ChatRequest):
+    """Chat with AI assistant, streaming tokens and tool-call progress as Server-Sent Events"""
+    history = _to_history(request)
+    
+    async def event_stream():
+        async for event in chat_service.stream_chat_with_metrics(
+            message=request.message,
+            conversation_history=history
+        ):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.database import APIError, UIError
 from app.services.kafka_service import kafka_service
-from app.services.metrics_service import metrics_service
-from app.services.memory_storage import memory_storage
+from app.services.metrics_aggregator import metrics_aggregator
+from app.services.metrics_sampler import metrics_sampler
+from app.services.dashboard_snapshots import dashboard_snapshots, etag_matches
+from app.services.memory_snapshots import memory_snapshotter
+from app.services.series import series_query
+from app.services.item_cache import item_cache
+from app.services.system_collector import system_collector
+from app.services.message_handler import message_handler
 from app.models.schemas import ErrorLogRequest
 from app.database.connection import get_async_session
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 router = APIRouter()
 
@@ -27,6 +36,30 @@ async def get_ui_logs(db: AsyncSession = Depends(get_async_session)):
     )
     return result.scalars().all()
 
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.get("/series")
+async def get_series(
+    metric: str,
+    route: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = Query(500, ge=2),
+    mode: str = "buckets"
+):
+    """Get a historical metric series downsampled to at most `points` points (default: last hour)"""
+    end = _as_naive_utc(end) or datetime.utcnow()
+    start = _as_naive_utc(start) or end - timedelta(hours=1)
+    
+    try:
+        return await asyncio.to_thread(series_query.get_series, metric, start, end, points, route, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.post("/errors")
 async def log_error(error: ErrorLogRequest):
     """Log errors from frontend"""
@@ -53,11 +86,76 @@ async def log_error(error: ErrorLogRequest):
 @router.post("/system-metrics")
 async def send_system_metrics():
     """Manually send system metrics to Kafka"""
-    metrics_service.send_system_metrics()
+    # psutil calls block, so they run off the event loop like the collector's own emits
+    await asyncio.to_thread(system_collector.emit)
     return {"message": "System metrics sent to Kafka"}
 
 
 @router.get("/dashboard-data")
-async def get_dashboard_data():
+async def get_dashboard_data(request: Request):
     """Get real-time dashboard data for developer persona"""
-    return memory_storage.get_dashboard_data()
\ No newline at end of file
+    etag, body = await asyncio.to_thread(dashboard_snapshots.get)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        dashboard_snapshots.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    
+    dashboard_snapshots.stats["served"] += 1
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/dashboard-stream")
+async def stream_dashboard_data():
+    """Push dashboard updates as Server-Sent Events: a full snapshot, then changed sections"""
+    queue = await dashboard_snapshots.subscribe()
+    
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+        finally:
+            dashboard_snapshots.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/dashboard-stats")
+async def get_dashboard_stats():
+    """Get dashboard snapshot build, cache-hit and push counters"""
+    return dashboard_snapshots.get_stats()
+
+@router.get("/item-cache-stats")
+async def get_item_cache_stats():
+    """Get item cache hit, miss, eviction and invalidation counters"""
+    return item_cache.get_stats()
+
+@router.get("/producer-stats")
+async def get_producer_stats():
+    """Get telemetry producer queue, drop and backpressure counters"""
+    return {
+        **kafka_service.get_stats(),
+        "aggregator": metrics_aggregator.get_stats(),
+        "sampler": metrics_sampler.get_stats()
+    }
+
+@router.get("/writer-stats")
+async def get_writer_stats():
+    """Get database writer flush latency and rows-per-second"""
+    return message_handler.get_writer_stats()
+
+@router.get("/memory-snapshot-stats")
+async def get_memory_snapshot_stats():
+    """Get memory snapshot restore and save counters"""
+    return memory_snapshotter.get_stats()
+
+@router.get("/system-collector-stats")
+async def get_system_collector_stats():
+    """Get system metrics sampling and emit counters"""
+    return system_collector.get_stats()
\ No newline at end of file
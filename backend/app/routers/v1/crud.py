@@ -1,21 +1,59 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response, status, Depends
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from urllib.parse import urlencode
+import msgspec
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.config import settings
 from app.models.schemas import Item, ItemCreate, ItemUpdate
 from app.models.database import Item as ItemDB
+from app.services.item_cache import item_cache
+from app.services.item_queries import item_query
 from app.services.memory_storage import memory_storage
-from app.database.connection import get_async_session
+from app.database.connection import AsyncSessionLocal, get_async_session
 from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/items", response_model=List[Item])
-async def get_items(db: AsyncSession = Depends(get_async_session)):
-    """Get all items"""
-    result = await db.execute(select(ItemDB))
-    items = result.scalars().all()
-    return items
+async def get_items(
+    limit: Optional[int] = Query(None, ge=1, le=settings.items_max_page_size),
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", pattern="^(id|updated_at)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Get items
+    
+    Without limit or cursor every matching item is returned, as before pagination;
+    with either, one keyset page (default size items_page_size) and the next page's
+    cursor in X-Next-Cursor. format=ndjson streams every item as NDJSON.
+    """
+    filters = {"order_by": order_by, "fields": fields, "category": category, "min_price": min_price, "max_price": max_price}
+    try:
+        if format == "ndjson":
+            # Full export: ignores limit and streams until the last matching item
+            return StreamingResponse(item_query.export(cursor, **filters), media_type="application/x-ndjson")
+        if limit is None and cursor is None:
+            # Unpaged list, streamed in keyset batches so it is never held in memory whole
+            return StreamingResponse(item_query.export(None, json_array=True, **filters), media_type="application/json")
+        limit = limit or settings.items_page_size
+        rows, next_cursor = await item_query.get_page(db, limit, cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Rows are encoded directly; the response model only documents the full shape
+    response = Response(content=msgspec.json.encode(rows), media_type="application/json")
+    if next_cursor:
+        params = {key: value for key, value in filters.items() if value is not None}
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'</api/v1/items?{urlencode({**params, "limit": limit, "cursor": next_cursor})}>; rel="next"'
+    return response
 
 @router.post("/items", response_model=Item, status_code=status.HTTP_201_CREATED)
 async def create_item(item: ItemCreate, db: AsyncSession = Depends(get_async_session)):
@@ -30,6 +68,7 @@ async def create_item(item: ItemCreate, db: AsyncSession = Depends(get_async_ses
     db.add(db_item)
     await db.commit()
     await db.refresh(db_item)
+    item_cache.invalidate(db_item.id)
     
     # Send event to Kafka (if you still want to track item creation events)
     event_data = {
@@ -46,18 +85,25 @@ async def create_item(item: ItemCreate, db: AsyncSession = Depends(get_async_ses
     
     return db_item
 
+async def _load_item_body(item_id: int) -> Optional[bytes]:
+    """Read one item and serialize it as the response body (None if it does not exist)"""
+    # Its own session: a single-flight load can outlive the request that started it
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(ItemDB).where(ItemDB.id == item_id))
+        item = result.scalar_one_or_none()
+    return Item.model_validate(item).model_dump_json().encode() if item else None
+
 @router.get("/items/{item_id}", response_model=Item)
-async def get_item(item_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_item(item_id: int):
     """Get item by ID"""
-    result = await db.execute(select(ItemDB).where(ItemDB.id == item_id))
-    item = result.scalar_one_or_none()
+    body = await item_cache.get(item_id, lambda: _load_item_body(item_id))
     
-    if not item:
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Item with id {item_id} not found"
         )
-    return item
+    return Response(content=body, media_type="application/json")
 
 @router.put("/items/{item_id}", response_model=Item)
 async def update_item(item_id: int, item_update: ItemUpdate, db: AsyncSession = Depends(get_async_session)):
@@ -80,6 +126,7 @@ async def update_item(item_id: int, item_update: ItemUpdate, db: AsyncSession =
     
     await db.commit()
     await db.refresh(db_item)
+    item_cache.invalidate(item_id)
     
     return db_item
 
@@ -97,6 +144,7 @@ async def delete_item(item_id: int, db: AsyncSession = Depends(get_async_session
     
     await db.delete(db_item)
     await db.commit()
+    item_cache.invalidate(item_id)
     
     return {"message": f"Item {item_id} deleted successfully"}
 
@@ -1,12 +1,9 @@
 import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 import json
-from anthropic import Anthropic
-from openai import OpenAI
-import google.generativeai as genai
-from fastmcp import Client
 from app.config import settings
+from app.services.mcp_pool import MCPSessionPool
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -14,97 +11,213 @@ logger = logging.getLogger(__name__)
 class ChatService:
     def __init__(self):
         if settings.ai_provider == "gemini":
-            genai.configure(api_key=settings.google_api_key)
-            self.client_ai = genai.GenerativeModel(settings.google_model)
             self.model = settings.google_model
         elif settings.ai_provider == "claude":
-            self.client_ai = Anthropic(api_key=settings.anthropic_api_key)
             self.model = settings.anthropic_model
         else:
-            self.client_ai = OpenAI(api_key=settings.openai_api_key)
             self.model = settings.openai_model
             
         self.ai_provider = settings.ai_provider
         self.mcp_server_path = Path(__file__).parent.parent / "mcp" / "metrics_server.py"
+        
+        # The provider SDK client and the MCP session pool are built on first use,
+        # so importing this module loads neither the SDKs nor fastmcp
+        self._client_ai = None
+        self._mcp_pool = None
+        self._gemini_tools = None
+    
+    @property
+    def client_ai(self):
+        """Provider client, importing only the configured provider's SDK"""
+        if self._client_ai is None:
+            if self.ai_provider == "gemini":
+                import google.generativeai as genai
+                genai.configure(api_key=settings.google_api_key)
+                self._client_ai = genai.GenerativeModel(settings.google_model)
+            elif self.ai_provider == "claude":
+                from anthropic import Anthropic
+                self._client_ai = Anthropic(api_key=settings.anthropic_api_key)
+            else:
+                from openai import OpenAI
+                self._client_ai = OpenAI(api_key=settings.openai_api_key)
+        return self._client_ai
+    
+    @property
+    def mcp_pool(self) -> MCPSessionPool:
+        """Warm MCP sessions shared by all chats, plus the tool declarations built from them"""
+        if self._mcp_pool is None:
+            if settings.mcp_transport == "inprocess":
+                self._mcp_pool = MCPSessionPool(
+                    self._mount_inprocess_server(),
+                    size=1,
+                    health_check_interval=settings.mcp_health_check_interval_seconds
+                )
+            else:
+                self._mcp_pool = MCPSessionPool(
+                    self.mcp_server_path,
+                    size=settings.mcp_pool_size,
+                    health_check_interval=settings.mcp_health_check_interval_seconds
+                )
+        return self._mcp_pool
+    
+    def _mount_inprocess_server(self):
+        """Load the metrics MCP server in this process, backed by live memory storage"""
+        from app.mcp import metrics_server
+        from app.services.memory_storage import memory_storage
+        from app.database.connection import read_engine
+        
+        metrics_server.attach_live_storage(memory_storage, read_engine)
+        return metrics_server.mcp
+    
+    async def start(self):
+        """Start the MCP session pool (called from app startup)"""
+        try:
+            await self.mcp_pool.start()
+        except Exception as e:
+            # Chat retries the start on first use
+            logger.error(f"Failed to start MCP session pool: {e}")
+    
+    async def stop(self):
+        """Close the MCP session pool"""
+        if self._mcp_pool is not None:
+            await self._mcp_pool.stop()
     
     async def chat_with_metrics(self, message: str, conversation_history: List[Dict[str, str]] = None) -> str:
-        """Chat with LLM using FastMCP client for metrics access"""
+        """Chat with LLM using pooled FastMCP sessions for metrics access"""
         try:
-            client = Client(str(self.mcp_server_path))
+            if not self.mcp_pool.started:
+                await self.mcp_pool.start()
+            tools = self.mcp_pool.tools
             
-            async with client:
-                tools = await client.list_tools()
+            if self.ai_provider == "gemini":
+                return await self._chat_with_gemini(self.mcp_pool, tools, message, conversation_history)
+            elif self.ai_provider == "claude":
+                return await self._chat_with_claude(self.mcp_pool, tools, message, conversation_history)
+            else:
+                return await self._chat_with_openai(self.mcp_pool, tools, message, conversation_history)
                 
-                if self.ai_provider == "gemini":
-                    return await self._chat_with_gemini(client, tools, message, conversation_history)
-                elif self.ai_provider == "claude":
-                    return await self._chat_with_claude(client, tools, message, conversation_history)
-                else:
-                    return await self._chat_with_openai(client, tools, message, conversation_history)
-                    
         except Exception as e:
             logger.error(f"Error in chat_with_metrics: {e}")
             return f"Sorry, I encountered an error while analyzing your metrics: {str(e)}"
     
+    async def stream_chat_with_metrics(self, message: str, conversation_history: List[Dict[str, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream response tokens and tool-call progress as events"""
+        try:
+            if not self.mcp_pool.started:
+                await self.mcp_pool.start()
+            tools = self.mcp_pool.tools
+            
+            if self.ai_provider != "gemini":
+                yield {"type": "error", "error": f"Streaming is not supported for provider {self.ai_provider}"}
+                return
+            
+            async for event in self._stream_gemini(self.mcp_pool, tools, message, conversation_history):
+                yield event
+                
+        except Exception as e:
+            logger.error(f"Error in stream_chat_with_metrics: {e}")
+            yield {"type": "error", "error": str(e)}
+    
     async def _chat_with_gemini(self, mcp_client, tools, message: str, conversation_history: List[Dict[str, str]] = None):
         """Handle chat with Gemini"""
-        # Convert MCP tools to Gemini format
-        gemini_tools = self._convert_tools_to_gemini_format(tools)
+        try:
+            chunks = []
+            async for event in self._stream_gemini(mcp_client, tools, message, conversation_history):
+                if event["type"] == "token":
+                    chunks.append(event["text"])
+            return "".join(chunks)
+            
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            return f"Sorry, I encountered an error with the Gemini API: {str(e)}"
+    
+    async def _stream_gemini(self, mcp_client, tools, message: str, conversation_history: List[Dict[str, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run a Gemini chat on the async client, yielding token and tool events"""
+        # Convert MCP tools to Gemini format once; the tool list is cached by the pool
+        if self._gemini_tools is None:
+            self._gemini_tools = self._convert_tools_to_gemini_format(tools)
+        gemini_tools = self._gemini_tools
         
         # Build conversation for Gemini
         conversation = self._build_gemini_conversation(message, conversation_history)
         
-        try:
-            # First call to Gemini with function calling
-            response = self.client_ai.generate_content(
-                conversation,
-                tools=gemini_tools,
-                tool_config={'function_calling_config': {'mode': 'AUTO'}}
-            )
+        max_rounds = settings.chat_max_tool_rounds
+        for round_number in range(max_rounds + 1):
+            # The last round offers no tools, so the model has to answer with what it has
+            tool_kwargs = {}
+            if round_number < max_rounds:
+                tool_kwargs = {
+                    'tools': gemini_tools,
+                    'tool_config': {'function_calling_config': {'mode': 'AUTO'}}
+                }
+            
+            response = await self.client_ai.generate_content_async(conversation, stream=True, **tool_kwargs)
             
-            # Check if Gemini wants to call functions
-            if response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
+            function_call_parts = []
+            async for chunk in response:
+                for part in self._response_parts(chunk):
                     if hasattr(part, 'function_call') and part.function_call:
-                        # Extract function call details
-                        function_name = part.function_call.name
-                        function_args = dict(part.function_call.args)
-                        
-                        logger.info(f"Gemini calling tool: {function_name} with args: {function_args}")
-                        
-                        # Call MCP tool
-                        tool_result = await mcp_client.call_tool(function_name, function_args)
-                        
-                        # Build function response for Gemini
-                        function_response = genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=function_name,
-                                response={'result': str(tool_result.data)}
-                            )
-                        )
-                        
-                        # Continue conversation with function result
-                        conversation.append({
-                            'role': 'model',
-                            'parts': [part]
-                        })
-                        conversation.append({
-                            'role': 'user', 
-                            'parts': [function_response]
-                        })
-                        
-                        # Generate final response
-                        final_response = self.client_ai.generate_content(conversation)
-                        return final_response.text
-                
-                # No function calls, return direct response
-                return response.text
+                        function_call_parts.append(part)
+                    elif getattr(part, 'text', None):
+                        yield {"type": "token", "text": part.text}
+            
+            # Done once Gemini stops asking for tools
+            if not function_call_parts:
+                break
             
-            return response.text
+            for part in function_call_parts:
+                logger.info(f"Gemini calling tool: {part.function_call.name} with args: {dict(part.function_call.args)}")
+                yield {"type": "tool_call", "name": part.function_call.name, "arguments": dict(part.function_call.args)}
             
+            # Run every call from this turn concurrently, so the round takes as long as the slowest tool
+            results = await asyncio.gather(*[
+                self._call_gemini_tool(mcp_client, part, settings.chat_tool_round_timeout_seconds)
+                for part in function_call_parts
+            ])
+            
+            import google.generativeai as genai
+            function_responses = []
+            for function_name, payload in results:
+                yield {"type": "tool_result", "name": function_name, "success": "error" not in payload}
+                function_responses.append(genai.protos.Part(
+                    function_response=genai.protos.FunctionResponse(
+                        name=function_name,
+                        response=payload
+                    )
+                ))
+            
+            # Continue conversation with function results
+            conversation.append({
+                'role': 'model',
+                'parts': function_call_parts
+            })
+            conversation.append({
+                'role': 'user', 
+                'parts': function_responses
+            })
+        
+        yield {"type": "done"}
+    
+    async def _call_gemini_tool(self, mcp_client, part, timeout: float):
+        """Call the MCP tool behind a Gemini function call, returning its name and response payload"""
+        function_name = part.function_call.name
+        function_args = dict(part.function_call.args)
+        
+        try:
+            tool_result = await asyncio.wait_for(mcp_client.call_tool(function_name, function_args), timeout)
+            return function_name, {'result': str(tool_result.data)}
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {function_name} timed out after {timeout}s")
+            return function_name, {'error': f"Tool timed out after {timeout} seconds"}
         except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            return f"Sorry, I encountered an error with the Gemini API: {str(e)}"
+            logger.error(f"Tool {function_name} failed: {e}")
+            return function_name, {'error': str(e)}
+    
+    def _response_parts(self, chunk) -> List[Any]:
+        """Get the content parts of a (streamed) Gemini response chunk"""
+        if not chunk.candidates or not chunk.candidates[0].content:
+            return []
+        return list(chunk.candidates[0].content.parts)
     
     async def _chat_with_claude(self, mcp_client, tools, message: str, conversation_history: List[Dict[str, str]] = None):
         """Handle chat with Claude (existing implementation)"""
@@ -118,6 +231,7 @@ class ChatService:
     
     def _convert_tools_to_gemini_format(self, mcp_tools) -> List[Any]:
         """Convert MCP tools to Gemini format"""
+        import google.generativeai as genai
         gemini_tools = []
         
         for tool in mcp_tools:
@@ -146,6 +260,7 @@ class ChatService:
     
     def _json_type_to_gemini_type(self, json_type: str):
         """Convert JSON schema type to Gemini type"""
+        import google.generativeai as genai
         type_mapping = {
             'string': genai.protos.Type.STRING,
             'integer': genai.protos.Type.INTEGER,
@@ -172,6 +287,7 @@ You have access to several tools for fetching current metrics:
 - get_system_metrics_summary: System health data (CPU, memory, disk usage)
 - get_error_analysis: Error tracking data (API errors, UI errors, error types)
 - get_performance_trends: Performance trends and bottlenecks
+- get_latency_percentiles: Tail latency (p50/p90/p99/p999) overall and per endpoint
 
 Guidelines:
 - Use the appropriate tools based on the user's question
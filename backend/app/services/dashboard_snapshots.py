@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+import uuid
+import msgspec
+from typing import Dict, Any, Optional, Set, Tuple
+from app.config import settings
+from app.services.memory_storage import memory_storage
+
+logger = logging.getLogger(__name__)
+
+_encoder = msgspec.json.Encoder()
+
+# One entity-tag of an If-None-Match list, optionally weak (RFC 9110 section 8.8.3)
+_ENTITY_TAG = re.compile(r'\s*(?:W/)?("[^"]*")\s*(?:,|$)')
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match header matches the current ETag
+    
+    Uses the weak comparison If-None-Match calls for: "*" matches any current
+    representation, otherwise any tag in the comma-separated list matches once
+    a W/ prefix is ignored on either side.
+    """
+    if not if_none_match or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return opaque in _ENTITY_TAG.findall(if_none_match)
+
+class DashboardSnapshots:
+    """Pre-serialized dashboard snapshots shared by every poller and stream subscriber"""
+    
+    def __init__(self, storage, min_interval_ms: int = 1000, max_age_seconds: float = 10,
+                 subscriber_queue_size: int = 16):
+        self.storage = storage
+        self.min_interval = min_interval_ms / 1000
+        self.max_age = max_age_seconds
+        self.subscriber_queue_size = subscriber_queue_size
+        
+        # (etag, body, sections), replaced as a whole so readers never see a mixed pair;
+        # each dashboard section is encoded once and the body is stitched from them
+        self.snapshot: Tuple[Optional[str], bytes, Dict[str, bytes]] = (None, b"{}", {})
+        self.boot_id = uuid.uuid4().hex[:8]  # Keeps ETags from a previous process from matching
+        self.sequence = 0
+        self.storage_version = -1
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+        
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.push_task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            "builds": 0,
+            "changes": 0,
+            "served": 0,
+            "not_modified": 0,
+            "frames_pushed": 0,
+            "subscriber_resyncs": 0
+        }
+    
+    def get(self) -> Tuple[str, bytes]:
+        """Get the current (etag, JSON body), rebuilding only when due"""
+        self.refresh()
+        etag, body, _ = self.snapshot
+        return etag, body
+    
+    def refresh(self) -> Dict[str, bytes]:
+        """Rebuild if data changed (at most once per interval) or the snapshot is stale
+        
+        Returns the sections whose encoding changed, empty if nothing did.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.snapshot[0] is not None:
+                age = now - self.built_at
+                if age < self.min_interval:
+                    return {}
+                if self.storage.version == self.storage_version and age < self.max_age:
+                    return {}
+            return self._build(now)
+    
+    def _build(self, now: float) -> Dict[str, bytes]:
+        version = self.storage.version
+        data = self.storage.get_dashboard_data()
+        sections = {key: _encoder.encode(value) for key, value in data.items()}
+        etag, body, previous = self.snapshot
+        changed = {key: value for key, value in sections.items() if previous.get(key) != value}
+        
+        if changed or etag is None:
+            self.sequence += 1
+            etag = f'"{self.boot_id}-{self.sequence}"'
+            body = b"{" + b",".join(_encoder.encode(key) + b":" + value for key, value in sections.items()) + b"}"
+            self.stats["changes"] += 1
+        
+        self.snapshot = (etag, body, sections)
+        self.storage_version = version
+        self.built_at = now
+        self.stats["builds"] += 1
+        return changed
+    
+    def _frame(self, event: str, payload: bytes) -> bytes:
+        return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+    
+    def _snapshot_frame(self) -> bytes:
+        etag, body, _ = self.snapshot
+        return self._frame("snapshot", b'{"etag":' + _encoder.encode(etag) + b',"data":' + body + b"}")
+    
+    async def subscribe(self) -> asyncio.Queue:
+        """Register a stream subscriber; its queue starts with the full snapshot"""
+        await asyncio.to_thread(self.refresh)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        queue.put_nowait(self._snapshot_frame())
+        self.subscribers.add(queue)
+        
+        if self.push_task is None or self.push_task.done():
+            self.push_task = asyncio.create_task(self._push_loop())
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    async def _push_loop(self):
+        """Build once per interval and fan the changed sections out to every subscriber
+        
+        Deltas are taken against the last snapshot pushed, so builds triggered by
+        pollers in between are included.
+        """
+        pushed_etag, _, pushed_sections = self.snapshot
+        while self.subscribers:
+            await asyncio.sleep(self.min_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Error building dashboard snapshot: {e}")
+                continue
+            etag, _, sections = self.snapshot
+            if etag == pushed_etag:
+                continue
+            changed = {key: value for key, value in sections.items() if pushed_sections.get(key) != value}
+            pushed_etag, pushed_sections = etag, sections
+            
+            delta = self._frame(
+                "delta",
+                b'{"etag":' + _encoder.encode(etag) + b',"changes":{'
+                + b",".join(_encoder.encode(key) + b":" + value for key, value in changed.items()) + b"}}"
+            )
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(delta)
+                except asyncio.QueueFull:
+                    # A slow client missed deltas: drop its backlog and resend everything
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(self._snapshot_frame())
+                    self.stats["subscriber_resyncs"] += 1
+            self.stats["frames_pushed"] += len(self.subscribers)
+        self.push_task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get build, cache-hit and push counters"""
+        return {
+            **self.stats,
+            "etag": self.snapshot[0],
+            "subscribers": len(self.subscribers),
+            "body_bytes": len(self.snapshot[1])
+        }
+
+# Global dashboard snapshot cache
+dashboard_snapshots = DashboardSnapshots(
+    memory_storage,
+    min_interval_ms=settings.dashboard_snapshot_interval_ms,
+    max_age_seconds=settings.dashboard_snapshot_max_age_seconds
+)
@@ -0,0 +1,283 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from app.database.connection import writer_engine
+
+logger = logging.getLogger(__name__)
+
+class DatabaseWriter:
+    """Background stage that bulk-inserts mapped rows, flushing on size or time"""
+    
+    def __init__(self, tables: Dict[str, Any], batch_rows: int = 5000, flush_interval_ms: int = 250,
+                 accumulators: Optional[Dict[str, Any]] = None, retention: Optional[Any] = None,
+                 retention_interval_seconds: int = 300, max_flush_attempts: int = 3):
+        self.tables = tables  # Topic -> SQLAlchemy Table
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval_ms / 1000
+        
+        # Topic -> accumulator with add_row(row)/flush(connection)/clear(), written in the raw rows' transaction
+        self.accumulators = accumulators or {}
+        self.retention = retention
+        self.retention_interval = retention_interval_seconds
+        # A failed flush keeps its rows for the next one; after this many attempts they are dropped
+        self.max_flush_attempts = max_flush_attempts
+        
+        # Holds (topic, rows, seq) chunks. Chunks vary in size, so the bound is on the rows
+        # they hold: a slow database pushes back on the consumers instead of growing memory
+        self.row_queue = queue.Queue()
+        self.max_queued_rows = batch_rows * 4
+        self.queued_rows = 0
+        self.batch_buffer: Dict[str, List[Dict[str, Any]]] = {topic: [] for topic in tables}
+        self.flush_attempts: Dict[str, int] = {topic: 0 for topic in tables}
+        
+        # Every queued chunk gets a sequence number. flushed_seq is the highest one
+        # whose rows, and every earlier chunk's, are written (or given up on), so
+        # consumers commit offsets only once their rows are stored
+        self.seq_lock = threading.Lock()
+        # Signalled on seq_lock when queued rows are taken or the writer stops
+        self.queue_space = threading.Condition(self.seq_lock)
+        self.queued_seq = 0
+        self.dequeued_seq = 0
+        self.flushed_seq = 0
+        self.buffer_first_seq: Dict[str, int] = {}  # Topic -> seq of its oldest buffered chunk
+        self.connection = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        # True while the writer thread takes queued chunks, which lasts past stop() until the
+        # queue is drained; changed under seq_lock so no chunk is queued after the last take
+        self.queue_open = False
+        # Serializes synchronous writes from consumer threads (and the writer thread's final flush)
+        self.sync_lock = threading.Lock()
+        
+        self.stats = {
+            "rows_written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "rows_dropped": 0,
+            "rows_expired": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0
+        }
+        self.started_at = time.time()
+    
+    def start(self):
+        """Start the writer thread"""
+        if self.running:
+            return
+        with self.seq_lock:
+            self.running = True
+            self.queue_open = True
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+    
+    def enqueue(self, topic: str, row: Dict[str, Any]):
+        """Queue a mapped row for the next bulk insert"""
+        self.enqueue_many(topic, [row])
+    
+    def enqueue_many(self, topic: str, rows: List[Dict[str, Any]]):
+        """Queue a batch of mapped rows with a single hand-off
+        
+        Blocks while the queue is full (a chunk larger than the bound is let into an
+        empty queue). Once the writer has stopped and drained, rows are written
+        synchronously instead.
+        """
+        with self.queue_space:
+            while self.running and self.queued_rows and self.queued_rows + len(rows) > self.max_queued_rows:
+                self.queue_space.wait()
+            if self.queue_open:
+                # Numbered and queued together, so queue order is sequence order
+                self.queued_seq += 1
+                self.queued_rows += len(rows)
+                self.row_queue.put((topic, rows, self.queued_seq))
+                return
+        self._write_through(topic, rows)
+    
+    def _write_through(self, topic: str, rows: List[Dict[str, Any]]):
+        with self.sync_lock:
+            with self.seq_lock:
+                self.queued_seq += 1
+                seq = self.queued_seq
+            self._buffer_chunk(topic, rows, seq)
+            self._flush_topic(topic)
+            self._update_flushed_seq()
+    
+    def checkpoint(self) -> int:
+        """Sequence number covering every row queued so far"""
+        return self.queued_seq
+    
+    def is_flushed(self, seq: int) -> bool:
+        """Whether the rows queued up to a checkpoint are written (or were given up on)"""
+        return self.flushed_seq >= seq
+    
+    def _run(self):
+        """Collect rows and flush each topic by size, and everything by time"""
+        next_flush = time.monotonic() + self.flush_interval
+        next_retention = time.monotonic() + self.retention_interval
+        
+        while True:
+            if not self.running:
+                with self.seq_lock:
+                    if self.row_queue.empty():
+                        # Producers write synchronously from here on
+                        self.queue_open = False
+                        break
+            
+            timeout = max(next_flush - time.monotonic(), 0)
+            try:
+                topic, rows, seq = self.row_queue.get(timeout=timeout)
+                with self.queue_space:
+                    self.queued_rows -= len(rows)
+                    self.queue_space.notify_all()
+                # A topic whose last flush failed retries on the timer, not on every chunk
+                if self._buffer_chunk(topic, rows, seq) >= self.batch_rows and not self.flush_attempts[topic]:
+                    self._flush_topic(topic)
+            except queue.Empty:
+                pass
+            
+            if time.monotonic() >= next_flush:
+                self.flush_all()
+                next_flush = time.monotonic() + self.flush_interval
+            
+            # Retention runs on this thread so it never competes with another writer
+            if self.retention and time.monotonic() >= next_retention:
+                self._apply_retention()
+                next_retention = time.monotonic() + self.retention_interval
+            
+            self._update_flushed_seq()
+        
+        with self.sync_lock:
+            self.flush_all()
+            self._update_flushed_seq()
+            self._close_connection()
+    
+    def _buffer_chunk(self, topic: str, rows: List[Dict[str, Any]], seq: int) -> int:
+        """Add a chunk's rows to its topic buffer and return the buffer size"""
+        buffer = self.batch_buffer[topic]
+        if not buffer:
+            self.buffer_first_seq[topic] = seq
+        self.dequeued_seq = seq
+        
+        buffer.extend(rows)
+        accumulator = self.accumulators.get(topic)
+        if accumulator:
+            for row in rows:
+                accumulator.add_row(row)
+        return len(buffer)
+    
+    def _update_flushed_seq(self):
+        # Everything before the oldest chunk still buffered is written
+        pending = [self.buffer_first_seq[topic] for topic, buffer in self.batch_buffer.items() if buffer]
+        self.flushed_seq = min(pending) - 1 if pending else self.dequeued_seq
+    
+    def flush_all(self):
+        """Flush every non-empty topic buffer"""
+        for topic, buffer in self.batch_buffer.items():
+            if buffer:
+                self._flush_topic(topic)
+    
+    def _flush_topic(self, topic: str):
+        """Insert a topic's buffered rows with a single executemany"""
+        rows = self.batch_buffer[topic]
+        self.batch_buffer[topic] = []
+        start = time.perf_counter()
+        accumulator = self.accumulators.get(topic)
+        
+        try:
+            if self.connection is None:
+                self.connection = writer_engine.connect()
+            with self.connection.begin():
+                self.connection.execute(self.tables[topic].insert(), rows)
+                if accumulator:
+                    accumulator.flush(self.connection)
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            # Start from a fresh connection next time
+            self._close_connection()
+            self.flush_attempts[topic] += 1
+            if self.flush_attempts[topic] < self.max_flush_attempts:
+                # The accumulator still holds these rows' rollups, so only the rows go back
+                logger.error(f"Error flushing {len(rows)} rows from {topic} to database, will retry: {e}")
+                self.batch_buffer[topic] = rows
+                return
+            logger.error(f"Dropping {len(rows)} rows from {topic} after {self.flush_attempts[topic]} failed flushes: {e}")
+            self.flush_attempts[topic] = 0
+            self.stats["rows_dropped"] += len(rows)
+            # The rollups of dropped rows go with them, so raw rows and rollups agree
+            if accumulator:
+                accumulator.clear()
+            return
+        
+        self.flush_attempts[topic] = 0
+        if accumulator:
+            accumulator.clear()
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["rows_written"] += len(rows)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+        self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+        self.stats["total_flush_ms"] += elapsed_ms
+        logger.debug(f"Flushed {len(rows)} rows from {topic} in {elapsed_ms:.1f}ms")
+    
+    def _apply_retention(self):
+        """Delete expired raw and rollup rows in batches"""
+        try:
+            if self.connection is None:
+                self.connection = writer_engine.connect()
+            self.stats["rows_expired"] += self.retention.apply(self.connection)
+        except Exception as e:
+            logger.error(f"Error applying retention: {e}")
+            self._close_connection()
+    
+    def _close_connection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.warning(f"Error closing writer connection: {e}")
+            self.connection = None
+    
+    def stop(self):
+        """Stop the writer after draining and flushing queued rows"""
+        if self.running:
+            with self.queue_space:
+                self.running = False
+                self.queue_space.notify_all()
+            if self.thread:
+                self.thread.join(timeout=10)
+                if self.thread.is_alive():
+                    logger.warning("Database writer did not finish draining within 10s")
+                else:
+                    self.thread = None
+        else:
+            with self.sync_lock:
+                # A writer thread that outlived an earlier stop still owns the buffers
+                if not self.queue_open:
+                    self.flush_all()
+                    self._close_connection()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get flush latency and throughput counters"""
+        flushes = self.stats["flushes"]
+        uptime = max(time.time() - self.started_at, 1e-9)
+        return {
+            "rows_written": self.stats["rows_written"],
+            "rows_dropped": self.stats["rows_dropped"],
+            "rows_expired": self.stats["rows_expired"],
+            "flushes": flushes,
+            "flush_errors": self.stats["flush_errors"],
+            "last_flush_ms": self.stats["last_flush_ms"],
+            "max_flush_ms": self.stats["max_flush_ms"],
+            "avg_flush_ms": round(self.stats["total_flush_ms"] / flushes, 2) if flushes else 0,
+            "avg_rows_per_flush": round(self.stats["rows_written"] / flushes, 1) if flushes else 0,
+            "rows_per_second": round(self.stats["rows_written"] / uptime, 2),
+            "insert_rows_per_second": round(self.stats["rows_written"] * 1000 / max(self.stats["total_flush_ms"], 1e-6), 2) if flushes else 0,
+            "queue_depth": self.row_queue.qsize(),  # Queued chunks, not rows
+            "queued_rows": self.queued_rows,
+            "max_queued_rows": self.max_queued_rows,
+            "buffered_rows": {topic: len(buffer) for topic, buffer in self.batch_buffer.items()}
+        }
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Optional
+from app.config import settings
+
+class ItemCache:
+    """In-process LRU/TTL cache of serialized item responses with single-flight loads
+    
+    Each worker process has its own cache, so the TTL bounds how long another
+    worker's write can go unseen here.
+    """
+    
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.enabled = enabled
+        self.entries: OrderedDict = OrderedDict()  # id -> (expires_at, body)
+        # id -> running load; invalidating an id drops its load, so only loads that
+        # are still registered when they finish may store their result
+        self.inflight: Dict[int, asyncio.Task] = {}
+        
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+    
+    async def get(self, item_id: int, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """Get an item's body, loading it once for all concurrent misses (None if it does not exist)"""
+        if not self.enabled:
+            return await loader()
+        
+        entry = self.entries.get(item_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.entries.move_to_end(item_id)
+                self.stats["hits"] += 1
+                return entry[1]
+            del self.entries[item_id]
+            self.stats["expirations"] += 1
+        
+        task = self.inflight.get(item_id)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(self._load(item_id, loader))
+            self.inflight[item_id] = task
+        # Shielded so a cancelled request does not cancel the load other requests wait on
+        return await asyncio.shield(task)
+    
+    async def _load(self, item_id: int, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        try:
+            body = await loader()
+        finally:
+            # False if this item was invalidated while loading (other items do not matter)
+            current = self.inflight.get(item_id) is asyncio.current_task()
+            if current:
+                del self.inflight[item_id]
+        
+        # Missing items are not cached, so a create is visible right away
+        if body is not None and current:
+            self._put(item_id, body)
+        return body
+    
+    def _put(self, item_id: int, body: bytes):
+        self.entries[item_id] = (time.monotonic() + self.ttl, body)
+        self.entries.move_to_end(item_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def invalidate(self, item_id: int):
+        """Drop an item after a write; its load already running, if any, is not stored"""
+        self.entries.pop(item_id, None)
+        # Later reads start a fresh load instead of joining one that may predate the write
+        self.inflight.pop(item_id, None)
+        self.stats["invalidations"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters"""
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "enabled": self.enabled
+        }
+
+# Global item cache instance
+item_cache = ItemCache(
+    max_entries=settings.item_cache_max_entries,
+    ttl_seconds=settings.item_cache_ttl_seconds,
+    enabled=settings.item_cache_enabled
+)
@@ -0,0 +1,149 @@
+import base64
+import msgspec
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database.connection import AsyncSessionLocal
+from app.models.database import Item as ItemDB
+
+ITEM_FIELDS = ("id", "name", "description", "price", "category", "created_at", "updated_at")
+# Keyset orderings; each ends in id so the sort key is unique
+ITEM_ORDERINGS = {
+    "id": ("id",),
+    "updated_at": ("updated_at", "id")
+}
+
+class ItemQuery:
+    """Keyset-paginated, projected item listing and NDJSON export"""
+    
+    def __init__(self, session_factory, max_limit: int, export_batch_size: int):
+        self.session_factory = session_factory
+        self.max_limit = max_limit
+        self.export_batch_size = export_batch_size
+    
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+        """Parse a comma-separated projection (default: every field)"""
+        if not fields:
+            return ITEM_FIELDS
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in requested if field not in ITEM_FIELDS]
+        if unknown or not requested:
+            raise ValueError(f"Unknown fields {unknown}; expected a subset of {list(ITEM_FIELDS)}")
+        return requested
+    
+    @staticmethod
+    def encode_cursor(order_by: str, row: Dict[str, Any]) -> str:
+        """Opaque cursor holding the sort key of the last row on a page"""
+        key = [order_by, *(row[column] for column in ITEM_ORDERINGS[order_by])]
+        return base64.urlsafe_b64encode(msgspec.json.encode(key)).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str, order_by: str) -> Tuple[Any, ...]:
+        try:
+            key = msgspec.json.decode(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            cursor_order, *values = key
+            if cursor_order != order_by or len(values) != len(ITEM_ORDERINGS[order_by]):
+                raise ValueError
+            if order_by == "updated_at":
+                return datetime.fromisoformat(values[0]), int(values[1])
+            return (int(values[0]),)
+        except Exception:
+            raise ValueError(f"Invalid cursor for order_by={order_by}")
+    
+    def _select(self, fields: Tuple[str, ...], order_by: str, after: Optional[Tuple[Any, ...]],
+                category: Optional[str], min_price: Optional[float], max_price: Optional[float], limit: int):
+        if order_by not in ITEM_ORDERINGS:
+            raise ValueError(f"Unknown order_by '{order_by}'; expected one of {list(ITEM_ORDERINGS)}")
+        sort_columns = ITEM_ORDERINGS[order_by]
+        # The sort key is always read so the next cursor can be built
+        columns = tuple(dict.fromkeys((*fields, *sort_columns)))
+        query = select(*(getattr(ItemDB, column) for column in columns))
+        
+        conditions = []
+        if category is not None:
+            conditions.append(ItemDB.category == category)
+        if min_price is not None:
+            conditions.append(ItemDB.price >= min_price)
+        if max_price is not None:
+            conditions.append(ItemDB.price <= max_price)
+        if after is not None:
+            if order_by == "updated_at":
+                updated_at, item_id = after
+                # The leading >= is an index range; the OR breaks ties on id
+                conditions.append(ItemDB.updated_at >= updated_at)
+                conditions.append(or_(ItemDB.updated_at > updated_at, ItemDB.id > item_id))
+            else:
+                conditions.append(ItemDB.id > after[0])
+        if conditions:
+            query = query.where(and_(*conditions))
+        
+        # Category filters walk ix_items_category_*; price ranges can use ix_items_price_id instead
+        # when they are selective enough for SQLite to prefer sorting the matches
+        return query.order_by(*(getattr(ItemDB, column) for column in sort_columns)).limit(limit)
+    
+    async def _fetch(self, session: AsyncSession, fields: Tuple[str, ...], order_by: str,
+                     after: Optional[Tuple[Any, ...]], limit: int, **filters) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Fetch up to `limit` rows; returns (projected rows, full row of the last one)"""
+        result = await session.execute(self._select(fields, order_by, after, limit=limit, **filters))
+        rows = [row._asdict() for row in result]
+        last = rows[-1] if len(rows) == limit else None
+        return [{field: row[field] for field in fields} for row in rows], last
+    
+    async def get_page(self, session: AsyncSession, limit: int, cursor: Optional[str] = None, order_by: str = "id",
+                       fields: Optional[str] = None, category: Optional[str] = None, min_price: Optional[float] = None,
+                       max_price: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get one page of items and the cursor for the next one (None on the last page)"""
+        projection = self.parse_fields(fields)
+        after = self.decode_cursor(cursor, order_by) if cursor else None
+        rows, last = await self._fetch(
+            session, projection, order_by, after, min(limit, self.max_limit),
+            category=category, min_price=min_price, max_price=max_price
+        )
+        return rows, self.encode_cursor(order_by, last) if last else None
+    
+    def export(self, cursor: Optional[str] = None, order_by: str = "id", fields: Optional[str] = None,
+               category: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, json_array: bool = False) -> AsyncIterator[bytes]:
+        """Stream every matching item as NDJSON (or one JSON array), one keyset batch at a time
+        
+        Arguments are validated here, before the response starts.
+        """
+        projection = self.parse_fields(fields)
+        after = self.decode_cursor(cursor, order_by) if cursor else None
+        self._select(projection, order_by, after, category, min_price, max_price, 1)
+        encoder = msgspec.json.Encoder()
+        
+        async def lines():
+            nonlocal after
+            first = True
+            if json_array:
+                yield b"["
+            while True:
+                # A short session per batch so no read transaction spans the whole export
+                async with self.session_factory() as session:
+                    rows, last = await self._fetch(
+                        session, projection, order_by, after, self.export_batch_size,
+                        category=category, min_price=min_price, max_price=max_price
+                    )
+                if rows and json_array:
+                    yield (b"" if first else b",") + b",".join(encoder.encode(row) for row in rows)
+                    first = False
+                elif rows:
+                    yield b"".join(encoder.encode(row) + b"\n" for row in rows)
+                if last is None:
+                    break
+                after = tuple(last[column] for column in ITEM_ORDERINGS[order_by])
+            if json_array:
+                yield b"]"
+        
+        return lines()
+
+# Global item query instance
+item_query = ItemQuery(
+    AsyncSessionLocal,
+    max_limit=settings.items_max_page_size,
+    export_batch_size=settings.items_export_batch_size
+)
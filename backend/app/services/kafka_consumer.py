@@ -1,79 +1,280 @@
-import json
 import logging
-from kafka import KafkaConsumer
-from typing import Dict, Any, Callable, List
-from threading import Thread
+import time
+import msgspec
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from kafka import KafkaConsumer, ConsumerRebalanceListener
+from kafka.structs import OffsetAndMetadata
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from threading import Thread, Lock
 from app.config import settings
+from app.models.events import WIRE_FORMAT_HEADER, WIRE_FORMAT_JSON
 
 logger = logging.getLogger(__name__)
 
+class SnapshotSeekListener(ConsumerRebalanceListener):
+    """Rewinds assigned partitions to the offsets a restored memory snapshot reflects"""
+    
+    def __init__(self, start_offsets: Dict[Tuple[str, int], int], replay_until: Dict[Tuple[str, int], int],
+                 persist_until: Dict[Tuple[str, int], int]):
+        self.consumer: Optional[KafkaConsumer] = None
+        self.start_offsets = dict(start_offsets)
+        self.replay_until = replay_until
+        self.persist_until = persist_until
+    
+    def on_partitions_revoked(self, revoked):
+        pass
+    
+    def on_partitions_assigned(self, assigned):
+        for topic_partition in assigned:
+            key = (topic_partition.topic, topic_partition.partition)
+            offset = self.start_offsets.pop(key, None)
+            if offset is None:
+                continue
+            
+            committed = self.consumer.committed(topic_partition)
+            if committed is None or committed > offset:
+                # Records before the committed offset are already in the database,
+                # so they are re-read into memory only
+                if committed is not None:
+                    self.replay_until[key] = committed
+                self.consumer.seek(topic_partition, offset)
+                logger.info(f"Resuming {topic_partition} from snapshot offset {offset} (committed {committed})")
+            elif committed < offset:
+                # The snapshot already holds records up to its offset in memory, but
+                # only those below the committed offset are known to be stored
+                self.persist_until[key] = offset
+                logger.info(f"Resuming {topic_partition} from committed offset {committed} (snapshot {offset})")
+
 class KafkaConsumerService:
     def __init__(self):
         self.consumers = {}
+        self.threads: Dict[str, Thread] = {}
         self.running = False
         
-    def create_consumer(self, topics: List[str], group_id: str) -> KafkaConsumer:
+        # Next offset handled per (topic, partition), and one lock per group held
+        # while a polled batch is in flight, so snapshots can pause between batches
+        self.positions: Dict[Tuple[str, int], int] = {}
+        self.batch_locks: Dict[str, Lock] = {}
+        
+    def create_consumer(self, topics: List[str], group_id: str,
+                        listener: Optional[ConsumerRebalanceListener] = None) -> KafkaConsumer:
         """Create a Kafka consumer for specific topics"""
         try:
             consumer = KafkaConsumer(
-                *topics,
                 bootstrap_servers=settings.kafka_bootstrap_servers,
                 auto_offset_reset=settings.kafka_auto_offset_reset,
                 group_id=group_id,
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-                consumer_timeout_ms=1000
+                consumer_timeout_ms=1000,
+                # Offsets are committed once the batch's rows are written (see start_consumer)
+                enable_auto_commit=False,
+                max_poll_records=settings.kafka_max_poll_records,
+                fetch_min_bytes=settings.kafka_fetch_min_bytes,
+                fetch_max_wait_ms=settings.kafka_fetch_max_wait_ms
             )
+            consumer.subscribe(topics=topics, listener=listener)
             logger.info(f"Created consumer for topics {topics} with group {group_id}")
             return consumer
         except Exception as e:
             logger.error(f"Failed to create consumer: {e}")
             return None
     
-    def start_consumer(self, topics: List[str], group_id: str, message_handler: Callable):
-        """Start consuming messages from topics"""
+    def start_consumer(self, topics: List[str], group_id: str, message_handler: Optional[Callable] = None,
+                       batch_handler: Optional[Callable[[List[Any], str], None]] = None,
+                       decoders: Optional[Dict[str, Dict[str, Callable[[bytes], Any]]]] = None,
+                       replay_handler: Optional[Callable[[List[Any], str], None]] = None,
+                       persist_handler: Optional[Callable[[List[Any], str], None]] = None,
+                       start_offsets: Optional[Dict[Tuple[str, int], int]] = None,
+                       write_barrier: Optional[Any] = None):
+        """Start consuming messages from topics
+        
+        batch_handler receives every polled record of one partition at once, as
+        (list of values, topic). Partitions are handled in parallel on a worker
+        pool; records within a partition stay in order. Values are decoded with
+        decoders[topic][wire format], the format coming from each record's
+        wire-format header (JSON when absent); topics without decoders are
+        decoded as plain JSON.
+        
+        Delivery is at least once. With a write_barrier (the database writer:
+        checkpoint() and is_flushed(seq)), a batch's offsets are committed only
+        once the writer has flushed every row queued while handling it; without
+        one, right after the handlers return.
+        
+        start_offsets (from a restored memory snapshot) are reconciled with the
+        group's committed offsets on assignment: records the database already
+        holds but the snapshot does not go to replay_handler (memory only), and
+        records the snapshot holds but the database may not go to
+        persist_handler (database only).
+        """
+        decoders = decoders or {}
+        replay_until: Dict[Tuple[str, int], int] = {}
+        persist_until: Dict[Tuple[str, int], int] = {}
+        listener = None
+        if start_offsets and replay_handler and persist_handler:
+            listener = SnapshotSeekListener(start_offsets, replay_until, persist_until)
+        
+        if batch_handler is None:
+            def batch_handler(messages: List[Any], topic: str):
+                for message in messages:
+                    try:
+                        message_handler(message, topic)
+                    except Exception as e:
+                        logger.error(f"Error processing message: {e}")
+        
+        def handle_partition(topic_partition, messages):
+            topic_decoders = decoders.get(topic_partition.topic, {WIRE_FORMAT_JSON: msgspec.json.decode})
+            key = (topic_partition.topic, topic_partition.partition)
+            replay_offset = replay_until.get(key)
+            persist_offset = persist_until.get(key)
+            values = []
+            replay_values = []
+            persist_values = []
+            for message in messages:
+                try:
+                    wire_format = self._wire_format(message)
+                    decode = topic_decoders.get(wire_format)
+                    if decode is None:
+                        raise ValueError(f"unsupported wire format {wire_format!r}")
+                    value = decode(message.value)
+                except Exception as e:
+                    # A malformed record is skipped rather than failing its whole batch
+                    logger.error(f"Error decoding message from {topic_partition}: {e}")
+                    continue
+                if replay_offset is not None and message.offset < replay_offset:
+                    replay_values.append(value)
+                elif persist_offset is not None and message.offset < persist_offset:
+                    persist_values.append(value)
+                else:
+                    values.append(value)
+            
+            if replay_offset is not None and messages[-1].offset + 1 >= replay_offset:
+                replay_until.pop(key, None)
+            if persist_offset is not None and messages[-1].offset + 1 >= persist_offset:
+                persist_until.pop(key, None)
+            
+            try:
+                if replay_values:
+                    replay_handler(replay_values, topic_partition.topic)
+                if persist_values:
+                    persist_handler(persist_values, topic_partition.topic)
+                if values:
+                    batch_handler(values, topic_partition.topic)
+            except Exception as e:
+                logger.error(f"Error processing batch from {topic_partition}: {e}")
+        
         def consume_messages():
-            consumer = self.create_consumer(topics, group_id)
+            consumer = self.create_consumer(topics, group_id, listener)
             if not consumer:
                 logger.error(f"Failed to create consumer for group {group_id}")
                 return
+            if listener:
+                listener.consumer = consumer
                 
             self.consumers[group_id] = consumer
+            batch_lock = self.batch_locks.setdefault(group_id, Lock())
+            executor = ThreadPoolExecutor(
+                max_workers=settings.kafka_consumer_workers,
+                thread_name_prefix=f"{group_id}-worker"
+            )
             logger.info(f"Starting consumer for group {group_id}")
             
+            # (writer checkpoint, offsets) per handled batch, oldest first
+            pending_commits = deque()
+            
+            def commit_flushed():
+                offsets = {}
+                while pending_commits and write_barrier.is_flushed(pending_commits[0][0]):
+                    offsets.update(pending_commits.popleft()[1])
+                if offsets:
+                    consumer.commit(offsets)
+            
             try:
                 while self.running:
                     try:
+                        if pending_commits:
+                            commit_flushed()
                         message_batch = consumer.poll(timeout_ms=1000)
+                        if not message_batch:
+                            continue
+                        
+                        with batch_lock:
+                            # One task per partition; waiting before the next poll keeps
+                            # per-partition (and so per-key) ordering across polls
+                            futures = [
+                                executor.submit(handle_partition, topic_partition, messages)
+                                for topic_partition, messages in message_batch.items()
+                            ]
+                            wait(futures)
+                            offsets = {
+                                topic_partition: OffsetAndMetadata(messages[-1].offset + 1, None)
+                                for topic_partition, messages in message_batch.items()
+                            }
+                            if write_barrier is not None:
+                                pending_commits.append((write_barrier.checkpoint(), offsets))
+                            else:
+                                consumer.commit(offsets)
+                            for topic_partition, messages in message_batch.items():
+                                self.positions[(topic_partition.topic, topic_partition.partition)] = messages[-1].offset + 1
                         
-                        for topic_partition, messages in message_batch.items():
-                            for message in messages:
-                                try:
-                                    message_handler(message.value, message.topic)
-                                except Exception as e:
-                                    logger.error(f"Error processing message: {e}")
-                                    
                     except Exception as e:
                         logger.error(f"Error in consumer loop: {e}")
-                        
+                
             except KeyboardInterrupt:
                 logger.info("Consumer interrupted")
             finally:
+                executor.shutdown(wait=True)
+                # The writer is still running during shutdown; give it a few flushes to catch up
+                deadline = time.monotonic() + settings.kafka_consumer_commit_timeout_seconds
+                while pending_commits and time.monotonic() < deadline:
+                    try:
+                        commit_flushed()
+                    except Exception as e:
+                        logger.error(f"Error committing offsets for group {group_id}: {e}")
+                        break
+                    time.sleep(0.05)
+                if pending_commits:
+                    # Redelivered on the next start rather than lost
+                    logger.warning(f"Consumer {group_id} closed with {len(pending_commits)} uncommitted batches")
                 consumer.close()
                 logger.info(f"Consumer {group_id} closed")
         
         self.running = True
-        thread = Thread(target=consume_messages, daemon=True)
+        thread = Thread(target=consume_messages, name=f"{group_id}-consumer", daemon=True)
+        self.threads[group_id] = thread
         thread.start()
         return thread
     
-    def stop_all_consumers(self):
-        """Stop all running consumers"""
+    def _wire_format(self, message) -> str:
+        """Read a record's wire-format header"""
+        for key, value in message.headers or ():
+            if key == WIRE_FORMAT_HEADER:
+                return value.decode('utf-8')
+        return WIRE_FORMAT_JSON
+    
+    @contextmanager
+    def paused(self):
+        """Hold every consumer between batches; yields the offsets handled so far"""
+        locks = [self.batch_locks[group_id] for group_id in sorted(self.batch_locks)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield dict(self.positions)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    
+    def stop_all_consumers(self, timeout: float = 10):
+        """Stop all running consumers and wait for their in-flight batches"""
         self.running = False
-        for group_id, consumer in self.consumers.items():
-            try:
-                consumer.close()
+        # Each loop finishes its current batch and closes its own consumer
+        # (consumers are not thread-safe, so they are never closed from here)
+        for group_id, thread in self.threads.items():
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.warning(f"Consumer {group_id} did not stop within {timeout}s")
+            else:
                 logger.info(f"Stopped consumer {group_id}")
-            except Exception as e:
-                logger.error(f"Error stopping consumer {group_id}: {e}")
+        self.threads = {}
 
 kafka_consumer_service = KafkaConsumerService()
\ No newline at end of file
@@ -1,23 +1,67 @@
-import json
 import logging
+import queue
+import threading
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
 from typing import Dict, Any, Optional
 from app.config import settings
+from app.models.events import (
+    encode_event, encode_binary_event, BINARY_RECORD_TYPES, API_METRICS_SUMMARY_TYPE,
+    WIRE_FORMAT_HEADER, WIRE_FORMAT_JSON, WIRE_FORMAT_MSGPACK_V1
+)
 
 logger = logging.getLogger(__name__)
 
 class KafkaService:
     def __init__(self):
+        # Telemetry producer (batched, configurable acks) and a separate producer for
+        # records sent synchronously, which keeps acks='all' and in-order retries
         self.producer = None
-        self._connect()
+        self.reliable_producer = None
+        
+        # Bounded queue between request handlers and the background sender
+        self.emit_queue = queue.Queue(maxsize=settings.kafka_emit_queue_size)
+        self.sender_thread = None
+        self.running = False
+        # Counters are bumped from request threads, the sender and the producer I/O thread
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "dropped": 0,
+            "send_errors": 0,
+            "backpressure_events": 0,
+            "batches": 0,
+            "queue_high_watermark": 0
+        }
+        
+        self.wire_format = settings.kafka_wire_format
+        if self.wire_format not in (WIRE_FORMAT_JSON, WIRE_FORMAT_MSGPACK_V1):
+            logger.warning(f"Unknown Kafka wire format {self.wire_format!r}, using JSON")
+            self.wire_format = WIRE_FORMAT_JSON
+    
+    def start(self):
+        """Connect the producer and start the background sender (called from app startup)"""
+        if self.producer is None:
+            self._connect()
+        if settings.kafka_async_emit and not self.running:
+            self._start_sender()
     
     def _connect(self):
-        """Initialize Kafka producer"""
+        """Initialize the Kafka producers"""
         try:
+            acks = settings.kafka_producer_acks
             self.producer = KafkaProducer(
                 bootstrap_servers=settings.kafka_bootstrap_servers,
-                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                key_serializer=lambda k: str(k).encode('utf-8') if k else None,
+                acks=int(acks) if acks.isdigit() else acks,
+                retries=3,
+                linger_ms=settings.kafka_linger_ms,
+                batch_size=settings.kafka_batch_size,
+                compression_type=settings.kafka_compression_type
+            )
+            self.reliable_producer = KafkaProducer(
+                bootstrap_servers=settings.kafka_bootstrap_servers,
                 key_serializer=lambda k: str(k).encode('utf-8') if k else None,
                 acks='all',
                 retries=3,
@@ -26,16 +70,20 @@ class KafkaService:
             logger.info("Kafka producer connected successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Kafka: {e}")
+            if self.producer:
+                self.producer.close()
             self.producer = None
+            self.reliable_producer = None
     
     def send_message(self, topic: str, message: Dict[str, Any], key: Optional[str] = None):
-        """Send message to Kafka topic"""
-        if not self.producer:
+        """Send message to Kafka topic and wait for all in-sync replicas to acknowledge it"""
+        if not self.reliable_producer:
             logger.warning("Kafka producer not available, skipping message")
             return False
         
         try:
-            future = self.producer.send(topic, value=message, key=key)
+            value, headers = self._encode(topic, message)
+            future = self.reliable_producer.send(topic, value=value, key=key, headers=headers)
             # Wait for message to be sent (optional, can be async)
             record_metadata = future.get(timeout=1)
             logger.debug(f"Message sent to {topic}: {record_metadata}")
@@ -44,10 +92,114 @@ class KafkaService:
             logger.error(f"Failed to send message to {topic}: {e}")
             return False
     
+    def _encode(self, topic: str, message: Dict[str, Any]):
+        """Encode a message for the wire, returning (value, headers)"""
+        # Summaries have no binary layout and are rare, so they always go as JSON
+        if (self.wire_format != WIRE_FORMAT_JSON and topic in BINARY_RECORD_TYPES
+                and message.get("type") != API_METRICS_SUMMARY_TYPE):
+            return encode_binary_event(topic, message), [(WIRE_FORMAT_HEADER, self.wire_format.encode('utf-8'))]
+        return encode_event(message), None
+    
+    def emit(self, topic: str, message: Dict[str, Any], key: Optional[str] = None):
+        """Queue a telemetry message without waiting on the broker"""
+        if not settings.kafka_async_emit:
+            return self.send_message(topic, message, key)
+        
+        if not self.producer:
+            self._count("dropped")
+            return False
+        
+        try:
+            self.emit_queue.put_nowait((topic, message, key))
+        except queue.Full:
+            with self.stats_lock:
+                self.stats["dropped"] += 1
+                self.stats["backpressure_events"] += 1
+            return False
+        
+        depth = self.emit_queue.qsize()
+        with self.stats_lock:
+            self.stats["enqueued"] += 1
+            if depth > self.stats["queue_high_watermark"]:
+                self.stats["queue_high_watermark"] = depth
+            if depth >= self.emit_queue.maxsize * settings.kafka_backpressure_threshold:
+                self.stats["backpressure_events"] += 1
+        return True
+    
+    def _count(self, stat: str, amount: int = 1):
+        """Increment a counter shared across threads"""
+        with self.stats_lock:
+            self.stats[stat] += amount
+    
+    def _start_sender(self):
+        """Start the background thread that drains the emit queue"""
+        self.running = True
+        self.sender_thread = threading.Thread(target=self._sender_loop, name="kafka-sender", daemon=True)
+        self.sender_thread.start()
+    
+    def _sender_loop(self):
+        """Drain the emit queue in batches and hand them to the producer"""
+        linger_seconds = max(settings.kafka_linger_ms, 1) / 1000
+        
+        while self.running or not self.emit_queue.empty():
+            try:
+                batch = [self.emit_queue.get(timeout=linger_seconds)]
+            except queue.Empty:
+                continue
+            
+            while len(batch) < settings.kafka_emit_max_batch:
+                try:
+                    batch.append(self.emit_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self._send_batch(batch)
+    
+    def _send_batch(self, batch):
+        """Send a batch of queued messages; the producer batches them per partition"""
+        if not self.producer:
+            self._count("dropped", len(batch))
+            return
+        
+        sent = 0
+        for topic, message, key in batch:
+            try:
+                value, headers = self._encode(topic, message)
+                self.producer.send(topic, value=value, key=key, headers=headers).add_errback(self._on_send_error, topic)
+                sent += 1
+            except Exception as e:
+                self._count("send_errors")
+                logger.error(f"Failed to send message to {topic}: {e}")
+        with self.stats_lock:
+            self.stats["sent"] += sent
+            self.stats["batches"] += 1
+    
+    def _on_send_error(self, topic: str, exc: Exception):
+        """Count delivery failures reported by the producer I/O thread"""
+        self._count("send_errors")
+        logger.error(f"Failed to deliver message to {topic}: {exc}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get producer queue and delivery counters"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "async_emit": settings.kafka_async_emit,
+            "queue_depth": self.emit_queue.qsize(),
+            "queue_capacity": self.emit_queue.maxsize,
+            "connected": self.producer is not None
+        }
+    
     def close(self):
-        """Close Kafka producer"""
-        if self.producer:
-            self.producer.close()
+        """Drain pending messages and close Kafka producer"""
+        self.running = False
+        if self.sender_thread:
+            self.sender_thread.join(timeout=5)
+        for producer in (self.producer, self.reliable_producer):
+            if producer:
+                producer.flush(timeout=5)
+                producer.close()
 
 # Global Kafka service instance
-kafka_service = KafkaService()
\ No newline at end of file
+kafka_service = KafkaService()
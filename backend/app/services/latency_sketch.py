@@ -0,0 +1,121 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class LatencySketch:
+    """Mergeable log-bucketed quantile sketch (DDSketch-style) for latencies in ms"""
+    
+    RELATIVE_ACCURACY = 0.01
+    MIN_VALUE = 0.001  # Smaller values share the lowest bucket
+    MAX_VALUE = 3_600_000.0  # Larger values share the highest bucket (1 hour)
+    
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+    MIN_KEY = math.ceil(math.log(MIN_VALUE) / LOG_GAMMA)
+    MAX_KEY = math.ceil(math.log(MAX_VALUE) / LOG_GAMMA)
+    
+    def __init__(self):
+        # Bucket key -> count; keys are clamped so memory is bounded and
+        # counts stay exactly subtractable
+        self.bins: Dict[int, float] = {}
+        self.zero_count = 0.0
+        self.count = 0.0
+    
+    @classmethod
+    def from_bins(cls, bins: Dict[int, float], zero_count: float = 0.0) -> "LatencySketch":
+        """Rebuild a sketch from serialized bins (e.g. a summary event)"""
+        sketch = cls()
+        for key, bin_count in bins.items():
+            key = min(max(int(key), cls.MIN_KEY), cls.MAX_KEY)
+            sketch.bins[key] = sketch.bins.get(key, 0) + bin_count
+        sketch.zero_count = zero_count
+        sketch.count = sum(sketch.bins.values()) + zero_count
+        return sketch
+    
+    def _key(self, value: float) -> int:
+        key = math.ceil(math.log(value) / self.LOG_GAMMA)
+        return min(max(key, self.MIN_KEY), self.MAX_KEY)
+    
+    def _value(self, key: int) -> float:
+        return 2 * self.GAMMA ** key / (self.GAMMA + 1)
+    
+    def add(self, value: float, weight: float = 1):
+        """Record a latency observation"""
+        if value <= 0:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + weight
+        self.count += weight
+    
+    def merge(self, other: "LatencySketch"):
+        """Add another sketch's counts into this one"""
+        for key, bin_count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + bin_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+    
+    def subtract(self, other: "LatencySketch"):
+        """Remove counts previously merged from another sketch"""
+        for key, bin_count in other.bins.items():
+            remaining = self.bins.get(key, 0) - bin_count
+            if remaining > 0:
+                self.bins[key] = remaining
+            else:
+                self.bins.pop(key, None)
+        self.zero_count = max(self.zero_count - other.zero_count, 0)
+        self.count = max(self.count - other.count, 0)
+    
+    def items(self) -> List[Tuple[float, float]]:
+        """Get (representative latency, count) per non-empty bucket, zeros first"""
+        items = [(0.0, self.zero_count)] if self.zero_count > 0 else []
+        items.extend((self._value(key), bin_count) for key, bin_count in sorted(self.bins.items()))
+        return items
+    
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Get several quantiles in one ascending pass over the buckets"""
+        qs = list(qs)
+        results: List[Optional[float]] = [None] * len(qs)
+        if self.count <= 0:
+            return results
+        
+        # Ranks to find, in ascending order
+        targets = sorted((q * (self.count - 1), i) for i, q in enumerate(qs))
+        target_idx = 0
+        cumulative = self.zero_count
+        
+        while target_idx < len(targets) and cumulative > targets[target_idx][0]:
+            results[targets[target_idx][1]] = 0.0
+            target_idx += 1
+        
+        if self.bins and target_idx < len(targets):
+            # Walk the key range directly so no sort of the bins is needed
+            for key in range(min(self.bins), max(self.bins) + 1):
+                bin_count = self.bins.get(key)
+                if not bin_count:
+                    continue
+                cumulative += bin_count
+                while target_idx < len(targets) and cumulative > targets[target_idx][0]:
+                    results[targets[target_idx][1]] = self._value(key)
+                    target_idx += 1
+                if target_idx == len(targets):
+                    break
+        
+        # Floating-point leftovers resolve to the highest bucket
+        for rank, i in targets[target_idx:]:
+            results[i] = self._value(max(self.bins)) if self.bins else 0.0
+        return results
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Get a single quantile (0 <= q <= 1)"""
+        return self.quantiles([q])[0]
+    
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Get p50/p90/p99/p999 rounded for API responses"""
+        p50, p90, p99, p999 = self.quantiles([0.5, 0.9, 0.99, 0.999])
+        return {
+            "count": round(self.count),
+            "p50": round(p50, 2) if p50 is not None else None,
+            "p90": round(p90, 2) if p90 is not None else None,
+            "p99": round(p99, 2) if p99 is not None else None,
+            "p999": round(p999, 2) if p999 is not None else None
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    from fastmcp import Client
+
+logger = logging.getLogger(__name__)
+
+class MCPSessionPool:
+    """Long-lived, health-checked MCP client sessions shared by concurrent chats"""
+    
+    def __init__(self, server: Union[Path, Any], size: int = 2, health_check_interval: float = 30):
+        # A server script path (stdio subprocess) or a FastMCP instance (in-process)
+        self.server = str(server) if isinstance(server, Path) else server
+        self.size = max(size, 1)
+        self.health_check_interval = health_check_interval
+        
+        self.clients: List[Optional["Client"]] = []
+        self.tools = None  # Cached list_tools() result
+        self.restarts = 0
+        self._next = 0
+        self._lock = asyncio.Lock()
+        self._slot_locks: List[asyncio.Lock] = []  # One per session, serializing its restarts
+        self._health_task: Optional[asyncio.Task] = None
+    
+    @property
+    def started(self) -> bool:
+        return bool(self.clients)
+    
+    async def start(self):
+        """Spawn the MCP server sessions and cache the tool list"""
+        async with self._lock:
+            if self.clients:
+                return
+            clients = []
+            try:
+                for _ in range(self.size):
+                    clients.append(await self._open_client())
+                self.tools = await clients[0].list_tools()
+            except Exception:
+                for client in clients:
+                    await self._close_client(client)
+                raise
+            self.clients = clients
+            self._slot_locks = [asyncio.Lock() for _ in clients]
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info(f"MCP session pool started with {self.size} sessions and {len(self.tools)} tools")
+    
+    async def stop(self):
+        """Close all sessions"""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for client in self.clients:
+            await self._close_client(client)
+        self.clients = []
+    
+    async def _open_client(self) -> "Client":
+        # Imported here so the app can start without loading fastmcp until chat is used
+        from fastmcp import Client
+        client = Client(self.server)
+        await client.__aenter__()
+        return client
+    
+    async def _close_client(self, client: Optional["Client"]):
+        if client is None:
+            return
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"Error closing MCP session: {e}")
+    
+    async def _restart(self, index: int, failed_client: Optional["Client"]):
+        """Replace a dead session with a fresh one, unless another task already did"""
+        async with self._slot_locks[index]:
+            if self.clients[index] is not failed_client:
+                return
+            self.clients[index] = None
+            await self._close_client(failed_client)
+            # Left empty (and skipped by _pick) if this fails; the health loop tries again
+            self.clients[index] = await self._open_client()
+            self.restarts += 1
+            logger.warning(f"Restarted MCP session {index}")
+    
+    def _pick(self) -> int:
+        """Round-robin over live sessions; MCP multiplexes requests on each one"""
+        for _ in range(len(self.clients)):
+            index = self._next % len(self.clients)
+            self._next += 1
+            if self.clients[index] is not None:
+                return index
+        raise RuntimeError("No MCP sessions available")
+    
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        """Call a tool on a warm session, restarting it and retrying once if it died"""
+        if not self.started:
+            await self.start()
+        
+        index = self._pick()
+        client = self.clients[index]
+        try:
+            return await client.call_tool(name, arguments)
+        except Exception as e:
+            if client.is_connected():
+                # The session is fine; the tool itself failed
+                raise
+            logger.warning(f"MCP session {index} failed during {name}: {e}")
+            await self._restart(index, client)
+            client = self.clients[index]
+            if client is None:
+                raise RuntimeError(f"MCP session {index} is unavailable") from e
+            return await client.call_tool(name, arguments)
+    
+    async def _health_loop(self):
+        """Ping every session periodically and restart the ones that stop answering"""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for index, client in enumerate(list(self.clients)):
+                try:
+                    if client is None:
+                        raise RuntimeError("session is down")
+                    await asyncio.wait_for(client.ping(), timeout=5)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"MCP session {index} failed health check: {e}")
+                    try:
+                        await self._restart(index, client)
+                    except Exception as restart_error:
+                        logger.error(f"Failed to restart MCP session {index}: {restart_error}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool size and restart count"""
+        return {
+            "sessions": len(self.clients),
+            "live_sessions": sum(1 for client in self.clients if client is not None),
+            "tools": len(self.tools) if self.tools else 0,
+            "restarts": self.restarts
+        }
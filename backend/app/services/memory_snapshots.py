@@ -0,0 +1,152 @@
+import logging
+import os
+import sys
+import threading
+import time
+import msgspec
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from app.config import settings
+from app.database.connection import data_dir
+from app.services.kafka_consumer import kafka_consumer_service
+from app.services.memory_storage import memory_storage
+
+logger = logging.getLogger(__name__)
+
+class MemorySnapshotter:
+    """Periodic on-disk snapshots of MemoryStorage plus the Kafka offsets they reflect"""
+    
+    FORMAT_VERSION = 2  # 2: api_metrics min/max columns
+    
+    def __init__(self, storage, consumer_service, path: Path, enabled: bool = True,
+                 interval_seconds: float = 30, max_age_seconds: float = 900):
+        self.storage = storage
+        self.consumer_service = consumer_service
+        self.path = Path(path)
+        self.enabled = enabled
+        self.interval = interval_seconds
+        self.max_age = max_age_seconds
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        
+        self.stats = {
+            "restored_from": None,
+            "restore_seconds": 0.0,
+            "snapshots_written": 0,
+            "last_snapshot_bytes": 0,
+            "last_snapshot_seconds": 0.0
+        }
+    
+    def restore(self) -> Dict[Tuple[str, int], int]:
+        """Load the latest snapshot, or preload from the database when there is no usable one
+        
+        Returns the (topic, partition) -> offset map consumers should resume from.
+        """
+        start = time.perf_counter()
+        snapshot = self._read() if self.enabled else None
+        
+        offsets: Dict[Tuple[str, int], int] = {}
+        if snapshot is not None:
+            try:
+                self.storage.restore_state(snapshot["state"])
+                offsets = {(topic, partition): offset for topic, partition, offset in snapshot["offsets"]}
+                self.stats["restored_from"] = "snapshot"
+            except Exception as e:
+                logger.warning(f"Could not restore memory snapshot {self.path}: {e}")
+                snapshot = None
+        
+        if snapshot is None:
+            self.storage.load_from_database()
+            self.stats["restored_from"] = "database"
+        
+        self.stats["restore_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Memory storage loaded from {self.stats['restored_from']} in {self.stats['restore_seconds']}s")
+        return offsets
+    
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if not self.path.exists():
+            return None
+        try:
+            snapshot = msgspec.msgpack.decode(self.path.read_bytes())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable memory snapshot {self.path}: {e}")
+            return None
+        
+        # Columns are raw machine arrays, so they are only reusable on the same layout
+        if snapshot.get("format") != self.FORMAT_VERSION or snapshot.get("byteorder") != sys.byteorder:
+            logger.info(f"Ignoring memory snapshot {self.path} written in another format")
+            return None
+        age = time.time() - snapshot.get("created_at", 0)
+        if age > self.max_age:
+            logger.info(f"Ignoring memory snapshot {self.path}: {age:.0f}s old")
+            return None
+        return snapshot
+    
+    def save(self):
+        """Write a snapshot atomically (temp file, then rename)"""
+        start = time.perf_counter()
+        # Consumers pause between batches so the state and the offsets agree
+        with self.consumer_service.paused() as positions:
+            state = self.storage.export_state()
+        
+        payload = msgspec.msgpack.encode({
+            "format": self.FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "created_at": time.time(),
+            "offsets": [(topic, partition, offset) for (topic, partition), offset in positions.items()],
+            "state": state
+        })
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_bytes(payload)
+        os.replace(temp_path, self.path)
+        
+        self.stats["snapshots_written"] += 1
+        self.stats["last_snapshot_bytes"] = len(payload)
+        self.stats["last_snapshot_seconds"] = round(time.perf_counter() - start, 3)
+    
+    def start(self):
+        """Start the periodic snapshot thread"""
+        if not self.enabled or self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="memory-snapshots", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Error writing memory snapshot: {e}")
+    
+    def stop(self):
+        """Stop the snapshot thread and write a final snapshot"""
+        if not self.enabled:
+            return
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+            self.thread = None
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Error writing final memory snapshot: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get restore and snapshot counters"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "interval_seconds": self.interval,
+            "path": str(self.path)
+        }
+
+# Global snapshotter instance
+memory_snapshotter = MemorySnapshotter(
+    memory_storage,
+    kafka_consumer_service,
+    data_dir / "memory_snapshot.msgpack",
+    enabled=settings.memory_snapshot_enabled,
+    interval_seconds=settings.memory_snapshot_interval_seconds,
+    max_age_seconds=settings.memory_snapshot_max_age_seconds
+)
@@ -1,36 +1,75 @@
 import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import deque, defaultdict
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Any, List, Optional, Callable, Union
 import json
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import desc
-from app.database.connection import sync_engine
+from app.config import settings
+from app.database.connection import read_engine
 from app.models.database import APIMetric, SystemMetric, APIError, UIError
+from app.models.events import APIMetricEvent, API_METRICS_SUMMARY_TYPE, SYSTEM_METRIC_EXTRA_FIELDS
+from app.services.latency_sketch import LatencySketch
+
+def parse_epoch(timestamp_str: Union[str, float, None]) -> Optional[float]:
+    """Parse an ISO timestamp (naive values are UTC) to epoch seconds"""
+    if isinstance(timestamp_str, (int, float)):
+        # Binary wire records already carry epoch seconds
+        return float(timestamp_str)
+    if not timestamp_str:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
 
 class TimeWindowedStorage:
     """Thread-safe time-windowed storage for metrics"""
     
-    def __init__(self, max_age_minutes: int = 120):
-        self.max_age = timedelta(minutes=max_age_minutes)
+    def __init__(self, max_age_minutes: int = 120,
+                 on_add: Optional[Callable[[float, Dict[str, Any]], None]] = None,
+                 on_evict: Optional[Callable[[float, Dict[str, Any]], None]] = None):
+        self.max_age_seconds = max_age_minutes * 60
         self.data = deque()
+        self.timestamps = deque()  # Epoch seconds, parallel to data
         self.lock = threading.Lock()
+        
+        # Hooks for incremental aggregates, called with the lock held
+        self.on_add = on_add
+        self.on_evict = on_evict
     
-    def add(self, item: Dict[str, Any]):
+    def add(self, item: Dict[str, Any]) -> Optional[float]:
         """Add item with current timestamp"""
         with self.lock:
             # Add timestamp if not present
             if 'timestamp' not in item:
                 item['timestamp'] = datetime.utcnow().isoformat()
             
+            epoch = parse_epoch(item.get('timestamp'))
+            if epoch is None:
+                # Items with invalid timestamps are never kept
+                return None
+            
             self.data.append(item)
+            self.timestamps.append(epoch)
+            if self.on_add:
+                self.on_add(epoch, item)
             self._cleanup_old_data()
+            return epoch
     
     def get_recent(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get most recent items"""
         with self.lock:
             self._cleanup_old_data()
-            return list(self.data)[-limit:]
+            recent = list(islice(reversed(self.data), limit))
+            recent.reverse()
+            return recent
     
     def get_all(self) -> List[Dict[str, Any]]:
         """Get all items in window"""
@@ -38,36 +77,357 @@ class TimeWindowedStorage:
             self._cleanup_old_data()
             return list(self.data)
     
+    def get_since(self, since_epoch: float) -> List[Dict[str, Any]]:
+        """Get items at or after an epoch time, oldest first"""
+        with self.lock:
+            self._cleanup_old_data()
+            items = []
+            for epoch, item in zip(reversed(self.timestamps), reversed(self.data)):
+                if epoch < since_epoch:
+                    break
+                items.append(item)
+            items.reverse()
+            return items
+    
+    def evict_expired(self):
+        """Drop items that have aged out of the window"""
+        with self.lock:
+            self._cleanup_old_data()
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Copy the window for a snapshot"""
+        with self.lock:
+            return {
+                "timestamps": list(self.timestamps),
+                "items": list(self.data)
+            }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """Replace the window with a snapshot's contents (hooks are not called)"""
+        with self.lock:
+            self.timestamps = deque(state["timestamps"])
+            self.data = deque(state["items"])
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
     def _cleanup_old_data(self):
         """Remove items older than max_age"""
-        cutoff_time = datetime.utcnow() - self.max_age
+        cutoff = time.time() - self.max_age_seconds
         
-        while self.data:
-            try:
-                # Parse timestamp from first item
-                timestamp_str = self.data[0].get('timestamp')
-                if timestamp_str:
-                    item_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    if item_time < cutoff_time:
-                        self.data.popleft()
-                    else:
-                        break
-                else:
-                    # Remove items without timestamp
-                    self.data.popleft()
-            except (ValueError, TypeError):
-                # Remove items with invalid timestamp
-                self.data.popleft()
+        while self.timestamps and self.timestamps[0] < cutoff:
+            epoch = self.timestamps.popleft()
+            item = self.data.popleft()
+            if self.on_evict:
+                self.on_evict(epoch, item)
+
+class ColumnarMetricStorage:
+    """Thread-safe time-windowed storage for API metrics, kept as typed columns"""
+    
+    COMPACT_THRESHOLD = 4096
+    OVERFLOW_PATH = "__overflow__"
+    OVERFLOW_METHOD = "__overflow__"
+    MAX_METHODS = 256  # method_ids holds unsigned bytes
+    MAX_STATUS_CODE = 65535  # status_codes holds unsigned shorts
+    
+    def __init__(self, max_age_minutes: int = 120, max_paths: int = 200,
+                 on_add: Optional[Callable[[float, int, int, float, bool, float, Any], None]] = None,
+                 on_evict: Optional[Callable[[float, int, int, float, bool, float, Any], None]] = None):
+        self.max_age_seconds = max_age_minutes * 60
+        self.lock = threading.Lock()
+        
+        # One entry per metric; rows before head have been evicted
+        self.timestamps = array('d')  # Epoch seconds
+        self.response_times = array('f')  # Milliseconds (mean for summary rows)
+        self.status_codes = array('H')
+        self.success = array('b')
+        self.path_ids = array('I')
+        self.method_ids = array('B')
+        self.weights = array('f')  # Requests each row stands for (1 unless a summary)
+        self.response_time_mins = array('f')  # Equal to response_times unless a summary
+        self.response_time_maxes = array('f')
+        self.head = 0
+        
+        # Interned strings referenced by the id columns; id 0 is the overflow
+        # bucket shared by paths seen after max_paths distinct ones
+        self.max_paths = max_paths
+        self.paths: List[str] = [self.OVERFLOW_PATH]
+        self.path_index: Dict[str, int] = {self.OVERFLOW_PATH: 0}
+        self.methods: List[str] = []
+        self.method_index: Dict[str, int] = {}
+        
+        # Hooks for incremental aggregates, called with the lock held
+        self.on_add = on_add
+        self.on_evict = on_evict
+    
+    def add(self, item: Dict[str, Any]) -> Optional[float]:
+        """Add an API metric event"""
+        data = item.get('data', {})
+        epoch = parse_epoch(item.get('timestamp')) if 'timestamp' in item else time.time()
+        if epoch is None:
+            # Items with invalid timestamps are never kept
+            return None
+        
+        return self.add_row(
+            epoch,
+            data.get('method') or '',
+            data.get('path') or '',
+            data.get('status_code') or 0,
+            data.get('response_time_ms') or 0.0,
+            bool(data.get('success', False)),
+            data.get('count') or 1.0,
+            response_time_min=data.get('response_time_min'),
+            response_time_max=data.get('response_time_max')
+        )
+    
+    def add_row(self, epoch: float, method: str, path: str, status_code: int,
+                response_time_ms: float, success: bool, weight: float = 1.0,
+                detail: Any = None, response_time_min: Optional[float] = None,
+                response_time_max: Optional[float] = None) -> float:
+        """Append one metric from already-decoded fields
+        
+        detail is passed to on_add untouched (e.g. a summary's latency sketch);
+        min/max default to response_time_ms (a summary's mean).
+        """
+        with self.lock:
+            # Everything that can fail happens before the first column changes, so the columns stay aligned
+            path_id = self.intern_path(path)
+            method_id = self._intern_method(method)
+            if not 0 <= status_code <= self.MAX_STATUS_CODE:
+                status_code = 0
+            values = (
+                epoch, response_time_ms, status_code, 1 if success else 0, path_id, method_id, weight,
+                response_time_ms if response_time_min is None else response_time_min,
+                response_time_ms if response_time_max is None else response_time_max
+            )
+            
+            if len(self.timestamps) > self.head and epoch < self.timestamps[-1]:
+                # Partitions are consumed in parallel, so rows arrive only roughly in time
+                # order; a late row is inserted in place (usually near the end) to keep the
+                # timestamps sorted for bisect-based range queries and eviction
+                index = bisect_right(self.timestamps, epoch, self.head)
+                for column, value in zip(self._columns().values(), values):
+                    column.insert(index, value)
+            else:
+                index = len(self.timestamps)
+                for column, value in zip(self._columns().values(), values):
+                    column.append(value)
+            
+            if self.on_add:
+                # Pass the stored float32 values so eviction subtracts exactly what was added
+                self.on_add(epoch, path_id, status_code, self.response_times[index], success,
+                            self.weights[index], detail)
+            self._cleanup_old_data()
+            return epoch
+    
+    def intern_path(self, path: str) -> int:
+        """Get the id for a path, assigning one on first use"""
+        path_id = self.path_index.get(path)
+        if path_id is None:
+            if len(self.paths) > self.max_paths:
+                return 0
+            path_id = len(self.paths)
+            self.paths.append(path)
+            self.path_index[path] = path_id
+        return path_id
+    
+    def _intern_method(self, method: str) -> int:
+        method_id = self.method_index.get(method)
+        if method_id is None:
+            if len(self.methods) >= self.MAX_METHODS - 1:
+                # The last id is shared by every method seen after the others
+                method = self.OVERFLOW_METHOD
+                method_id = self.method_index.get(method)
+                if method_id is not None:
+                    return method_id
+            method_id = len(self.methods)
+            self.methods.append(method)
+            self.method_index[method] = method_id
+        return method_id
+    
+    def get_recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get most recent items"""
+        with self.lock:
+            self._cleanup_old_data()
+            start = max(self.head, len(self.timestamps) - limit)
+            return [self._row_to_dict(i) for i in range(start, len(self.timestamps))]
+    
+    def get_all(self) -> List[Dict[str, Any]]:
+        """Get all items in window"""
+        with self.lock:
+            self._cleanup_old_data()
+            return [self._row_to_dict(i) for i in range(self.head, len(self.timestamps))]
+    
+    def summarize_since(self, since_epoch: float) -> Dict[str, Any]:
+        """Aggregate counts and response times overall and per path since an epoch time"""
+        with self.lock:
+            self._cleanup_old_data()
+            start = bisect_left(self.timestamps, since_epoch, self.head)
+            
+            count = 0
+            success = 0
+            response_time_sum = 0.0
+            response_time_min = float('inf')
+            response_time_max = 0.0
+            per_path: Dict[int, List[float]] = {}  # Path id -> [count, sum, max, errors]
+            
+            for i in range(start, len(self.timestamps)):
+                response_time = self.response_times[i]
+                weight = self.weights[i]
+                ok = self.success[i]
+                count += weight
+                if ok:
+                    success += weight
+                response_time_sum += response_time * weight
+                low = self.response_time_mins[i]
+                high = self.response_time_maxes[i]
+                if low < response_time_min:
+                    response_time_min = low
+                if high > response_time_max:
+                    response_time_max = high
+                
+                path_stats = per_path.get(self.path_ids[i])
+                if path_stats is None:
+                    path_stats = per_path[self.path_ids[i]] = [0, 0.0, 0.0, 0]
+                path_stats[0] += weight
+                path_stats[1] += response_time * weight
+                if high > path_stats[2]:
+                    path_stats[2] = high
+                if not ok:
+                    path_stats[3] += weight
+            
+            return {
+                "count": count,
+                "success": success,
+                "response_time_sum": response_time_sum,
+                "response_time_min": response_time_min if count else 0.0,
+                "response_time_max": response_time_max,
+                "paths": {
+                    self.paths[path_id]: {
+                        "count": stats[0],
+                        "response_time_sum": stats[1],
+                        "response_time_max": stats[2],
+                        "errors": stats[3]
+                    } for path_id, stats in per_path.items()
+                }
+            }
+    
+    def evict_expired(self):
+        """Drop items that have aged out of the window"""
+        with self.lock:
+            self._cleanup_old_data()
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Copy the live rows for a snapshot; columns are raw array bytes"""
+        with self.lock:
+            return self._export_rows()
+    
+    def _export_rows(self) -> Dict[str, Any]:
+        """Copy the live rows; the caller holds the lock"""
+        return {
+            "columns": {
+                name: column[self.head:].tobytes()
+                for name, column in self._columns().items()
+            },
+            "paths": list(self.paths),
+            "methods": list(self.methods)
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """Replace the rows with a snapshot's contents (hooks are not called)"""
+        with self.lock:
+            columns = {}
+            for name, column in self._columns().items():
+                restored = array(column.typecode)
+                restored.frombytes(state["columns"][name])
+                columns[name] = restored
+            if len({len(column) for column in columns.values()}) != 1:
+                raise ValueError("snapshot columns have different lengths")
+            
+            for name, column in columns.items():
+                setattr(self, name, column)
+            self.head = 0
+            self.paths = list(state["paths"])
+            self.path_index = {path: path_id for path_id, path in enumerate(self.paths)}
+            self.methods = list(state["methods"])
+            self.method_index = {method: method_id for method_id, method in enumerate(self.methods)}
+    
+    def _columns(self) -> Dict[str, array]:
+        return {
+            "timestamps": self.timestamps,
+            "response_times": self.response_times,
+            "status_codes": self.status_codes,
+            "success": self.success,
+            "path_ids": self.path_ids,
+            "method_ids": self.method_ids,
+            "weights": self.weights,
+            "response_time_mins": self.response_time_mins,
+            "response_time_maxes": self.response_time_maxes
+        }
+    
+    def __len__(self) -> int:
+        return len(self.timestamps) - self.head
+    
+    def _row_to_dict(self, i: int) -> Dict[str, Any]:
+        """Build the event dict served to dashboard consumers"""
+        data = {
+            'method': self.methods[self.method_ids[i]],
+            'path': self.paths[self.path_ids[i]],
+            'status_code': self.status_codes[i],
+            'response_time_ms': round(self.response_times[i], 2),
+            'success': bool(self.success[i])
+        }
+        if self.weights[i] != 1:
+            data['count'] = round(self.weights[i], 2)
+        if self.response_time_mins[i] != self.response_times[i] or self.response_time_maxes[i] != self.response_times[i]:
+            data['response_time_min'] = round(self.response_time_mins[i], 2)
+            data['response_time_max'] = round(self.response_time_maxes[i], 2)
+        return {
+            'timestamp': datetime.utcfromtimestamp(self.timestamps[i]).isoformat(),
+            'data': data
+        }
+    
+    def _cleanup_old_data(self):
+        """Remove items older than max_age"""
+        cutoff = time.time() - self.max_age_seconds
+        end = bisect_left(self.timestamps, cutoff, self.head)
+        
+        if end == self.head:
+            return
+        
+        if self.on_evict:
+            for i in range(self.head, end):
+                self.on_evict(
+                    self.timestamps[i],
+                    self.path_ids[i],
+                    self.status_codes[i],
+                    self.response_times[i],
+                    bool(self.success[i]),
+                    self.weights[i],
+                    None
+                )
+        self.head = end
+        
+        # Reclaim evicted rows once they make up half of the buffer
+        if self.head >= self.COMPACT_THRESHOLD and self.head * 2 >= len(self.timestamps):
+            for column in self._columns().values():
+                del column[:self.head]
+            self.head = 0
 
 class MemoryStorage:
     """Central in-memory storage for all metrics"""
     
     def __init__(self):
         # Initialize database session
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
         
         # Time-windowed storage for different metric types
-        self.api_metrics = TimeWindowedStorage(max_age_minutes=120)  # 2 hours
+        self.api_metrics = ColumnarMetricStorage(
+            max_age_minutes=120,  # 2 hours
+            max_paths=settings.metrics_max_routes,
+            on_add=self._on_api_metric_added,
+            on_evict=self._on_api_metric_evicted
+        )
         self.system_metrics = TimeWindowedStorage(max_age_minutes=60)  # 1 hour
         self.api_errors = TimeWindowedStorage(max_age_minutes=240)  # 4 hours
         self.ui_errors = TimeWindowedStorage(max_age_minutes=240)  # 4 hours
@@ -92,38 +452,53 @@ class MemoryStorage:
         }
         self.stats_lock = threading.Lock()
         
-        # Load existing data from database
-        self._load_from_database()
+        # Bumped on every write so snapshot readers can tell when data changed
+        self.version = 0
+        
+        # Running API aggregates, maintained on add and eviction
+        self.api_totals = {
+            "count": 0,
+            "success": 0,
+            "response_time_sum": 0.0
+        }
+        self.api_minute_counts = defaultdict(int)  # Epoch minute -> request count
+        
+        # Latency sketches per route over the window, plus one per minute so
+        # expired minutes can be subtracted back out
+        self.latency_window: Dict[int, LatencySketch] = {}  # Path id -> sketch
+        self.latency_overall = LatencySketch()
+        self.latency_minutes: Dict[int, Dict[int, LatencySketch]] = {}  # Epoch minute -> path id -> sketch
     
-    def _load_from_database(self):
+    def load_from_database(self):
         """Load recent metrics from database into memory storage"""
         try:
             db = self.SessionLocal()
             
             # Load API metrics from last 2 hours
             cutoff_time = datetime.utcnow() - timedelta(minutes=120)
+            # Oldest first: the columnar window evicts by binary search on time
             api_metrics = db.query(APIMetric).filter(
                 APIMetric.timestamp >= cutoff_time
-            ).order_by(desc(APIMetric.timestamp)).all()
+            ).order_by(APIMetric.timestamp).all()
             
             for metric in api_metrics:
-                metric_data = {
-                    'timestamp': metric.timestamp.isoformat(),
-                    'data': {
-                        'method': metric.method,
-                        'path': metric.path,
-                        'status_code': metric.status_code,
-                        'response_time_ms': metric.response_time_ms,
-                        'success': metric.success
-                    }
-                }
-                self.api_metrics.add(metric_data)
+                self.api_metrics.add_row(
+                    metric.timestamp.replace(tzinfo=timezone.utc).timestamp(),
+                    metric.method or '',
+                    metric.path or '',
+                    metric.status_code or 0,
+                    metric.response_time_ms or 0.0,
+                    bool(metric.success),
+                    metric.weight or 1.0,
+                    response_time_min=metric.response_time_min,
+                    response_time_max=metric.response_time_max
+                )
             
             # Load system metrics from last 1 hour
             cutoff_time = datetime.utcnow() - timedelta(minutes=60)
             system_metrics = db.query(SystemMetric).filter(
                 SystemMetric.timestamp >= cutoff_time
-            ).order_by(desc(SystemMetric.timestamp)).all()
+            ).order_by(SystemMetric.timestamp).all()
             
             for metric in system_metrics:
                 metric_data = {
@@ -132,7 +507,9 @@ class MemoryStorage:
                         'cpu_percent': metric.cpu_percent,
                         'memory_percent': metric.memory_percent,
                         'disk_usage': metric.disk_usage,
-                        'process_memory': metric.process_memory
+                        'process_memory': metric.process_memory,
+                        'cpu_per_core': json.loads(metric.cpu_per_core) if metric.cpu_per_core else None,
+                        **{field: getattr(metric, field) for field in SYSTEM_METRIC_EXTRA_FIELDS if field != 'cpu_per_core'}
                     }
                 }
                 self.system_metrics.add(metric_data)
@@ -141,7 +518,7 @@ class MemoryStorage:
             cutoff_time = datetime.utcnow() - timedelta(minutes=240)
             api_errors = db.query(APIError).filter(
                 APIError.timestamp >= cutoff_time
-            ).order_by(desc(APIError.timestamp)).all()
+            ).order_by(APIError.timestamp).all()
             
             for error in api_errors:
                 error_data = {
@@ -158,7 +535,7 @@ class MemoryStorage:
             cutoff_time = datetime.utcnow() - timedelta(minutes=240)
             ui_errors = db.query(UIError).filter(
                 UIError.timestamp >= cutoff_time
-            ).order_by(desc(UIError.timestamp)).all()
+            ).order_by(UIError.timestamp).all()
             
             for error in ui_errors:
                 error_data = {
@@ -176,63 +553,216 @@ class MemoryStorage:
             self._update_api_stats()
             self._update_system_stats()
             self._update_ui_stats()
-            
+        
         except Exception as e:
             print(f"Error loading data from database: {e}")
         finally:
             if 'db' in locals():
                 db.close()
     
+    def export_state(self) -> Dict[str, Any]:
+        """Copy the windows and running aggregates for a snapshot"""
+        # Same lock order as the API hooks: window first, then aggregates
+        with self.api_metrics.lock, self.stats_lock:
+            api_state = self.api_metrics._export_rows()
+            aggregates = {
+                "api_totals": dict(self.api_totals),
+                "api_minute_counts": list(self.api_minute_counts.items()),
+                "latency_minutes": [
+                    (minute, path_id, sketch.bins, sketch.zero_count)
+                    for minute, minute_sketches in self.latency_minutes.items()
+                    for path_id, sketch in minute_sketches.items()
+                ]
+            }
+        
+        return {
+            "api_metrics": api_state,
+            "system_metrics": self.system_metrics.export_state(),
+            "api_errors": self.api_errors.export_state(),
+            "ui_errors": self.ui_errors.export_state(),
+            **aggregates
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """Replace all windows and aggregates with a snapshot, then expire what aged out since"""
+        self.api_metrics.restore_state(state["api_metrics"])
+        self.system_metrics.restore_state(state["system_metrics"])
+        self.api_errors.restore_state(state["api_errors"])
+        self.ui_errors.restore_state(state["ui_errors"])
+        
+        with self.stats_lock:
+            self.api_totals = dict(state["api_totals"])
+            self.api_minute_counts = defaultdict(int, {int(minute): count for minute, count in state["api_minute_counts"]})
+            self.latency_minutes = {}
+            self.latency_window = {}
+            self.latency_overall = LatencySketch()
+            for minute, path_id, bins, zero_count in state["latency_minutes"]:
+                sketch = LatencySketch.from_bins(bins, zero_count)
+                self.latency_minutes.setdefault(minute, {})[path_id] = sketch
+                self.latency_window.setdefault(path_id, LatencySketch()).merge(sketch)
+                self.latency_overall.merge(sketch)
+        
+        # Eviction runs the normal hooks, so aggregates stay in step with the windows
+        for window in (self.api_metrics, self.system_metrics, self.api_errors, self.ui_errors):
+            window.evict_expired()
+        self._update_api_stats()
+        self._update_system_stats()
+        self._update_ui_stats()
+        self.version += 1
+    
     def add_api_metric(self, metric: Dict[str, Any]):
         """Add API metric and update stats"""
         self.api_metrics.add(metric)
         self._update_api_stats()
+        self.version += 1
+    
+    def add_api_metric_event(self, event: APIMetricEvent):
+        """Add a decoded API metric event without building a dict"""
+        epoch = parse_epoch(event.timestamp) if event.timestamp else time.time()
+        if epoch is None:
+            # Items with invalid timestamps are never kept
+            return
+        
+        data = event.data
+        latency = None
+        if event.type == API_METRICS_SUMMARY_TYPE and data.latency_bins:
+            # Summaries carry their whole latency distribution
+            latency = LatencySketch.from_bins(data.latency_bins, data.latency_zero_count)
+        
+        self.api_metrics.add_row(
+            epoch,
+            data.method or '',
+            data.path or '',
+            data.status_code or 0,
+            data.response_time_ms or 0.0,
+            bool(data.success),
+            data.count,
+            latency,
+            data.response_time_min,
+            data.response_time_max
+        )
+        self._update_api_stats()
+        self.version += 1
     
     def add_system_metric(self, metric: Dict[str, Any]):
         """Add system metric and update stats"""
         self.system_metrics.add(metric)
         self._update_system_stats()
+        self.version += 1
     
     def add_api_error(self, error: Dict[str, Any]):
         """Add custom event"""
         self.api_errors.add(error)
+        self.version += 1
     
     def add_ui_error(self, error: Dict[str, Any]):
         """Add frontend error and update stats"""
         self.ui_errors.add(error)
         self._update_ui_stats()
+        self.version += 1
     
-    def _update_api_stats(self):
-        """Update aggregated API statistics"""
+    def _on_api_metric_added(self, epoch: float, path_id: int, status_code: int,
+                             response_time_ms: float, success: bool, weight: float,
+                             latency: Optional[LatencySketch]):
+        """Fold a new API metric (or summary of weight requests) into the running aggregates"""
         with self.stats_lock:
-            api_data = self.api_metrics.get_all()
+            self.api_totals["count"] += weight
+            self.api_totals["success"] += weight if success else 0
+            self.api_totals["response_time_sum"] += response_time_ms * weight
+            self.api_minute_counts[int(epoch // 60)] += weight
             
-            if not api_data:
-                return
+            minute = int(epoch // 60)
+            if minute not in self.latency_minutes:
+                # Expire on minute rollover so memory stays bounded without readers
+                self._expire_latency_minutes()
+            minute_sketches = self.latency_minutes.setdefault(minute, {})
+            for sketch in (
+                minute_sketches.setdefault(path_id, LatencySketch()),
+                self.latency_window.setdefault(path_id, LatencySketch()),
+                self.latency_overall
+            ):
+                if latency is not None:
+                    sketch.merge(latency)
+                else:
+                    sketch.add(response_time_ms, weight)
+    
+    def _on_api_metric_evicted(self, epoch: float, path_id: int, status_code: int,
+                               response_time_ms: float, success: bool, weight: float,
+                               latency: Optional[LatencySketch]):
+        """Remove an expired API metric from the running aggregates"""
+        with self.stats_lock:
+            self.api_totals["count"] -= weight
+            self.api_totals["success"] -= weight if success else 0
+            self.api_totals["response_time_sum"] -= response_time_ms * weight
+            minute = int(epoch // 60)
+            self.api_minute_counts[minute] -= weight
+            if self.api_minute_counts[minute] <= 0:
+                del self.api_minute_counts[minute]
+    
+    def _expire_latency_minutes(self):
+        """Subtract minutes that have left the API window from the latency sketches"""
+        cutoff_minute = int((time.time() - self.api_metrics.max_age_seconds) // 60)
+        
+        # Minutes are inserted roughly in time order, so expired ones sit at the front
+        expired = [minute for minute in self.latency_minutes if minute < cutoff_minute]
+        for minute in expired:
+            for path_id, sketch in self.latency_minutes.pop(minute).items():
+                self.latency_overall.subtract(sketch)
+                window_sketch = self.latency_window.get(path_id)
+                if window_sketch:
+                    window_sketch.subtract(sketch)
+                    if window_sketch.count <= 0:
+                        del self.latency_window[path_id]
+    
+    def get_latency_percentiles(self, window_minutes: Optional[float] = None) -> Dict[str, Any]:
+        """Get p50/p90/p99/p999 response times overall and per endpoint"""
+        with self.stats_lock:
+            self._expire_latency_minutes()
             
-            # Extract data field from each metric
-            metrics = [item.get('data', {}) for item in api_data if 'data' in item]
+            overall = self.latency_overall
+            per_path = self.latency_window
+            if window_minutes is not None and window_minutes * 60 < self.api_metrics.max_age_seconds:
+                # Shorter than the window: merge just the recent per-minute sketches
+                cutoff_minute = int((time.time() - window_minutes * 60) // 60)
+                overall = LatencySketch()
+                per_path = {}
+                for minute, minute_sketches in self.latency_minutes.items():
+                    if minute < cutoff_minute:
+                        continue
+                    for path_id, sketch in minute_sketches.items():
+                        overall.merge(sketch)
+                        per_path.setdefault(path_id, LatencySketch()).merge(sketch)
             
-            if not metrics:
-                return
+            endpoints = [
+                {"path": self.api_metrics.paths[path_id], **sketch.summary()}
+                for path_id, sketch in per_path.items()
+            ]
+            endpoints.sort(key=lambda e: e["p99"] or 0, reverse=True)
             
-            total_requests = len(metrics)
-            successful_requests = sum(1 for m in metrics if m.get('success', False))
-            response_times = [m.get('response_time_ms', 0) for m in metrics]
+            return {
+                "overall": overall.summary(),
+                "endpoints": endpoints
+            }
+    
+    def _update_api_stats(self):
+        """Update aggregated API statistics"""
+        with self.stats_lock:
+            total_requests = self.api_totals["count"]
+            successful_requests = self.api_totals["success"]
             
-            # Calculate requests per minute (last 10 minutes)
-            ten_minutes_ago = datetime.utcnow() - timedelta(minutes=10)
-            recent_metrics = [
-                item for item in api_data 
-                if datetime.fromisoformat(item.get('timestamp', '').replace('Z', '+00:00')) > ten_minutes_ago
-            ]
-            requests_per_minute = len(recent_metrics) / 10.0
+            # Calculate requests per minute (last 10 minute buckets)
+            current_minute = int(time.time() // 60)
+            recent_requests = sum(
+                self.api_minute_counts.get(minute, 0)
+                for minute in range(current_minute - 9, current_minute + 1)
+            )
+            requests_per_minute = recent_requests / 10.0
             
             self.aggregated_stats["api_stats"] = {
-                "total_requests": total_requests,
+                "total_requests": round(total_requests),
                 "success_rate": round((successful_requests / total_requests * 100), 2) if total_requests > 0 else 0,
-                "avg_response_time": round(sum(response_times) / len(response_times), 2) if response_times else 0,
-                "error_count": total_requests - successful_requests,
+                "avg_response_time": round(self.api_totals["response_time_sum"] / total_requests, 2) if total_requests > 0 else 0,
+                "error_count": round(total_requests - successful_requests),
                 "requests_per_minute": round(requests_per_minute, 2)
             }
     
@@ -251,19 +781,26 @@ class MemoryStorage:
             
             cpu_values = [m.get('cpu_percent', 0) for m in metrics]
             memory_values = [m.get('memory_percent', 0) for m in metrics]
+            # Collector readings only; older events do not carry these
+            lag_values = [m['event_loop_lag_ms'] for m in metrics if m.get('event_loop_lag_ms') is not None]
+            lag_max_values = [m['event_loop_lag_max_ms'] for m in metrics if m.get('event_loop_lag_max_ms') is not None]
+            core_values = [max(m['cpu_per_core']) for m in metrics if m.get('cpu_per_core')]
             
             self.aggregated_stats["system_stats"] = {
                 "avg_cpu": round(sum(cpu_values) / len(cpu_values), 2) if cpu_values else 0,
                 "avg_memory": round(sum(memory_values) / len(memory_values), 2) if memory_values else 0,
+                "avg_event_loop_lag_ms": round(sum(lag_values) / len(lag_values), 2) if lag_values else None,
+                "max_event_loop_lag_ms": round(max(lag_max_values), 2) if lag_max_values else None,
+                "max_core_cpu": round(max(core_values), 2) if core_values else None,
                 "latest_metrics": system_data[-1] if system_data else None
             }
     
     def _update_ui_stats(self):
         """Update aggregated UI statistics"""
+        # len() does not evict, so expired errors are dropped first
+        self.ui_errors.evict_expired()
         with self.stats_lock:
-            errors = self.ui_errors.get_all()
-            
-            total_errors = len(errors)
+            total_errors = len(self.ui_errors)
             
             self.aggregated_stats["ui_stats"] = {
                 "total_errors": total_errors,
@@ -271,8 +808,14 @@ class MemoryStorage:
     
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get all data for dashboard"""
+        # Refresh so evictions and the requests-per-minute window show up between writes
+        self.api_metrics.evict_expired()
+        self._update_api_stats()
+        self._update_ui_stats()
+        
         return {
             "aggregated": self.aggregated_stats.copy(),
+            "latency_percentiles": self.get_latency_percentiles(),
             "recent_api_metrics": self.api_metrics.get_recent(20),
             "recent_system_metrics": self.system_metrics.get_recent(10),
             "recent_api_errors": self.api_errors.get_recent(10),
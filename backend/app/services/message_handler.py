@@ -1,23 +1,24 @@
 import json
 import logging
+import msgspec
 from datetime import datetime
-from typing import Dict, Any, Callable, Type
-from sqlalchemy.orm import Session
+from operator import attrgetter
+from typing import Dict, Any, Callable, Type, List, Tuple, Optional, Union
+from app.config import settings
 from app.services.memory_storage import memory_storage
-from app.database.connection import get_sync_session
+from app.services.db_writer import DatabaseWriter
+from app.services.rollups import APIRollupAccumulator, RetentionPolicy
 from app.models.database import APIMetric, SystemMetric, APIError, UIError
+from app.models.events import TOPIC_EVENT_TYPES, SYSTEM_METRIC_EXTRA_FIELDS, get_event_decoders, event_to_dict
 
 logger = logging.getLogger(__name__)
 
 class MessageHandler:
     def __init__(self):
-        self.batch_size = 2
-        self.batch_buffer = {}
-        
         # Topic configuration with handlers and field mappings
         self.topic_config = {
             "api-metrics": {
-                "memory_handler": memory_storage.add_api_metric,
+                "memory_handler": memory_storage.add_api_metric_event,
                 "db_model": APIMetric,
                 "field_mapping": {
                     "timestamp": ("timestamp", self._parse_timestamp),
@@ -25,24 +26,30 @@ class MessageHandler:
                     "data.path": "path", 
                     "data.status_code": "status_code",
                     "data.response_time_ms": "response_time_ms",
-                    "data.success": "success"
+                    "data.success": "success",
+                    "data.count": "weight",
+                    "data.response_time_min": "response_time_min",
+                    "data.response_time_max": "response_time_max",
+                    "data.latency_bins": ("latency_bins", json.dumps)
                 },
                 "store_in_db": True
             },
             "system-metrics": {
-                "memory_handler": memory_storage.add_system_metric,
+                "memory_handler": self._as_dict(memory_storage.add_system_metric),
                 "db_model": SystemMetric,
                 "field_mapping": {
                     "timestamp": ("timestamp", self._parse_timestamp),
                     "data.cpu_percent": "cpu_percent",
                     "data.memory_percent": "memory_percent",
                     "data.disk_usage": "disk_usage",
-                    "data.process_memory": "process_memory"
+                    "data.process_memory": "process_memory",
+                    "data.cpu_per_core": ("cpu_per_core", json.dumps),
+                    **{f"data.{field}": field for field in SYSTEM_METRIC_EXTRA_FIELDS if field != "cpu_per_core"}
                 },
                 "store_in_db": True
             },
             "api-errors": {
-                "memory_handler": memory_storage.add_api_error,
+                "memory_handler": self._as_dict(memory_storage.add_api_error),
                 "db_model": APIError,
                 "field_mapping": {
                     "timestamp": ("timestamp", self._parse_timestamp),
@@ -53,7 +60,7 @@ class MessageHandler:
                 "store_in_db": True
             },
             "ui-errors": {
-                "memory_handler": memory_storage.add_ui_error,
+                "memory_handler": self._as_dict(memory_storage.add_ui_error),
                 "db_model": UIError,
                 "field_mapping": {
                     "timestamp": ("timestamp", self._parse_timestamp),
@@ -66,75 +73,124 @@ class MessageHandler:
             }
         }
         
-        # Initialize batch buffers
-        for topic in self.topic_config:
-            if self.topic_config[topic]["store_in_db"]:
-                self.batch_buffer[topic] = []
+        # Precompile field mappings into (target, getter, transformer) tuples
+        for config in self.topic_config.values():
+            config["compiled_mapping"] = self._compile_mapping(config["field_mapping"])
+        
+        # Raw Kafka values are decoded straight into each topic's event struct,
+        # with one decoder per wire format
+        self.decoders = {topic: get_event_decoders(topic) for topic in self.topic_config}
+        
+        # Bulk writer stage for database persistence
+        self.db_writer = DatabaseWriter(
+            tables={
+                topic: config["db_model"].__table__
+                for topic, config in self.topic_config.items()
+                if config["store_in_db"]
+            },
+            batch_rows=settings.db_writer_batch_rows,
+            flush_interval_ms=settings.db_writer_flush_interval_ms,
+            max_flush_attempts=settings.db_writer_max_flush_attempts,
+            accumulators={"api-metrics": APIRollupAccumulator()},
+            retention=RetentionPolicy(
+                raw_retention_hours={
+                    APIMetric.__tablename__: settings.raw_retention_hours,
+                    SystemMetric.__tablename__: settings.system_metrics_retention_hours,
+                    APIError.__tablename__: settings.error_log_retention_hours,
+                    UIError.__tablename__: settings.error_log_retention_hours
+                },
+                rollup_retention_days={
+                    60: settings.rollup_1m_retention_days,
+                    300: settings.rollup_5m_retention_days,
+                    3600: settings.rollup_1h_retention_days
+                }
+            ),
+            retention_interval_seconds=settings.retention_interval_seconds
+        )
+    
+    def start(self):
+        """Start the database writer (called from app startup)"""
+        self.db_writer.start()
     
     def handle_kafka_message(self, message: Dict[str, Any], topic: str):
         """Route Kafka messages to appropriate handlers"""
         try:
-            logger.debug(f"Processing message from topic {topic}")
-            
             config = self.topic_config.get(topic)
             if not config:
                 logger.warning(f"Unknown topic: {topic}")
                 return
             
+            if isinstance(message, dict):
+                message = msgspec.convert(message, TOPIC_EVENT_TYPES[topic])
+            
             # Always add to memory storage for real-time updates
             config["memory_handler"](message)
             
-            # Add to database batch if configured
+            # Hand the mapped row to the database writer if configured
             if config["store_in_db"]:
-                self._add_to_batch(topic, message)
-                
+                self.db_writer.enqueue(topic, self._map_message_to_row(message, config))
+        
         except Exception as e:
             logger.error(f"Error handling message from {topic}: {e}")
     
-    def _add_to_batch(self, topic: str, message: Dict[str, Any]):
-        """Add message to batch and flush if batch is full"""
-        self.batch_buffer[topic].append(message)
+    def handle_kafka_batch(self, messages: List[Any], topic: str):
+        """Route a batch of decoded Kafka events from one partition to the handlers"""
+        config = self.topic_config.get(topic)
+        if not config:
+            logger.warning(f"Unknown topic: {topic}")
+            return
         
-        if len(self.batch_buffer[topic]) >= self.batch_size:
-            self._flush_batch_to_db(topic)
-    
-    def _flush_batch_to_db(self, topic: str):
-        """Flush batch to database"""
-        try:
-            config = self.topic_config[topic]
-            if not config["store_in_db"]:
-                return
-            logger.info(f"Flushing batch - ${topic}")
-            db = next(get_sync_session())
-            
-            for message in self.batch_buffer[topic]:
-                # Generic mapping using field_mapping configuration
-                db_object = self._map_message_to_model(message, config)
-                if db_object:
-                    logger.info("Adding to db")
-                    db.add(db_object)
-            
-            db.commit()
-            logger.info(f"Flushed {len(self.batch_buffer[topic])} messages from {topic} to database")
-            
-        except Exception as e:
-            logger.error(f"Error flushing {topic} to database: {e}")
-            if 'db' in locals():
-                db.rollback()
-        finally:
-            if 'db' in locals():
-                db.close()
-            self.batch_buffer[topic].clear()
+        memory_handler = config["memory_handler"]
+        store_in_db = config["store_in_db"]
+        rows = []
+        
+        for message in messages:
+            try:
+                memory_handler(message)
+                if store_in_db:
+                    rows.append(self._map_message_to_row(message, config))
+            except Exception as e:
+                logger.error(f"Error handling message from {topic}: {e}")
+        
+        # One queue hand-off per batch instead of per row
+        if rows:
+            self.db_writer.enqueue_many(topic, rows)
     
-    def _map_message_to_model(self, message: Dict[str, Any], config: Dict[str, Any]):
-        """Generic mapping from message to database model"""
-        model_class = config["db_model"]
-        field_mapping = config["field_mapping"]
+    def handle_persist_batch(self, messages: List[Any], topic: str):
+        """Write events to the database only, for records a restored snapshot already holds in memory"""
+        config = self.topic_config.get(topic)
+        if not config:
+            logger.warning(f"Unknown topic: {topic}")
+            return
+        if not config["store_in_db"]:
+            return
         
-        if not model_class or not field_mapping:
-            return None
+        rows = []
+        for message in messages:
+            try:
+                rows.append(self._map_message_to_row(message, config))
+            except Exception as e:
+                logger.error(f"Error handling message from {topic}: {e}")
+        if rows:
+            self.db_writer.enqueue_many(topic, rows)
+    
+    def handle_replay_batch(self, messages: List[Any], topic: str):
+        """Re-apply already persisted events to memory only, when catching up after a snapshot restore"""
+        config = self.topic_config.get(topic)
+        if not config:
+            logger.warning(f"Unknown topic: {topic}")
+            return
         
-        model_kwargs = {}
+        memory_handler = config["memory_handler"]
+        for message in messages:
+            try:
+                memory_handler(message)
+            except Exception as e:
+                logger.error(f"Error replaying message from {topic}: {e}")
+    
+    def _compile_mapping(self, field_mapping: Dict[str, Any]) -> List[Tuple[str, Callable, Optional[Callable]]]:
+        """Resolve dotted source paths once into getter functions"""
+        compiled = []
         
         for source_path, target_config in field_mapping.items():
             # Handle tuple format (field_name, transformer_function)
@@ -144,39 +200,47 @@ class MessageHandler:
                 target_field = target_config
                 transformer = None
             
-            # Extract value from message using dot notation
-            value = self._get_nested_value(message, source_path)
+            compiled.append((target_field, self._compile_getter(source_path), transformer))
+        
+        return compiled
+    
+    def _compile_getter(self, path: str) -> Callable[[Any], Any]:
+        """Build a getter for a dot-notation path (e.g., 'data.method') on event structs"""
+        return attrgetter(path)
+    
+    def _as_dict(self, handler: Callable[[Dict[str, Any]], None]) -> Callable[[Any], None]:
+        """Adapt a dict-based memory handler to take event structs"""
+        return lambda event: handler(event_to_dict(event))
+    
+    def _map_message_to_row(self, message: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a message to a column dict using the topic's compiled mapping"""
+        row = {}
+        
+        for target_field, getter, transformer in config["compiled_mapping"]:
+            value = getter(message)
             
             # Apply transformer if provided
             if transformer and value is not None:
                 try:
                     value = transformer(value)
                 except Exception as e:
-                    logger.warning(f"Error transforming field {source_path}: {e}")
-                    continue
+                    # Keep the key so every row in a bulk insert has the same columns
+                    logger.warning(f"Error transforming field {target_field}: {e}")
+                    value = None
             
-            model_kwargs[target_field] = value
+            row[target_field] = value
         
-        return model_class(**model_kwargs)
+        return row
     
-    def _get_nested_value(self, data: Dict[str, Any], path: str):
-        """Get value from nested dictionary using dot notation (e.g., 'data.method')"""
-        keys = path.split('.')
-        value = data
-        
-        for key in keys:
-            if isinstance(value, dict) and key in value:
-                value = value[key]
-            else:
-                return None
-        
-        return value
-    
-    def _parse_timestamp(self, timestamp_str: str) -> datetime:
+    def _parse_timestamp(self, timestamp_str: Union[str, float]) -> datetime:
         """Parse timestamp string to datetime object"""
         if not timestamp_str:
             return datetime.utcnow()
         
+        if isinstance(timestamp_str, (int, float)):
+            # Binary wire records carry epoch seconds
+            return datetime.utcfromtimestamp(timestamp_str)
+        
         try:
             return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
         except (ValueError, TypeError):
@@ -185,9 +249,11 @@ class MessageHandler:
     def flush_all_batches(self):
         """Flush all pending batches to database (useful for shutdown)"""
         logger.info("Flushing all the batches to db")
-        for topic in self.batch_buffer:
-            if self.batch_buffer[topic]:
-                self._flush_batch_to_db(topic)
+        self.db_writer.stop()
+    
+    def get_writer_stats(self) -> Dict[str, Any]:
+        """Get database writer flush latency and throughput"""
+        return self.db_writer.get_stats()
 
 # Global message handler instance
 message_handler = MessageHandler()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+from typing import Dict, Any, Tuple, Optional
+from app.config import settings
+from app.services.latency_sketch import LatencySketch
+from app.services.metrics_service import metrics_service
+
+logger = logging.getLogger(__name__)
+
+class RouteMetricsAggregator:
+    """Pre-aggregates API metrics per route and emits one summary event per route per interval"""
+    
+    def __init__(self, interval_seconds: float = 1.0):
+        self.interval = interval_seconds
+        
+        # (method, path, status code) -> [count, sum, min, max, sketch]
+        self.pending: Dict[Tuple[str, str, int], list] = {}
+        self.interval_start = time.time()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        
+        self.stats = {
+            "requests_aggregated": 0,
+            "summaries_sent": 0
+        }
+    
+    def add(self, method: str, path: str, status_code: int, response_time: float):
+        """Fold one request (response_time in seconds) into its route's summary"""
+        response_time_ms = response_time * 1000
+        key = (method, path, status_code)
+        
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = [0, 0.0, response_time_ms, response_time_ms, LatencySketch()]
+            entry[0] += 1
+            entry[1] += response_time_ms
+            if response_time_ms < entry[2]:
+                entry[2] = response_time_ms
+            if response_time_ms > entry[3]:
+                entry[3] = response_time_ms
+            entry[4].add(response_time_ms)
+            self.stats["requests_aggregated"] += 1
+    
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+        self.running = True
+        self.interval_start = time.time()
+        self.thread = threading.Thread(target=self._run, name="metrics-aggregator", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while self.running:
+            time.sleep(max(self.interval_start + self.interval - time.time(), 0))
+            self.flush()
+    
+    def flush(self):
+        """Emit a summary for every route seen in the current interval"""
+        now = time.time()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            interval_start, self.interval_start = self.interval_start, now
+        
+        for (method, path, status_code), (count, total, low, high, sketch) in pending.items():
+            try:
+                metrics_service.send_api_summary(
+                    method,
+                    path,
+                    status_code,
+                    interval_start=interval_start,
+                    interval_seconds=round(now - interval_start, 3),
+                    count=count,
+                    response_time_sum=total,
+                    response_time_min=low,
+                    response_time_max=high,
+                    latency_bins=sketch.bins,
+                    latency_zero_count=sketch.zero_count
+                )
+                self.stats["summaries_sent"] += 1
+            except Exception as e:
+                logger.error(f"Error sending API metrics summary for {path}: {e}")
+    
+    def stop(self):
+        """Stop the flush thread and emit what is still pending"""
+        if self.running:
+            self.running = False
+            if self.thread:
+                self.thread.join(timeout=self.interval + 1)
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get aggregation counters"""
+        with self.lock:
+            pending_routes = len(self.pending)
+        return {
+            **self.stats,
+            "enabled": settings.metrics_preaggregate,
+            "interval_seconds": self.interval,
+            "pending_routes": pending_routes
+        }
+
+# Global aggregator instance
+metrics_aggregator = RouteMetricsAggregator(interval_seconds=settings.metrics_aggregate_interval_seconds)
@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+from app.config import settings
+
+class MetricsSampler:
+    """Tail-aware head sampling for per-request API metrics"""
+    
+    def __init__(self, sample_rate: float = 1.0, adaptive: bool = False, event_budget_per_second: float = 500,
+                 outlier_threshold_ms: float = 1000, route_thresholds_ms: Optional[Dict[str, float]] = None):
+        self.base_rate = min(max(sample_rate, 0.0), 1.0)
+        self.rate = self.base_rate
+        self.adaptive = adaptive
+        self.event_budget = event_budget_per_second
+        self.outlier_threshold_ms = outlier_threshold_ms
+        self.route_thresholds_ms = route_thresholds_ms or {}
+        
+        # Smoothed rate of sampleable requests, updated once per second in adaptive mode
+        self.observed_per_second = 0.0
+        self.second = int(time.time())
+        self.second_count = 0
+        self.lock = threading.Lock()
+        
+        self.stats = {
+            "kept": 0,
+            "kept_tail": 0,
+            "dropped": 0
+        }
+    
+    def threshold_ms(self, path: str) -> float:
+        """Latency above which a route's requests are always kept"""
+        return self.route_thresholds_ms.get(path, self.outlier_threshold_ms)
+    
+    def is_tail(self, path: str, status_code: int, response_time: float) -> bool:
+        """Errors and slow requests (response_time in seconds) are never sampled away"""
+        return status_code >= 400 or response_time * 1000 >= self.threshold_ms(path)
+    
+    def sample(self, path: str, status_code: int, response_time: float) -> Optional[float]:
+        """Decide whether to send a request's metrics; returns its weight, or None to drop it"""
+        if self.is_tail(path, status_code, response_time):
+            self.stats["kept_tail"] += 1
+            return 1.0
+        
+        if self.adaptive:
+            self._observe()
+        
+        rate = self.rate
+        if rate >= 1.0:
+            self.stats["kept"] += 1
+            return 1.0
+        if rate > 0 and random.random() < rate:
+            self.stats["kept"] += 1
+            # Each kept event stands for the requests dropped alongside it
+            return 1.0 / rate
+        self.stats["dropped"] += 1
+        return None
+    
+    def _observe(self):
+        """Count a sampleable request and retune the rate at each second boundary"""
+        now = int(time.time())
+        with self.lock:
+            if now != self.second:
+                elapsed = now - self.second
+                current = self.second_count / elapsed
+                # Rises quickly with load, decays over a few seconds when it drops
+                alpha = 0.5 if current > self.observed_per_second else 0.2
+                self.observed_per_second += alpha * (current - self.observed_per_second)
+                self.second = now
+                self.second_count = 0
+                
+                if self.observed_per_second * self.base_rate > self.event_budget:
+                    self.rate = self.event_budget / self.observed_per_second
+                else:
+                    self.rate = self.base_rate
+            self.second_count += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the current rate and keep/drop counters"""
+        return {
+            **self.stats,
+            "base_rate": self.base_rate,
+            "current_rate": round(self.rate, 4),
+            "adaptive": self.adaptive,
+            "event_budget_per_second": self.event_budget,
+            "observed_requests_per_second": round(self.observed_per_second, 2)
+        }
+
+# Global sampler instance
+metrics_sampler = MetricsSampler(
+    sample_rate=settings.metrics_sample_rate,
+    adaptive=settings.metrics_adaptive_sampling,
+    event_budget_per_second=settings.metrics_event_budget_per_second,
+    outlier_threshold_ms=settings.metrics_outlier_threshold_ms,
+    route_thresholds_ms=settings.metrics_route_outlier_thresholds_ms
+)
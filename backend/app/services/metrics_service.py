@@ -1,18 +1,19 @@
 import time
 import psutil
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.services.kafka_service import kafka_service
+from app.models.events import API_METRICS_SUMMARY_TYPE
 
 class MetricsService:
     @staticmethod
-    def get_system_metrics() -> Dict[str, Any]:
-        """Get system-level metrics (CPU, memory, etc.)"""
+    def get_system_metrics(data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Get system-level metrics (CPU, memory, etc.), or wrap readings already collected"""
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "service": "apppulse-backend",
             "type": "system_metrics",
-            "data": {
+            "data": data if data is not None else {
                 "cpu_percent": psutil.cpu_percent(),
                 "memory_percent": psutil.virtual_memory().percent,
                 "disk_usage": psutil.disk_usage('/').percent,
@@ -21,9 +22,10 @@ class MetricsService:
         }
     
     @staticmethod
-    def create_api_metrics(method: str, path: str, status_code: int, response_time: float) -> Dict[str, Any]:
+    def create_api_metrics(method: str, path: str, status_code: int, response_time: float,
+                           weight: float = 1.0) -> Dict[str, Any]:
         """Create API metrics payload"""
-        return {
+        metrics = {
             "timestamp": datetime.utcnow().isoformat(),
             "service": "apppulse-backend",
             "type": "api_metrics",
@@ -35,15 +37,51 @@ class MetricsService:
                 "success": status_code < 400
             }
         }
+        if weight != 1:
+            # Sampled: this event stands for weight requests
+            metrics["data"]["count"] = round(weight, 4)
+        return metrics
     
     @staticmethod
-    def send_api_metrics(method: str, path: str, status_code: int, response_time: float):
+    def send_api_metrics(method: str, path: str, status_code: int, response_time: float, weight: float = 1.0):
         """Send API metrics to Kafka"""
-        metrics = MetricsService.create_api_metrics(method, path, status_code, response_time)
-        kafka_service.send_message("api-metrics" ,metrics)
+        metrics = MetricsService.create_api_metrics(method, path, status_code, response_time, weight)
+        # Keyed by route so each route stays ordered within its partition
+        kafka_service.emit("api-metrics", metrics, key=path)
+    
+    @staticmethod
+    def create_api_summary(method: str, path: str, status_code: int, interval_start: float,
+                           interval_seconds: float, count: int, response_time_sum: float,
+                           response_time_min: float, response_time_max: float,
+                           latency_bins: Dict[int, float], latency_zero_count: float) -> Dict[str, Any]:
+        """Create an API metrics summary payload for many requests to one route"""
+        return {
+            "timestamp": datetime.utcfromtimestamp(interval_start).isoformat(),
+            "service": "apppulse-backend",
+            "type": API_METRICS_SUMMARY_TYPE,
+            "data": {
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "response_time_ms": round(response_time_sum / count, 2),
+                "success": status_code < 400,
+                "count": count,
+                "response_time_min": round(response_time_min, 2),
+                "response_time_max": round(response_time_max, 2),
+                "latency_bins": latency_bins,
+                "latency_zero_count": latency_zero_count,
+                "interval_seconds": interval_seconds
+            }
+        }
+    
+    @staticmethod
+    def send_api_summary(method: str, path: str, status_code: int, **summary):
+        """Send an API metrics summary to Kafka"""
+        metrics = MetricsService.create_api_summary(method, path, status_code, **summary)
+        kafka_service.emit("api-metrics", metrics, key=path)
     
     @staticmethod
-    def send_api_error(method: str, path: str, status_code: int, response_time: float, exception: Exception = None):
+    def send_api_error(method: str, path: str, status_code: int, response_time: float, exception: Exception = None, raw_path: str = None):
         """Send API error to Kafka"""
         error_data = {
             "timestamp": datetime.utcnow().isoformat(),
@@ -55,17 +93,18 @@ class MetricsService:
                 "additional_data": {
                     "method": method,
                     "path":path,
+                    "raw_path": raw_path or path,
                     "status_code": status_code,
                     "response_time_ms": round(response_time * 1000, 2),
                 }
             }
         }
-        kafka_service.send_message("api-errors", error_data)
+        kafka_service.emit("api-errors", error_data, key=path)
     
     @staticmethod
-    def send_system_metrics():
+    def send_system_metrics(data: Optional[Dict[str, Any]] = None):
         """Send system metrics to Kafka"""
-        metrics = MetricsService.get_system_metrics()
-        kafka_service.send_message("system-metrics", metrics)
+        metrics = MetricsService.get_system_metrics(data)
+        kafka_service.emit("system-metrics", metrics, key=metrics["service"])
 
 metrics_service = MetricsService()
\ No newline at end of file
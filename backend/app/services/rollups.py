@@ -0,0 +1,190 @@
+import json
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from sqlalchemy import text, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.models.database import APIMetricRollup
+from app.services.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_RESOLUTIONS = (60, 300, 3600)  # 1 minute, 5 minutes, 1 hour
+LATENCY_BUCKET_BOUNDS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+LATENCY_BUCKET_COLUMNS = [f"bucket_le_{bound}" for bound in LATENCY_BUCKET_BOUNDS] + ["bucket_le_inf"]
+
+def choose_rollup_resolution(hours: float) -> int:
+    """Pick the coarsest resolution that still gives a useful number of buckets"""
+    if hours <= 24:
+        return 60
+    if hours <= 24 * 7:
+        return 300
+    return 3600
+
+def histogram_quantiles(buckets: Sequence[float], minimum: float, maximum: float,
+                        quantiles: Sequence[float]) -> List[Optional[float]]:
+    """Estimate quantiles from latency bucket counts (in LATENCY_BUCKET_COLUMNS order)
+    
+    Values are interpolated linearly within their bucket; the first and the open
+    last bucket are bounded by the observed min and max.
+    """
+    total = sum(buckets)
+    if total <= 0:
+        return [None] * len(quantiles)
+    lowers = (minimum, *LATENCY_BUCKET_BOUNDS)
+    uppers = (*LATENCY_BUCKET_BOUNDS, maximum)
+    
+    results = []
+    for quantile in quantiles:
+        rank = quantile * total
+        value = maximum
+        seen = 0.0
+        for count, lower, upper in zip(buckets, lowers, uppers):
+            if count > 0 and seen + count >= rank:
+                value = lower + (upper - lower) * (rank - seen) / count
+                break
+            seen += count
+        results.append(min(max(value, minimum), maximum))
+    return results
+
+class APIRollupAccumulator:
+    """Accumulates api-metrics rows into per-route rollup buckets between flushes"""
+    
+    def __init__(self):
+        # (resolution, bucket_start, path) -> partial rollup row
+        self.pending: Dict[Tuple[int, datetime, str], Dict[str, Any]] = {}
+    
+    def add_row(self, row: Dict[str, Any]):
+        """Fold one mapped api-metrics row into every resolution"""
+        timestamp = row.get("timestamp")
+        if timestamp is None:
+            return
+        
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        epoch = int(timestamp.timestamp())
+        response_time = row.get("response_time_ms") or 0.0
+        weight = row.get("weight") or 1.0  # Summary rows stand for many requests
+        is_error = not row.get("success")
+        # Summaries carry their own min/max and latency distribution; response_time is their mean
+        low = row.get("response_time_min")
+        low = response_time if low is None else low
+        high = row.get("response_time_max")
+        high = response_time if high is None else high
+        bucket_counts = self._bucket_counts(row.get("latency_bins"), weight, response_time)
+        # NULLs never conflict in the unique key, so missing paths get a stable value
+        path = row.get("path") or ""
+        
+        for resolution in ROLLUP_RESOLUTIONS:
+            bucket_start = datetime.utcfromtimestamp(epoch - epoch % resolution)
+            key = (resolution, bucket_start, path)
+            rollup = self.pending.get(key)
+            if rollup is None:
+                rollup = self.pending[key] = {
+                    "resolution_seconds": resolution,
+                    "bucket_start": bucket_start,
+                    "path": path,
+                    "request_count": 0,
+                    "error_count": 0,
+                    "response_time_sum": 0.0,
+                    "response_time_min": low,
+                    "response_time_max": high,
+                    **{column: 0 for column in LATENCY_BUCKET_COLUMNS}
+                }
+            rollup["request_count"] += weight
+            rollup["error_count"] += weight if is_error else 0
+            rollup["response_time_sum"] += response_time * weight
+            rollup["response_time_min"] = min(rollup["response_time_min"], low)
+            rollup["response_time_max"] = max(rollup["response_time_max"], high)
+            for column, count in bucket_counts:
+                rollup[column] += count
+    
+    @staticmethod
+    def _bucket_counts(latency_bins: Optional[str], weight: float, response_time: float) -> List[Tuple[str, float]]:
+        """Spread a row's requests over the latency histogram columns"""
+        if not latency_bins:
+            return [(LATENCY_BUCKET_COLUMNS[bisect_left(LATENCY_BUCKET_BOUNDS, response_time)], weight)]
+        bins = json.loads(latency_bins)
+        # Requests the bins leave out were recorded as zero latency
+        sketch = LatencySketch.from_bins(bins, max(weight - sum(bins.values()), 0))
+        return [
+            (LATENCY_BUCKET_COLUMNS[bisect_left(LATENCY_BUCKET_BOUNDS, value)], count)
+            for value, count in sketch.items()
+        ]
+    
+    def flush(self, connection):
+        """Upsert pending buckets, adding to any rows already stored
+        
+        Pending buckets are kept until clear() is called once the surrounding
+        transaction has committed.
+        """
+        if not self.pending:
+            return
+        
+        rows = list(self.pending.values())
+        stmt = sqlite_insert(APIMetricRollup.__table__)
+        excluded = stmt.excluded
+        table = APIMetricRollup.__table__.c
+        additive = ["request_count", "error_count", "response_time_sum"] + LATENCY_BUCKET_COLUMNS
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["resolution_seconds", "bucket_start", "path"],
+            set_={
+                **{column: table[column] + excluded[column] for column in additive},
+                # Two-argument min()/max() are SQLite's scalar functions
+                "response_time_min": func.min(table.response_time_min, excluded.response_time_min),
+                "response_time_max": func.max(table.response_time_max, excluded.response_time_max)
+            }
+        )
+        connection.execute(stmt, rows)
+    
+    def clear(self):
+        """Forget pending buckets (committed, or dropped along with their raw rows)"""
+        self.pending = {}
+
+class RetentionPolicy:
+    """Deletes expired raw and rollup rows in small batches"""
+    
+    def __init__(self, raw_retention_hours: Dict[str, float], rollup_retention_days: Dict[int, float],
+                 batch_size: int = 5000):
+        self.raw_retention_hours = raw_retention_hours  # Table name -> hours (0 keeps forever)
+        self.rollup_retention_days = rollup_retention_days  # Resolution -> days
+        self.batch_size = batch_size
+    
+    def apply(self, connection) -> int:
+        """Run one retention pass and return how many rows were deleted"""
+        deleted = 0
+        now = datetime.utcnow()
+        
+        for table, hours in self.raw_retention_hours.items():
+            if hours and hours > 0:
+                deleted += self._delete_batches(
+                    connection,
+                    f"DELETE FROM {table} WHERE id IN "
+                    f"(SELECT id FROM {table} WHERE timestamp < :cutoff LIMIT :batch_size)",
+                    {"cutoff": now - timedelta(hours=hours)}
+                )
+        
+        for resolution, days in self.rollup_retention_days.items():
+            if days and days > 0:
+                deleted += self._delete_batches(
+                    connection,
+                    "DELETE FROM api_metric_rollups WHERE id IN "
+                    "(SELECT id FROM api_metric_rollups WHERE resolution_seconds = :resolution "
+                    "AND bucket_start < :cutoff LIMIT :batch_size)",
+                    {"cutoff": now - timedelta(days=days), "resolution": resolution}
+                )
+        
+        if deleted:
+            logger.info(f"Retention removed {deleted} expired rows")
+        return deleted
+    
+    def _delete_batches(self, connection, sql: str, params: Dict[str, Any]) -> int:
+        """Delete in short transactions so ingest is never blocked for long"""
+        total = 0
+        while True:
+            with connection.begin():
+                result = connection.execute(text(sql), {**params, "batch_size": self.batch_size})
+            total += result.rowcount
+            if result.rowcount < self.batch_size:
+                return total
@@ -0,0 +1,281 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text
+from app.config import settings
+from app.database.connection import read_engine
+from app.services.rollups import ROLLUP_RESOLUTIONS
+
+SERIES_MODES = ("buckets", "lttb")
+
+# Bucketed API metrics are derived from per-bucket aggregates of api_metrics or its rollups
+API_SERIES_METRICS = ("requests", "errors", "error_rate", "latency_avg", "latency_min", "latency_max")
+SYSTEM_SERIES_METRICS = ("cpu_percent", "memory_percent", "disk_usage", "process_memory")
+# Metric -> (table, value column) for metrics with raw points LTTB can pick from
+POINT_METRICS = {
+    "latency": ("api_metrics", "response_time_ms"),
+    **{metric: ("system_metrics", metric) for metric in SYSTEM_SERIES_METRICS}
+}
+
+# SQLite stores naive UTC datetimes as text; julianday keeps sub-second precision
+EPOCH_SQL = "((julianday(timestamp) - 2440587.5) * 86400.0)"
+
+def rollup_retention_days() -> Dict[int, float]:
+    return {
+        60: settings.rollup_1m_retention_days,
+        300: settings.rollup_5m_retention_days,
+        3600: settings.rollup_1h_retention_days
+    }
+
+def lttb(timestamps: List[float], values: List[float], threshold: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets: keep the points that best preserve the series' shape"""
+    length = len(timestamps)
+    if threshold >= length or threshold < 3:
+        return timestamps, values
+    
+    sampled_t = [timestamps[0]]
+    sampled_v = [values[0]]
+    every = (length - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+        span = next_end - next_start
+        avg_t = sum(timestamps[next_start:next_end]) / span
+        avg_v = sum(values[next_start:next_end]) / span
+        
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        point_t, point_v = timestamps[a], values[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((point_t - avg_t) * (values[j] - point_v) - (point_t - timestamps[j]) * (avg_v - point_v))
+            if area > best_area:
+                best_area = area
+                best = j
+        
+        sampled_t.append(timestamps[best])
+        sampled_v.append(values[best])
+        a = best
+    
+    sampled_t.append(timestamps[-1])
+    sampled_v.append(values[-1])
+    return sampled_t, sampled_v
+
+class SeriesQuery:
+    """Historical metric series bounded by the number of chart points, not by raw rows"""
+    
+    def __init__(self, engine, max_points: int = 2000, lttb_max_input_points: int = 100000):
+        self.engine = engine
+        self.max_points = max_points
+        self.lttb_max_input_points = lttb_max_input_points
+    
+    def get_series(self, metric: str, start: datetime, end: datetime, points: int = 500,
+                   route: Optional[str] = None, mode: str = "buckets") -> Dict[str, Any]:
+        """Get a series for a metric over [start, end) in UTC with at most about `points` points"""
+        if mode not in SERIES_MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {', '.join(SERIES_MODES)}")
+        if end <= start:
+            raise ValueError("end must be after start")
+        points = max(2, min(points, self.max_points))
+        
+        if mode == "lttb":
+            if metric not in POINT_METRICS:
+                raise ValueError(f"Metric '{metric}' has no raw points; lttb supports {', '.join(POINT_METRICS)}")
+            result = self._lttb_series(metric, start, end, points, route)
+        elif metric in API_SERIES_METRICS:
+            result = self._api_buckets(metric, start, end, points, route)
+        elif metric in SYSTEM_SERIES_METRICS:
+            result = self._system_buckets(metric, start, end, points)
+        else:
+            raise ValueError(
+                f"Unknown metric '{metric}', expected one of {', '.join(API_SERIES_METRICS + SYSTEM_SERIES_METRICS)}"
+            )
+        
+        return {
+            "metric": metric,
+            "route": route,
+            "mode": mode,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "point_count": len(result["timestamps"]),
+            **result
+        }
+    
+    def _bucket_seconds(self, start: datetime, end: datetime, points: int, multiple: int = 1) -> int:
+        """Bucket width giving at most `points` buckets, rounded up to a multiple of `multiple`"""
+        width = max(math.ceil((end - start).total_seconds() / points), 1)
+        return math.ceil(width / multiple) * multiple
+    
+    def _rollup_resolution(self, start: datetime, end: datetime, points: int) -> Optional[int]:
+        """Coarsest rollup resolution that fits the bucket width and still covers the range
+        
+        Once raw rows have expired, the finest retained rollup is used even when it
+        is wider than the requested buckets (so fewer points come back).
+        """
+        hours = (end - start).total_seconds() / 3600
+        raw_cutoff = datetime.utcnow() - timedelta(hours=settings.raw_retention_hours)
+        raw_expired = settings.raw_retention_hours > 0 and start < raw_cutoff
+        if hours < settings.rollup_query_min_hours and not raw_expired:
+            return None
+        
+        width = self._bucket_seconds(start, end, points)
+        retention = rollup_retention_days()
+        age_days = (datetime.utcnow() - start).total_seconds() / 86400
+        retained = [
+            resolution for resolution in ROLLUP_RESOLUTIONS
+            if not retention[resolution] or retention[resolution] >= age_days
+        ]
+        candidates = [resolution for resolution in retained if resolution <= width]
+        if candidates:
+            return max(candidates)
+        if raw_expired and retained:
+            # Sub-minute buckets would read the purged raw table
+            return min(retained)
+        return None
+    
+    def _api_buckets(self, metric: str, start: datetime, end: datetime, points: int,
+                     route: Optional[str]) -> Dict[str, Any]:
+        resolution = self._rollup_resolution(start, end, points)
+        route_filter = "AND path = :route" if route is not None else ""
+        
+        if resolution:
+            width = self._bucket_seconds(start, end, points, resolution)
+            source = "api_metric_rollups"
+            # Rollup buckets are aligned to their resolution, so each falls inside one output bucket
+            query = text(f"""
+                SELECT
+                    CAST(strftime('%s', bucket_start) AS INTEGER) / :width as bucket,
+                    SUM(request_count),
+                    SUM(error_count),
+                    SUM(response_time_sum),
+                    MIN(response_time_min),
+                    MAX(response_time_max)
+                FROM api_metric_rollups
+                WHERE resolution_seconds = :resolution
+                    AND bucket_start >= :start AND bucket_start < :end {route_filter}
+                GROUP BY bucket
+                ORDER BY bucket
+            """)
+        else:
+            width = self._bucket_seconds(start, end, points)
+            source = "api_metrics"
+            query = text(f"""
+                SELECT
+                    CAST(strftime('%s', timestamp) AS INTEGER) / :width as bucket,
+                    SUM(COALESCE(weight, 1)),
+                    COALESCE(SUM(COALESCE(weight, 1)) FILTER (WHERE success = 0), 0),
+                    SUM(response_time_ms * COALESCE(weight, 1)),
+                    MIN(COALESCE(response_time_min, response_time_ms)),
+                    MAX(COALESCE(response_time_max, response_time_ms))
+                FROM api_metrics
+                WHERE timestamp >= :start AND timestamp < :end {route_filter}
+                GROUP BY bucket
+                ORDER BY bucket
+            """)
+        
+        params = {"width": width, "start": start, "end": end, "resolution": resolution, "route": route}
+        with self.engine.connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        timestamps = []
+        values = []
+        counts = []
+        for bucket, requests, errors, response_time_sum, low, high in rows:
+            if not requests:
+                continue
+            if metric == "requests":
+                value = round(requests)
+            elif metric == "errors":
+                value = round(errors)
+            elif metric == "error_rate":
+                value = round(errors / requests * 100, 2)
+            elif metric == "latency_avg":
+                value = round(response_time_sum / requests, 2)
+            elif metric == "latency_min":
+                value = round(low, 2)
+            else:
+                value = round(high, 2)
+            timestamps.append(bucket * width)
+            values.append(value)
+            counts.append(round(requests))
+        
+        return {
+            "source": source,
+            "bucket_seconds": width,
+            "timestamps": timestamps,
+            "values": values,
+            "counts": counts
+        }
+    
+    def _system_buckets(self, metric: str, start: datetime, end: datetime, points: int) -> Dict[str, Any]:
+        width = self._bucket_seconds(start, end, points)
+        query = text(f"""
+            SELECT
+                CAST(strftime('%s', timestamp) AS INTEGER) / :width as bucket,
+                AVG({metric}),
+                MIN({metric}),
+                MAX({metric})
+            FROM system_metrics
+            WHERE timestamp >= :start AND timestamp < :end AND {metric} IS NOT NULL
+            GROUP BY bucket
+            ORDER BY bucket
+        """)
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(query, {"width": width, "start": start, "end": end}).fetchall()
+        
+        return {
+            "source": "system_metrics",
+            "bucket_seconds": width,
+            "timestamps": [row[0] * width for row in rows],
+            "values": [round(row[1], 2) for row in rows],
+            "min": [round(row[2], 2) for row in rows],
+            "max": [round(row[3], 2) for row in rows]
+        }
+    
+    def _lttb_series(self, metric: str, start: datetime, end: datetime, points: int,
+                     route: Optional[str]) -> Dict[str, Any]:
+        table, column = POINT_METRICS[metric]
+        route_filter = "AND path = :route" if route is not None and table == "api_metrics" else ""
+        where = f"timestamp >= :start AND timestamp < :end AND {column} IS NOT NULL {route_filter}"
+        params = {"start": start, "end": end, "route": route}
+        
+        with self.engine.connect() as conn:
+            row_count = conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {where}"), params).scalar()
+            if row_count <= self.lttb_max_input_points:
+                query = text(f"SELECT {EPOCH_SQL}, {column} FROM {table} WHERE {where} ORDER BY timestamp")
+                pre_bucket_seconds = None
+            else:
+                # Too many raw rows: average them into fine buckets in SQL first, then pick the shape
+                pre_bucket_seconds = self._bucket_seconds(start, end, self.lttb_max_input_points)
+                query = text(f"""
+                    SELECT
+                        CAST(strftime('%s', timestamp) AS INTEGER) / :width * :width as bucket,
+                        AVG({column})
+                    FROM {table}
+                    WHERE {where}
+                    GROUP BY bucket
+                    ORDER BY bucket
+                """)
+                params["width"] = pre_bucket_seconds
+            rows = conn.execute(query, params).fetchall()
+        
+        timestamps, values = lttb([row[0] for row in rows], [row[1] for row in rows], points)
+        return {
+            "source": table,
+            "raw_points": row_count,
+            "pre_bucket_seconds": pre_bucket_seconds,
+            "timestamps": [round(t, 3) for t in timestamps],
+            "values": [round(v, 2) for v in values]
+        }
+
+# Global series query instance
+series_query = SeriesQuery(
+    read_engine,
+    max_points=settings.series_max_points,
+    lttb_max_input_points=settings.series_lttb_max_input_points
+)
@@ -0,0 +1,186 @@
+import asyncio
+import gc
+import logging
+import threading
+import time
+import psutil
+from typing import Dict, Any, List, Optional
+from app.config import settings
+from app.services.kafka_service import kafka_service
+from app.services.message_handler import message_handler
+from app.services.metrics_service import metrics_service
+
+logger = logging.getLogger(__name__)
+
+class SystemMetricsCollector:
+    """Samples host, process and event-loop health on its own thread and emits one aggregate per interval"""
+    
+    def __init__(self, sample_interval_seconds: float = 1.0, emit_interval_seconds: float = 30.0):
+        self.sample_interval = sample_interval_seconds
+        self.emit_interval = max(emit_interval_seconds, sample_interval_seconds)
+        self.process = psutil.Process()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        # Reentrant because a GC callback can run on a thread that already holds it
+        self.lock = threading.RLock()
+        # Held across collect and send, so the manual emit and the collector thread take turns
+        self.emit_lock = threading.Lock()
+        
+        # Samples since the last emit
+        self.cpu_samples: List[List[float]] = []  # Per-core percent per sample
+        self.memory_samples: List[float] = []
+        self.loop_lags_ms: List[float] = []
+        
+        # GC pauses, counted from gc.callbacks on whichever thread collects
+        self.gc_started: Dict[int, float] = {}
+        self.gc_collections = 0
+        self.gc_pause_ms = 0.0
+        
+        # IO counters at the last emit, for rates
+        self.io_at = time.monotonic()
+        self.disk_io = None
+        self.net_io = None
+        
+        self.stats = {
+            "samples": 0,
+            "emitted": 0
+        }
+    
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start sampling; lag is measured on the given event loop"""
+        if self.thread:
+            return
+        self.loop = loop
+        gc.callbacks.append(self._on_gc)
+        # Prime the per-core counters, which report usage since their previous call
+        psutil.cpu_percent(percpu=True)
+        self.io_at, self.disk_io, self.net_io = time.monotonic(), psutil.disk_io_counters(), psutil.net_io_counters()
+        
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="system-collector", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        next_emit = time.monotonic() + self.emit_interval
+        while not self.stop_event.wait(self.sample_interval):
+            try:
+                self.sample()
+                if time.monotonic() >= next_emit:
+                    next_emit += self.emit_interval
+                    self.emit()
+            except Exception as e:
+                logger.error(f"Error collecting system metrics: {e}")
+    
+    def sample(self):
+        """Take one sample; cheap enough to run every second"""
+        cpu_per_core = psutil.cpu_percent(percpu=True)
+        memory_percent = psutil.virtual_memory().percent
+        with self.lock:
+            self.cpu_samples.append(cpu_per_core)
+            self.memory_samples.append(memory_percent)
+        self.stats["samples"] += 1
+        
+        if self.loop is not None and not self.loop.is_closed():
+            # The delay before the loop runs this callback is how long it was busy
+            self.loop.call_soon_threadsafe(self._on_loop_probe, time.perf_counter())
+    
+    def _on_loop_probe(self, scheduled_at: float):
+        lag_ms = (time.perf_counter() - scheduled_at) * 1000
+        with self.lock:
+            self.loop_lags_ms.append(lag_ms)
+    
+    def _on_gc(self, phase: str, info: Dict[str, Any]):
+        thread_id = threading.get_ident()
+        if phase == "start":
+            self.gc_started[thread_id] = time.perf_counter()
+        else:
+            started = self.gc_started.pop(thread_id, None)
+            if started is not None:
+                with self.lock:
+                    self.gc_collections += 1
+                    self.gc_pause_ms += (time.perf_counter() - started) * 1000
+    
+    def collect(self) -> Dict[str, Any]:
+        """Aggregate the samples since the last call into one system-metrics data dict
+        
+        Resets the samples and IO baselines, so callers hold emit_lock.
+        """
+        with self.lock:
+            cpu_samples, self.cpu_samples = self.cpu_samples, []
+            memory_samples, self.memory_samples = self.memory_samples, []
+            loop_lags, self.loop_lags_ms = self.loop_lags_ms, []
+            gc_collections, self.gc_collections = self.gc_collections, 0
+            gc_pause_ms, self.gc_pause_ms = self.gc_pause_ms, 0.0
+        
+        if not cpu_samples:
+            cpu_samples = [psutil.cpu_percent(percpu=True)]
+            memory_samples = [psutil.virtual_memory().percent]
+        cores = len(cpu_samples[0])
+        cpu_per_core = [
+            round(sum(sample[core] for sample in cpu_samples) / len(cpu_samples), 1)
+            for core in range(cores)
+        ]
+        
+        now = time.monotonic()
+        elapsed = max(now - self.io_at, 1e-6)
+        disk_io, net_io = psutil.disk_io_counters(), psutil.net_io_counters()
+        
+        def rate(current, previous, field: str) -> Optional[float]:
+            # Counters are missing in some containers
+            if current is None or previous is None:
+                return None
+            return round(max(getattr(current, field) - getattr(previous, field), 0) / elapsed, 1)
+        
+        data = {
+            "cpu_percent": round(sum(cpu_per_core) / cores, 2) if cores else None,
+            "memory_percent": round(sum(memory_samples) / len(memory_samples), 2),
+            "disk_usage": psutil.disk_usage('/').percent,
+            "process_memory": self.process.memory_info().rss / 1024 / 1024,  # MB
+            "cpu_per_core": cpu_per_core,
+            "event_loop_lag_ms": round(sum(loop_lags) / len(loop_lags), 3) if loop_lags else None,
+            "event_loop_lag_max_ms": round(max(loop_lags), 3) if loop_lags else None,
+            "process_threads": self.process.num_threads(),
+            # File descriptors are a Unix concept
+            "process_fds": self.process.num_fds() if hasattr(self.process, "num_fds") else None,
+            "gc_collections": gc_collections,
+            "gc_pause_ms": round(gc_pause_ms, 3),
+            "disk_read_bytes_per_sec": rate(disk_io, self.disk_io, "read_bytes"),
+            "disk_write_bytes_per_sec": rate(disk_io, self.disk_io, "write_bytes"),
+            "net_sent_bytes_per_sec": rate(net_io, self.net_io, "bytes_sent"),
+            "net_recv_bytes_per_sec": rate(net_io, self.net_io, "bytes_recv"),
+            "emit_queue_depth": kafka_service.emit_queue.qsize(),
+            "db_writer_queued_rows": message_handler.db_writer.queued_rows
+        }
+        self.io_at, self.disk_io, self.net_io = now, disk_io, net_io
+        return data
+    
+    def emit(self):
+        """Send the current aggregate as a system-metrics event"""
+        with self.emit_lock:
+            metrics_service.send_system_metrics(self.collect())
+            self.stats["emitted"] += 1
+    
+    def stop(self):
+        """Stop sampling"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.sample_interval + 1)
+            self.thread = None
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sampling counters"""
+        return {
+            **self.stats,
+            "running": self.thread is not None,
+            "sample_interval_seconds": self.sample_interval,
+            "emit_interval_seconds": self.emit_interval
+        }
+
+# Global system collector instance
+system_collector = SystemMetricsCollector(
+    sample_interval_seconds=settings.system_metrics_sample_interval_seconds,
+    emit_interval_seconds=settings.system_metrics_emit_interval_seconds
+)
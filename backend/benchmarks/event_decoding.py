@@ -0,0 +1,99 @@
+"""Micro-benchmark: per-message decode + row-mapping cost for api-metrics.
+
+Compares the original path (json.loads into dicts, then a dotted-path walk with
+split('.') for every field) against typed msgspec decoding into event structs
+with precompiled attribute getters.
+
+Run from the backend directory:
+    python -m benchmarks.event_decoding
+"""
+import json
+import time
+from datetime import datetime
+from operator import attrgetter
+from app.models.events import encode_event, get_event_decoder
+
+FIELD_MAPPING = {
+    "timestamp": "timestamp",
+    "data.method": "method",
+    "data.path": "path",
+    "data.status_code": "status_code",
+    "data.response_time_ms": "response_time_ms",
+    "data.success": "success"
+}
+
+def make_payloads(count: int):
+    return [
+        encode_event({
+            "timestamp": datetime.utcnow().isoformat(),
+            "service": "apppulse-backend",
+            "type": "api_metrics",
+            "data": {
+                "method": "GET",
+                "path": "/api/v1/items/{item_id}",
+                "status_code": 200 if i % 20 else 500,
+                "response_time_ms": round(1 + (i % 500) * 0.37, 2),
+                "success": bool(i % 20)
+            }
+        })
+        for i in range(count)
+    ]
+
+def get_nested_value(data, path):
+    value = data
+    for key in path.split('.'):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            return None
+    return value
+
+def baseline(payloads):
+    rows = []
+    for payload in payloads:
+        message = json.loads(payload.decode('utf-8'))
+        rows.append({target: get_nested_value(message, source) for source, target in FIELD_MAPPING.items()})
+    return rows
+
+def typed(payloads):
+    decode = get_event_decoder("api-metrics").decode
+    getters = [(target, attrgetter(source)) for source, target in FIELD_MAPPING.items()]
+    rows = []
+    for payload in payloads:
+        event = decode(payload)
+        rows.append({target: getter(event) for target, getter in getters})
+    return rows
+
+def decode_only_baseline(payloads):
+    for payload in payloads:
+        json.loads(payload.decode('utf-8'))
+
+def decode_only_typed(payloads):
+    decode = get_event_decoder("api-metrics").decode
+    for payload in payloads:
+        decode(payload)
+
+def measure(fn, payloads, repeat: int = 5) -> float:
+    """Best-of-N time per message in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payloads)
+        best = min(best, time.perf_counter() - start)
+    return best / len(payloads) * 1e6
+
+def main(count: int = 100_000):
+    payloads = make_payloads(count)
+    assert baseline(payloads[:100]) == typed(payloads[:100])
+    
+    print(f"{count} api-metrics messages, best of 5 (us/message)")
+    for label, before, after in [
+        ("decode", decode_only_baseline, decode_only_typed),
+        ("decode + map", baseline, typed)
+    ]:
+        before_us = measure(before, payloads)
+        after_us = measure(after, payloads)
+        print(f"  {label:<14} json+dicts {before_us:6.2f}   msgspec structs {after_us:6.2f}   {before_us / after_us:4.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark: per-request overhead of the metrics middleware.
+
+Drives a minimal FastAPI app directly over ASGI (no server or sockets) with
+no middleware, the previous BaseHTTPMiddleware implementation, and the pure
+ASGI MetricsMiddleware. It also times a streaming endpoint to show what each
+one records as the response time. The Kafka producer is never connected here,
+so telemetry is dropped right after the middleware hands it off, and the
+numbers are middleware cost only.
+
+Run from the backend directory:
+    python -m benchmarks.middleware_overhead
+"""
+import asyncio
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware, get_route_template
+from app.services.metrics_service import metrics_service
+
+STREAM_CHUNKS = 5
+STREAM_CHUNK_DELAY = 0.02
+
+class BaseHTTPMetricsMiddleware(BaseHTTPMiddleware):
+    """The previous implementation, reduced to its timing and hand-off"""
+    
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        metrics_service.send_api_metrics(
+            method=request.method,
+            path=get_route_template(request.scope),
+            status_code=response.status_code,
+            response_time=process_time
+        )
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+def make_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/api/v1/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id, "name": "item"}
+    
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def chunks():
+            for i in range(STREAM_CHUNKS):
+                await asyncio.sleep(STREAM_CHUNK_DELAY)
+                yield f"chunk {i}\n".encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+    
+    if middleware:
+        app.add_middleware(middleware)
+    return app
+
+async def call(app, path: str):
+    """Send one GET request through the ASGI app and drain the response"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)
+    }
+    sent = []
+    request_sent = False
+    response_done = asyncio.Event()
+    
+    async def receive():
+        # Like a server: the request body once, then a disconnect after the response
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_done.set()
+    
+    await app(scope, receive, send)
+    return sent
+
+async def per_request_us(app, requests: int) -> float:
+    for i in range(200):
+        await call(app, f"/api/v1/items/{i}")
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(requests):
+            await call(app, f"/api/v1/items/{i}")
+        best = min(best, time.perf_counter() - start)
+    return best / requests * 1e6
+
+async def recorded_stream_ms(app) -> float:
+    """Response time the middleware reports for the streaming endpoint"""
+    recorded = []
+    original = metrics_service.send_api_metrics
+    metrics_service.send_api_metrics = lambda **kwargs: recorded.append(kwargs["response_time"])
+    try:
+        await call(app, "/api/v1/stream")
+    finally:
+        metrics_service.send_api_metrics = original
+    return recorded[-1] * 1000 if recorded else float("nan")
+
+async def main(requests: int = 5000):
+    variants = [
+        ("none", make_app()),
+        ("BaseHTTPMiddleware", make_app(BaseHTTPMetricsMiddleware)),
+        ("pure ASGI", make_app(MetricsMiddleware))
+    ]
+    
+    baseline = None
+    print(f"\n{requests} GET /api/v1/items/{{item_id}} per run, best of 5")
+    print(f"  {'middleware':<20}{'us/request':>12}{'overhead us':>14}")
+    for label, app in variants:
+        cost = await per_request_us(app, requests)
+        baseline = cost if baseline is None else baseline
+        print(f"  {label:<20}{cost:>12.1f}{cost - baseline:>14.1f}")
+    
+    body_ms = STREAM_CHUNKS * STREAM_CHUNK_DELAY * 1000
+    print(f"\nStreaming response ({STREAM_CHUNKS} chunks, ~{body_ms:.0f} ms body): recorded response time")
+    for label, app in variants[1:]:
+        print(f"  {label:<20}{await recorded_stream_ms(app):>10.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
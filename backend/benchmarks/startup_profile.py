@@ -0,0 +1,66 @@
+"""Benchmark: import-time profile of the backend app.
+
+Imports app.main in a fresh interpreter with -X importtime and reports the
+total, the slowest modules by cumulative time, and the time per top-level
+package. AI provider SDKs and fastmcp should not appear: they load on the
+first chat request, and Kafka/SQLite are only touched in the lifespan.
+
+Run from the backend directory:
+    python -m benchmarks.startup_profile [module] [--top N]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def profile_imports(module: str):
+    """Import a module in a clean interpreter; returns [(module, self_us, cumulative_us, depth)]"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    
+    rows = profile_imports(args.module)
+    total_us = sum(self_us for _, self_us, _, _ in rows)
+    
+    packages = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    
+    print(f"\nimport {args.module}: {total_us / 1000:.1f} ms across {len(rows)} modules")
+    
+    print(f"\nSlowest modules by cumulative time (top {args.top})")
+    print(f"  {'cumulative ms':>14}{'self ms':>10}  module")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {'  ' * depth}{name}")
+    
+    print(f"\nSelf time per top-level package (top {args.top})")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:>10.1f} ms  {package}")
+    
+    lazy = ("anthropic", "openai", "google", "fastmcp", "mcp")
+    loaded = [package for package in lazy if package in packages]
+    print(f"\nLazily loaded packages imported at startup: {', '.join(loaded) or 'none'}")
+
+if __name__ == "__main__":
+    main()
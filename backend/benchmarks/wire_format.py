@@ -0,0 +1,95 @@
+"""Benchmark: bytes per event and encode/decode throughput per wire format.
+
+Compares the original JSON (json.dumps/json.loads), JSON through msgspec
+structs, and the msgpack-v1 binary records, for api-metrics and
+system-metrics. Sizes are reported raw and gzip-compressed per producer
+batch, since the producer compresses batches.
+
+Run from the backend directory:
+    python -m benchmarks.wire_format
+"""
+import gzip
+import json
+import time
+from datetime import datetime
+from app.models.events import (
+    encode_event, encode_binary_event, get_event_decoders,
+    WIRE_FORMAT_JSON, WIRE_FORMAT_MSGPACK_V1
+)
+
+BATCH_SIZE = 500
+
+def make_messages(topic: str, count: int):
+    if topic == "api-metrics":
+        return [
+            {
+                "timestamp": datetime.utcnow().isoformat(),
+                "service": "apppulse-backend",
+                "type": "api_metrics",
+                "data": {
+                    "method": "GET" if i % 4 else "POST",
+                    "path": "/api/v1/items/{item_id}" if i % 3 else "/api/v1/items",
+                    "status_code": 200 if i % 20 else 500,
+                    "response_time_ms": round(1 + (i % 500) * 0.37, 2),
+                    "success": bool(i % 20)
+                }
+            }
+            for i in range(count)
+        ]
+    return [
+        {
+            "timestamp": datetime.utcnow().isoformat(),
+            "service": "apppulse-backend",
+            "type": "system_metrics",
+            "data": {
+                "cpu_percent": (i % 100) * 1.1,
+                "memory_percent": 42.3,
+                "disk_usage": 71.8,
+                "process_memory": 153.27 + i % 10
+            }
+        }
+        for i in range(count)
+    ]
+
+def batched_gzip_size(payloads) -> float:
+    """Average compressed bytes per event when sent in producer-sized batches"""
+    total = 0
+    for start in range(0, len(payloads), BATCH_SIZE):
+        total += len(gzip.compress(b"".join(payloads[start:start + BATCH_SIZE])))
+    return total / len(payloads)
+
+def best_rate(fn, items, repeat: int = 5) -> float:
+    """Best-of-N throughput in events per second"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+def run(topic: str, count: int):
+    messages = make_messages(topic, count)
+    decoders = get_event_decoders(topic)
+    formats = [
+        ("json (stdlib)", lambda m: json.dumps(m).encode('utf-8'), lambda v: json.loads(v.decode('utf-8'))),
+        ("json (msgspec)", encode_event, decoders[WIRE_FORMAT_JSON]),
+        ("msgpack-v1", lambda m: encode_binary_event(topic, m), decoders[WIRE_FORMAT_MSGPACK_V1])
+    ]
+    
+    print(f"\n{topic}: {count} events")
+    print(f"  {'format':<16}{'bytes/event':>12}{'gzip/event':>12}{'encode/s':>12}{'decode/s':>12}")
+    for label, encode, decode in formats:
+        payloads = [encode(m) for m in messages]
+        raw_size = sum(len(p) for p in payloads) / len(payloads)
+        print(
+            f"  {label:<16}{raw_size:>12.1f}{batched_gzip_size(payloads):>12.1f}"
+            f"{best_rate(encode, messages):>12,.0f}{best_rate(decode, payloads):>12,.0f}"
+        )
+
+def main(count: int = 50_000):
+    for topic in ("api-metrics", "system-metrics"):
+        run(topic, count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+from sqlalchemy import create_engine
+from app.models.database import Base
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Throwaway SQLite database standing in for the writer engine"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr("app.services.db_writer.writer_engine", engine)
+    yield engine
+    engine.dispose()
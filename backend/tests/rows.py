@@ -0,0 +1,14 @@
+from datetime import datetime
+
+def api_row(timestamp: datetime, path: str = "/api/v1/items", response_time_ms: float = 12.0,
+            success: bool = True, weight: float = 1.0):
+    """A mapped api-metrics row as the message handler produces it"""
+    return {
+        "timestamp": timestamp,
+        "method": "GET",
+        "path": path,
+        "status_code": 200 if success else 500,
+        "response_time_ms": response_time_ms,
+        "success": success,
+        "weight": weight
+    }
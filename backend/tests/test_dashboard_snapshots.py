@@ -0,0 +1,24 @@
+from datetime import datetime
+from app.services.dashboard_snapshots import DashboardSnapshots, etag_matches
+from app.services.memory_storage import MemoryStorage
+
+def test_if_none_match_uses_weak_comparison_over_a_list():
+    etag = '"ab12-7"'
+    assert etag_matches('"ab12-7"', etag)
+    assert etag_matches('W/"ab12-7"', etag)
+    assert etag_matches('"ab12-6", W/"ab12-7"', etag)
+    assert etag_matches(' * ', etag)
+    assert not etag_matches('"ab12-6"', etag)
+    assert not etag_matches('"ab12-7', etag)
+    assert not etag_matches(None, etag)
+
+def test_etag_changes_only_with_the_data():
+    storage = MemoryStorage()
+    snapshots = DashboardSnapshots(storage, min_interval_ms=0, max_age_seconds=0)
+    first_etag, first_body = snapshots.get()
+    assert snapshots.get()[0] == first_etag
+    
+    storage.add_ui_error({"timestamp": datetime.utcnow().isoformat(), "data": {"error_message": "boom"}})
+    etag, body = snapshots.get()
+    assert etag != first_etag
+    assert body != first_body
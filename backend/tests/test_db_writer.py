@@ -0,0 +1,110 @@
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from app.models.database import APIMetric
+from app.services.db_writer import DatabaseWriter
+from app.services.rollups import APIRollupAccumulator
+from tests.rows import api_row
+
+class Unavailable:
+    """Writer engine whose connections always fail"""
+    
+    def connect(self):
+        raise OSError("database unavailable")
+
+class Gated:
+    """Writer engine whose connections wait until the gate opens"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.gate = threading.Event()
+    
+    def connect(self):
+        self.gate.wait(5)
+        return self.engine.connect()
+
+def count_rows(engine, table: str = "api_metrics") -> int:
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+def make_writer(**kwargs) -> DatabaseWriter:
+    return DatabaseWriter({"api-metrics": APIMetric.__table__}, **kwargs)
+
+def test_stop_drains_queued_rows(engine):
+    # Neither size nor time would trigger a flush before stop
+    writer = make_writer(batch_rows=10000, flush_interval_ms=60000)
+    writer.start()
+    for _ in range(100):
+        writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    checkpoint = writer.checkpoint()
+    writer.stop()
+    
+    assert count_rows(engine) == 100
+    assert writer.thread is None
+    assert writer.is_flushed(checkpoint)
+
+def test_rows_after_stop_are_written_through(engine):
+    writer = make_writer()
+    writer.start()
+    writer.stop()
+    
+    writer.enqueue_many("api-metrics", [api_row(datetime.utcnow()), api_row(datetime.utcnow())])
+    assert count_rows(engine) == 2
+    assert writer.is_flushed(writer.checkpoint())
+    
+    writer.stop()  # A second stop flushes and closes without a thread
+    assert writer.get_stats()["buffered_rows"] == {"api-metrics": 0}
+
+def test_failed_flush_keeps_rows_for_the_next_one(engine, monkeypatch):
+    writer = make_writer(max_flush_attempts=3)
+    monkeypatch.setattr("app.services.db_writer.writer_engine", Unavailable())
+    writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    
+    assert writer.stats["flush_errors"] == 1
+    assert writer.get_stats()["buffered_rows"] == {"api-metrics": 1}
+    assert not writer.is_flushed(writer.checkpoint())
+    
+    monkeypatch.setattr("app.services.db_writer.writer_engine", engine)
+    writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    assert count_rows(engine) == 2
+    assert writer.stats["rows_dropped"] == 0
+    assert writer.is_flushed(writer.checkpoint())
+
+def test_rows_and_rollups_are_dropped_after_max_attempts(engine, monkeypatch):
+    accumulator = APIRollupAccumulator()
+    writer = make_writer(max_flush_attempts=2, accumulators={"api-metrics": accumulator})
+    monkeypatch.setattr("app.services.db_writer.writer_engine", Unavailable())
+    writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    assert accumulator.pending
+    writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    
+    assert writer.stats["rows_dropped"] == 2
+    assert not accumulator.pending
+    # Given-up rows no longer hold back offset commits
+    assert writer.is_flushed(writer.checkpoint())
+    
+    monkeypatch.setattr("app.services.db_writer.writer_engine", engine)
+    writer.enqueue("api-metrics", api_row(datetime.utcnow()))
+    assert count_rows(engine) == 1
+    assert count_rows(engine, "api_metric_rollups") == 3  # One bucket per resolution
+
+def test_queue_is_bounded_by_rows(engine, monkeypatch):
+    gated = Gated(engine)
+    monkeypatch.setattr("app.services.db_writer.writer_engine", gated)
+    writer = make_writer(batch_rows=10, flush_interval_ms=60000)  # At most 40 queued rows
+    writer.start()
+    # The first full batch holds the writer thread inside its flush
+    writer.enqueue_many("api-metrics", [api_row(datetime.utcnow())] * 10)
+    writer.enqueue_many("api-metrics", [api_row(datetime.utcnow())] * 40)
+    
+    producer = threading.Thread(target=writer.enqueue, args=("api-metrics", api_row(datetime.utcnow())))
+    producer.start()
+    producer.join(timeout=0.3)
+    assert producer.is_alive()
+    assert writer.get_stats()["queued_rows"] == 40
+    
+    gated.gate.set()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    writer.stop()
+    assert count_rows(engine) == 51
@@ -0,0 +1,53 @@
+import msgspec
+from app.models.events import (
+    WIRE_FORMAT_JSON, WIRE_FORMAT_MSGPACK_V1, encode_binary_event, encode_event, event_to_dict, get_event_decoders
+)
+
+API_MESSAGE = {
+    "timestamp": "2024-05-01T12:00:30",
+    "service": "app-pulse-backend",
+    "type": "api_metrics",
+    "data": {"method": "GET", "path": "/api/v1/items", "status_code": 200, "response_time_ms": 12.5,
+             "success": True, "count": 4.0}
+}
+
+def test_api_metrics_decode_the_same_from_both_formats():
+    decoders = get_event_decoders("api-metrics")
+    from_json = decoders[WIRE_FORMAT_JSON](encode_event(API_MESSAGE))
+    from_binary = decoders[WIRE_FORMAT_MSGPACK_V1](encode_binary_event("api-metrics", API_MESSAGE))
+    
+    assert from_binary.data == from_json.data
+    assert from_binary.service == "app-pulse-backend"
+    assert event_to_dict(from_binary)["timestamp"] == "2024-05-01T12:00:30"
+    # Positional arrays are smaller than the JSON objects they replace
+    assert len(encode_binary_event("api-metrics", API_MESSAGE)) < len(encode_event(API_MESSAGE)) / 2
+
+def test_system_metrics_keep_collector_fields():
+    message = {
+        "timestamp": "2024-05-01T12:00:00",
+        "data": {"cpu_percent": 40.0, "memory_percent": 61.5, "disk_usage": 70.0, "process_memory": 120.0,
+                 "cpu_per_core": [35.0, 45.0], "event_loop_lag_max_ms": 8.5, "process_threads": 12}
+    }
+    event = get_event_decoders("system-metrics")[WIRE_FORMAT_MSGPACK_V1](encode_binary_event("system-metrics", message))
+    
+    assert event.data.cpu_percent == 40.0
+    assert event.data.cpu_per_core == [35.0, 45.0]
+    assert event.data.event_loop_lag_max_ms == 8.5
+    assert event.data.process_threads == 12
+    assert event.data.gc_pause_ms is None
+
+def test_older_shorter_records_still_decode():
+    # A system-metrics v1 record written before the collector fields were appended
+    old_record = msgspec.msgpack.encode([1714564800.0, 40.0, 61.5, 70.0, 120.0])
+    event = get_event_decoders("system-metrics")[WIRE_FORMAT_MSGPACK_V1](old_record)
+    
+    assert event.data.memory_percent == 61.5
+    assert event.data.cpu_per_core is None
+
+def test_json_events_ignore_unknown_fields():
+    payload = encode_event({**API_MESSAGE, "region": "eu", "data": {**API_MESSAGE["data"], "trace_id": "abc"}})
+    event = get_event_decoders("api-metrics")[WIRE_FORMAT_JSON](payload)
+    assert event.data.path == "/api/v1/items"
+
+def test_error_topics_have_no_binary_format():
+    assert set(get_event_decoders("ui-errors")) == {WIRE_FORMAT_JSON}
@@ -0,0 +1,81 @@
+import asyncio
+from app.services.item_cache import ItemCache
+
+class Loader:
+    """Counts loads and holds each one until released"""
+    
+    def __init__(self, body=b'{"id": 1}'):
+        self.body = body
+        self.calls = 0
+        self.release = asyncio.Event()
+    
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.body
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = ItemCache()
+        loader = Loader()
+        waiters = [asyncio.ensure_future(cache.get(1, loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        bodies = await asyncio.gather(*waiters)
+        
+        assert bodies == [b'{"id": 1}'] * 5
+        assert loader.calls == 1
+        assert await cache.get(1, loader) == b'{"id": 1}'
+        assert (cache.stats["misses"], cache.stats["coalesced"], cache.stats["hits"]) == (1, 4, 1)
+    
+    asyncio.run(scenario())
+
+def test_invalidation_during_a_load_only_skips_that_item():
+    async def scenario():
+        cache = ItemCache()
+        stale, other = Loader(b"old"), Loader(b"two")
+        first = asyncio.ensure_future(cache.get(1, stale))
+        second = asyncio.ensure_future(cache.get(2, other))
+        await asyncio.sleep(0)
+        
+        cache.invalidate(1)
+        stale.release.set()
+        other.release.set()
+        assert await first == b"old"
+        assert await second == b"two"
+        
+        # The load that straddled item 1's write is not stored; item 2's is
+        assert 1 not in cache.entries
+        assert cache.entries[2][1] == b"two"
+    
+    asyncio.run(scenario())
+
+def test_expired_entries_and_missing_items_are_reloaded():
+    async def scenario():
+        cache = ItemCache(ttl_seconds=0)
+        loader = Loader()
+        loader.release.set()
+        await cache.get(1, loader)
+        await cache.get(1, loader)
+        assert loader.calls == 2
+        assert cache.stats["expirations"] == 1
+        
+        missing = Loader(None)
+        missing.release.set()
+        assert await cache.get(3, missing) is None
+        assert 3 not in cache.entries
+    
+    asyncio.run(scenario())
+
+def test_least_recently_used_entries_are_evicted():
+    async def scenario():
+        cache = ItemCache(max_entries=2)
+        for item_id in (1, 2, 1, 3):
+            loader = Loader(str(item_id).encode())
+            loader.release.set()
+            await cache.get(item_id, loader)
+        
+        assert list(cache.entries) == [1, 3]
+        assert cache.stats["evictions"] == 1
+    
+    asyncio.run(scenario())
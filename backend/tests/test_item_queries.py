@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+import msgspec
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from app.models.database import Base, Item
+from app.services.item_queries import ItemQuery
+
+@pytest.fixture
+def item_query(tmp_path):
+    path = tmp_path / "items.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    # Shared updated_at values exercise the id tie-break of the keyset
+    with Session(engine) as session:
+        session.add_all(
+            Item(name=f"item {i}", price=float(i), category="even" if i % 2 == 0 else "odd",
+                 updated_at=datetime(2024, 1, 1 + i // 10))
+            for i in range(1, 51)
+        )
+        session.commit()
+    engine.dispose()
+    
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield ItemQuery(async_sessionmaker(async_engine, class_=AsyncSession), max_limit=20, export_batch_size=7)
+    asyncio.run(async_engine.dispose())
+
+def collect_pages(item_query: ItemQuery, limit: int, **filters):
+    async def run():
+        ids, cursor = [], None
+        async with item_query.session_factory() as session:
+            while True:
+                rows, cursor = await item_query.get_page(session, limit, cursor, fields="id", **filters)
+                ids.extend(row["id"] for row in rows)
+                if cursor is None:
+                    return ids
+    return asyncio.run(run())
+
+def export(item_query: ItemQuery, **kwargs) -> bytes:
+    async def run():
+        return b"".join([chunk async for chunk in item_query.export(**kwargs)])
+    return asyncio.run(run())
+
+def test_keyset_pages_cover_every_item_once(item_query):
+    assert collect_pages(item_query, 6) == list(range(1, 51))
+    by_update = collect_pages(item_query, 6, order_by="updated_at")
+    assert sorted(by_update) == list(range(1, 51))
+    assert len(set(by_update)) == 50
+    assert collect_pages(item_query, 3, category="odd", min_price=10, max_price=20) == [11, 13, 15, 17, 19]
+
+def test_page_size_is_capped(item_query):
+    async def run():
+        async with item_query.session_factory() as session:
+            return await item_query.get_page(session, 500)
+    rows, cursor = asyncio.run(run())
+    assert len(rows) == item_query.max_limit
+    assert cursor is not None
+
+def test_exports_stream_every_matching_item(item_query):
+    lines = export(item_query, fields="id,price", min_price=45).splitlines()
+    assert [msgspec.json.decode(line) for line in lines] == [{"id": i, "price": float(i)} for i in range(45, 51)]
+    
+    # Unpaged lists are one JSON array, built from the same keyset batches
+    assert [row["id"] for row in msgspec.json.decode(export(item_query, json_array=True))] == list(range(1, 51))
+    assert export(item_query, json_array=True, min_price=1000) == b"[]"
+
+def test_invalid_arguments_raise_before_streaming(item_query):
+    with pytest.raises(ValueError):
+        item_query.export(fields="id,secret")
+    with pytest.raises(ValueError):
+        item_query.export(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        item_query.decode_cursor(item_query.encode_cursor("id", {"id": 3}), "updated_at")
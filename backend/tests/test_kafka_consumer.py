@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import namedtuple
+import msgspec
+import pytest
+
+pytest.importorskip("kafka")
+from kafka.structs import TopicPartition
+from app.services.kafka_consumer import KafkaConsumerService
+
+Record = namedtuple("Record", "offset value headers")
+
+class FakeConsumer:
+    """Serves queued polls and records commits"""
+    
+    def __init__(self, polls):
+        self.polls = list(polls)
+        self.commits = []
+        self.closed = False
+    
+    def poll(self, timeout_ms):
+        if self.polls:
+            return self.polls.pop(0)
+        time.sleep(0.01)
+        return {}
+    
+    def commit(self, offsets):
+        self.commits.append({tp.partition: meta.offset for tp, meta in offsets.items()})
+    
+    def close(self):
+        self.closed = True
+
+class Barrier:
+    """Database writer stand-in: checkpoints are flushed once released"""
+    
+    def __init__(self):
+        self.seq = 0
+        self.flushed = 0
+    
+    def checkpoint(self):
+        self.seq += 1
+        return self.seq
+    
+    def is_flushed(self, seq):
+        return seq <= self.flushed
+
+def records(start, count):
+    return [Record(offset, msgspec.json.encode({"n": offset}), []) for offset in range(start, start + count)]
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def run(polls, barrier=None):
+    service = KafkaConsumerService()
+    consumer = FakeConsumer(polls)
+    service.create_consumer = lambda topics, group_id, listener=None: consumer
+    batches = []
+    lock = threading.Lock()
+    
+    def batch_handler(messages, topic):
+        with lock:
+            batches.append((topic, [message["n"] for message in messages]))
+    
+    service.start_consumer(["api-metrics"], "test-group", batch_handler=batch_handler, write_barrier=barrier)
+    return service, consumer, batches
+
+def test_each_partition_is_handled_as_one_ordered_batch():
+    polls = [{TopicPartition("api-metrics", 0): records(0, 3), TopicPartition("api-metrics", 1): records(10, 2)}]
+    service, consumer, batches = run(polls)
+    
+    assert wait_for(lambda: consumer.commits)
+    service.stop_all_consumers()
+    assert sorted(batches) == [("api-metrics", [0, 1, 2]), ("api-metrics", [10, 11])]
+    # Committed offsets are the next record to read
+    assert consumer.commits == [{0: 3, 1: 12}]
+    assert consumer.closed
+
+def test_offsets_wait_for_the_writer_to_flush():
+    barrier = Barrier()
+    polls = [{TopicPartition("api-metrics", 0): records(0, 2)}, {TopicPartition("api-metrics", 0): records(2, 2)}]
+    service, consumer, batches = run(polls, barrier)
+    
+    assert wait_for(lambda: len(batches) == 2)
+    time.sleep(0.05)
+    assert consumer.commits == []
+    
+    barrier.flushed = 1
+    assert wait_for(lambda: consumer.commits)
+    assert consumer.commits == [{0: 2}]
+    
+    barrier.flushed = 2
+    service.stop_all_consumers()
+    assert consumer.commits[-1] == {0: 4}
@@ -0,0 +1,48 @@
+import random
+from app.services.latency_sketch import LatencySketch
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def sketch_of(values) -> LatencySketch:
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+def test_quantiles_stay_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.2) for _ in range(20000)]
+    sketch = sketch_of(values)
+    
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= exact * LatencySketch.RELATIVE_ACCURACY * 1.01
+    assert sketch.summary()["count"] == 20000
+
+def test_merge_and_subtract_are_inverse():
+    window = sketch_of([5.0] * 50 + [250.0] * 50)
+    expired = sketch_of([250.0] * 50)
+    
+    window.subtract(expired)
+    assert window.count == 50
+    assert round(window.quantile(0.99), 1) == 5.0
+    
+    window.merge(expired)
+    assert window.count == 100
+    assert window.quantile(0.99) > 240
+
+def test_zero_latencies_and_serialized_bins():
+    sketch = sketch_of([0.0] * 10 + [40.0] * 10)
+    assert sketch.quantile(0.25) == 0.0
+    assert sketch.items()[0] == (0.0, 10)
+    
+    restored = LatencySketch.from_bins({str(key): count for key, count in sketch.bins.items()}, sketch.zero_count)
+    assert restored.count == 20
+    assert restored.quantiles([0.25, 0.9]) == sketch.quantiles([0.25, 0.9])
+
+def test_empty_sketch_has_no_quantiles():
+    sketch = LatencySketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.summary()["p99"] is None
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timedelta
+import msgspec
+from app.services.memory_storage import ColumnarMetricStorage, MemoryStorage
+
+def api_event(timestamp: datetime, path: str, response_time_ms: float, status_code: int = 200):
+    return {
+        "timestamp": timestamp.isoformat(),
+        "data": {
+            "method": "GET",
+            "path": path,
+            "status_code": status_code,
+            "response_time_ms": response_time_ms,
+            "success": status_code < 400
+        }
+    }
+
+def test_api_stats_follow_adds_and_evictions():
+    storage = MemoryStorage()
+    now = datetime.utcnow()
+    storage.add_api_metric(api_event(now - timedelta(minutes=30), "/a", 10.0))
+    storage.add_api_metric(api_event(now, "/a", 30.0, 500))
+    storage.add_api_metric(api_event(now, "/b", 20.0))
+    
+    stats = storage.get_dashboard_data()["aggregated"]["api_stats"]
+    assert stats["total_requests"] == 3
+    assert stats["error_count"] == 1
+    assert stats["avg_response_time"] == 20.0
+    
+    # Shrinking the window evicts the older row and subtracts it from the totals
+    storage.api_metrics.max_age_seconds = 600
+    stats = storage.get_dashboard_data()["aggregated"]["api_stats"]
+    assert stats["total_requests"] == 2
+    assert stats["avg_response_time"] == 25.0
+
+def test_ui_error_count_drops_expired_errors():
+    storage = MemoryStorage()
+    storage.add_ui_error({"timestamp": datetime.utcnow().isoformat(), "data": {"error_message": "boom"}})
+    assert storage.aggregated_stats["ui_stats"]["total_errors"] == 1
+    
+    storage.ui_errors.max_age_seconds = 0
+    time.sleep(0.01)
+    assert storage.get_dashboard_data()["aggregated"]["ui_stats"]["total_errors"] == 0
+
+def test_snapshot_round_trip_restores_windows_and_aggregates():
+    storage = MemoryStorage()
+    now = datetime.utcnow()
+    for i in range(50):
+        storage.add_api_metric(api_event(now - timedelta(seconds=i), f"/api/v1/items/{i % 3}", 5.0 + i,
+                                         500 if i % 10 == 0 else 200))
+    storage.add_system_metric({"timestamp": now.isoformat(), "data": {"cpu_percent": 12.5, "memory_percent": 40.0}})
+    storage.add_ui_error({"timestamp": now.isoformat(), "data": {"message": "boom"}})
+    
+    # Snapshots are written as msgpack
+    state = msgspec.msgpack.decode(msgspec.msgpack.encode(storage.export_state()))
+    restored = MemoryStorage()
+    restored.restore_state(state)
+    
+    assert restored.export_state() == storage.export_state()
+    assert restored.get_latency_percentiles() == storage.get_latency_percentiles()
+    assert restored.get_dashboard_data()["aggregated"] == storage.get_dashboard_data()["aggregated"]
+
+def test_restore_expires_rows_that_aged_out():
+    storage = MemoryStorage()
+    storage.add_api_metric(api_event(datetime.utcnow() - timedelta(minutes=90), "/old", 10.0))
+    assert storage.api_totals["count"] == 1
+    
+    # A shorter window stands in for the time that passed while the process was down
+    restored = MemoryStorage()
+    restored.api_metrics.max_age_seconds = 3600
+    restored.restore_state(storage.export_state())
+    
+    assert len(restored.api_metrics) == 0
+    assert restored.api_totals["count"] == 0
+    assert restored.get_latency_percentiles() == MemoryStorage().get_latency_percentiles()
+
+def test_late_rows_are_kept_in_timestamp_order():
+    evicted = []
+    storage = ColumnarMetricStorage(max_age_minutes=1, on_evict=lambda *args: evicted.append(args))
+    now = time.time()
+    for offset in (0, 5, 2, 9, 1):
+        storage.add_row(now - offset, "GET", "/", 200, 1.0, True)
+    assert list(storage.timestamps) == sorted(storage.timestamps)
+    
+    # A row older than the window evicts only itself
+    storage.add_row(now - 3600, "GET", "/", 200, 1.0, True)
+    assert len(evicted) == 1
+    assert len(storage.timestamps) - storage.head == 5
+
+def test_methods_past_the_byte_range_share_an_overflow_id():
+    storage = ColumnarMetricStorage()
+    for i in range(300):
+        storage.add_row(time.time(), f"M{i}", "/", 200, 1.0, True)
+    
+    assert len(storage.methods) == ColumnarMetricStorage.MAX_METHODS
+    assert storage.methods[-1] == ColumnarMetricStorage.OVERFLOW_METHOD
+    assert {len(column) for column in storage._columns().values()} == {300}
@@ -0,0 +1,40 @@
+import random
+from app.services.metrics_sampler import MetricsSampler
+
+def test_errors_and_slow_requests_are_always_kept():
+    sampler = MetricsSampler(sample_rate=0.0, outlier_threshold_ms=500, route_thresholds_ms={"/api/v1/export": 5000})
+    
+    assert sampler.sample("/api/v1/items", 500, 0.01) == 1.0
+    assert sampler.sample("/api/v1/items", 200, 0.6) == 1.0
+    assert sampler.sample("/api/v1/items", 200, 0.01) is None
+    # A route's own threshold replaces the global one
+    assert sampler.sample("/api/v1/export", 200, 0.6) is None
+    assert sampler.stats == {"kept": 0, "kept_tail": 2, "dropped": 2}
+
+def test_kept_requests_carry_the_inverse_rate(monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.1)
+    sampler = MetricsSampler(sample_rate=0.25)
+    assert sampler.sample("/api/v1/items", 200, 0.01) == 4.0
+    
+    monkeypatch.setattr(random, "random", lambda: 0.9)
+    assert sampler.sample("/api/v1/items", 200, 0.01) is None
+
+def test_adaptive_rate_follows_the_event_budget(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.metrics_sampler.time.time", lambda: clock[0])
+    sampler = MetricsSampler(sample_rate=1.0, adaptive=True, event_budget_per_second=100)
+    
+    # Two seconds at 1000 requests/s push the rate below the base rate
+    for _ in range(2):
+        for _ in range(1000):
+            sampler.sample("/api/v1/items", 200, 0.01)
+        clock[0] += 1
+    sampler.sample("/api/v1/items", 200, 0.01)
+    assert 0 < sampler.rate < 0.5
+    assert sampler.rate == 100 / sampler.observed_per_second
+    
+    # Once traffic stops the smoothed rate decays and the base rate returns
+    for _ in range(30):
+        clock[0] += 1
+        sampler.sample("/api/v1/items", 200, 0.01)
+    assert sampler.rate == 1.0
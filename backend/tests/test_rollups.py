@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from app.services.rollups import APIRollupAccumulator, RetentionPolicy, histogram_quantiles
+from tests.rows import api_row
+
+BUCKET = datetime(2024, 5, 1, 12, 0)
+
+def minute_rollup(engine, path: str = "/api/v1/items"):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT * FROM api_metric_rollups WHERE resolution_seconds = 60 AND path = :path"),
+            {"path": path}
+        ).mappings().one()
+
+def flush(engine, accumulator: APIRollupAccumulator):
+    with engine.begin() as connection:
+        accumulator.flush(connection)
+    accumulator.clear()
+
+def test_weighted_rows_fold_into_one_bucket_per_resolution():
+    accumulator = APIRollupAccumulator()
+    accumulator.add_row(api_row(BUCKET.replace(second=5), response_time_ms=7.0, weight=2.5))
+    accumulator.add_row(api_row(BUCKET.replace(second=50), response_time_ms=300.0, success=False))
+    
+    assert sorted(resolution for resolution, _, _ in accumulator.pending) == [60, 300, 3600]
+    rollup = accumulator.pending[(60, BUCKET, "/api/v1/items")]
+    assert rollup["request_count"] == 3.5
+    assert rollup["error_count"] == 1
+    assert rollup["response_time_sum"] == pytest.approx(7.0 * 2.5 + 300.0)
+    assert (rollup["response_time_min"], rollup["response_time_max"]) == (7.0, 300.0)
+    assert rollup["bucket_le_10"] == 2.5
+    assert rollup["bucket_le_500"] == 1
+
+def test_upsert_adds_to_stored_buckets(engine):
+    accumulator = APIRollupAccumulator()
+    accumulator.add_row(api_row(BUCKET, response_time_ms=40.0, weight=1 / 3))
+    flush(engine, accumulator)
+    accumulator.add_row(api_row(BUCKET.replace(second=30), response_time_ms=2.0))
+    accumulator.add_row(api_row(BUCKET.replace(second=40), response_time_ms=90.0, success=False))
+    flush(engine, accumulator)
+    
+    rollup = minute_rollup(engine)
+    # Fractional sampling weights survive the round trip
+    assert rollup["request_count"] == pytest.approx(2 + 1 / 3)
+    assert rollup["error_count"] == 1
+    assert rollup["response_time_sum"] == pytest.approx(40.0 / 3 + 2.0 + 90.0)
+    assert rollup["response_time_min"] == 2.0
+    assert rollup["response_time_max"] == 90.0
+    assert rollup["bucket_le_5"] == 1
+    assert rollup["bucket_le_50"] == pytest.approx(1 / 3)
+    assert rollup["bucket_le_100"] == 1
+
+def test_pending_buckets_survive_a_rolled_back_transaction(engine):
+    accumulator = APIRollupAccumulator()
+    accumulator.add_row(api_row(BUCKET))
+    
+    with pytest.raises(RuntimeError):
+        with engine.begin() as connection:
+            accumulator.flush(connection)
+            raise RuntimeError("insert failed")
+    assert accumulator.pending
+    
+    flush(engine, accumulator)
+    assert not accumulator.pending
+    assert minute_rollup(engine)["request_count"] == 1
+
+def test_retention_only_deletes_tables_with_a_cutoff(engine):
+    old = datetime.utcnow() - timedelta(days=3)
+    accumulator = APIRollupAccumulator()
+    accumulator.add_row(api_row(old))
+    flush(engine, accumulator)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO api_metrics (timestamp, path) VALUES (:ts, '/old')"), {"ts": old})
+        connection.execute(text("INSERT INTO system_metrics (timestamp, cpu_percent) VALUES (:ts, 1)"), {"ts": old})
+    
+    policy = RetentionPolicy(
+        raw_retention_hours={"api_metrics": 48, "system_metrics": 0},
+        rollup_retention_days={60: 1, 300: 7, 3600: 0},
+        batch_size=1
+    )
+    with engine.connect() as connection:
+        assert policy.apply(connection) == 2
+        counts = connection.execute(text(
+            "SELECT (SELECT COUNT(*) FROM api_metrics), (SELECT COUNT(*) FROM system_metrics), "
+            "(SELECT group_concat(resolution_seconds) FROM api_metric_rollups)"
+        )).one()
+    # Raw api rows and the expired minute rollup go; system metrics and coarser rollups stay
+    assert counts[0] == 0
+    assert counts[1] == 1
+    assert sorted(counts[2].split(",")) == ["300", "3600"]
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    # 100 requests: 50 in (5, 10], 40 in (10, 25], 10 above 5000 ms
+    buckets = [0, 50, 40, 0, 0, 0, 0, 0, 0, 0, 10]
+    p50, p90, p99 = histogram_quantiles(buckets, 6.0, 9000.0, [0.5, 0.9, 0.99])
+    
+    assert p50 == 10.0
+    assert p90 == 25.0
+    assert 5000.0 < p99 < 9000.0
+    assert histogram_quantiles([0] * 11, 0.0, 0.0, [0.5]) == [None]
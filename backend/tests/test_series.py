@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models.database import APIMetric
+from app.services.series import SeriesQuery, lttb
+from tests.rows import api_row
+
+def test_lttb_keeps_endpoints_and_spikes():
+    timestamps = [float(t) for t in range(1000)]
+    values = [1.0] * 1000
+    values[437] = 90.0
+    
+    sampled_t, sampled_v = lttb(timestamps, values, 50)
+    assert len(sampled_t) == 50
+    assert (sampled_t[0], sampled_t[-1]) == (0.0, 999.0)
+    assert 437.0 in sampled_t
+    assert max(sampled_v) == 90.0
+
+def test_lttb_returns_short_series_unchanged():
+    assert lttb([1.0, 2.0], [3.0, 4.0], 10) == ([1.0, 2.0], [3.0, 4.0])
+
+def test_raw_buckets_weight_summary_rows(engine):
+    # Aligned to the 30-second buckets so each row's bucket is fixed
+    start = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=30)
+    rows = [
+        api_row(start + timedelta(seconds=5), response_time_ms=10.0),
+        api_row(start + timedelta(seconds=20), response_time_ms=40.0, weight=3.0),
+        api_row(start + timedelta(seconds=70), response_time_ms=100.0, success=False)
+    ]
+    with engine.begin() as connection:
+        connection.execute(APIMetric.__table__.insert(), rows)
+    
+    query = SeriesQuery(engine)
+    # 60 points over 30 minutes make 30-second buckets
+    requests = query.get_series("requests", start, start + timedelta(minutes=30), points=60)
+    assert requests["source"] == "api_metrics"
+    assert requests["bucket_seconds"] == 30
+    assert requests["values"] == [4, 1]
+    
+    latency = query.get_series("latency_avg", start, start + timedelta(minutes=30), points=60)
+    assert latency["values"] == [32.5, 100.0]
+    errors = query.get_series("error_rate", start, start + timedelta(minutes=30), points=60)
+    assert errors["values"] == [0.0, 100.0]
+
+def test_rollups_serve_long_and_expired_ranges(engine, monkeypatch):
+    monkeypatch.setattr("app.services.series.settings.raw_retention_hours", 48)
+    monkeypatch.setattr("app.services.series.settings.rollup_query_min_hours", 6)
+    query = SeriesQuery(engine)
+    now = datetime.utcnow()
+    
+    # Short recent windows read raw rows
+    assert query._rollup_resolution(now - timedelta(hours=1), now, 500) is None
+    # A week in 500 points is ~20-minute buckets: the 5-minute rollup fits
+    assert query._rollup_resolution(now - timedelta(days=7), now, 500) == 300
+    # Past raw retention, fine buckets fall back to the finest rollup
+    old = now - timedelta(days=3)
+    assert query._rollup_resolution(old, old + timedelta(minutes=10), 500) == 60
+
+def test_unknown_metric_and_lttb_metric_are_rejected(engine):
+    query = SeriesQuery(engine)
+    now = datetime.utcnow()
+    with pytest.raises(ValueError):
+        query.get_series("throughput", now - timedelta(hours=1), now)
+    with pytest.raises(ValueError):
+        query.get_series("requests", now - timedelta(hours=1), now, mode="lttb")
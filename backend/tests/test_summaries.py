@@ -0,0 +1,60 @@
+from datetime import datetime
+from sqlalchemy import text
+from app.models.events import API_METRICS_SUMMARY_TYPE, APIMetricData, APIMetricEvent
+from app.services.latency_sketch import LatencySketch
+from app.services.memory_storage import ColumnarMetricStorage
+from app.services.message_handler import message_handler
+from app.services.rollups import APIRollupAccumulator
+
+def summary_event(timestamp: datetime) -> APIMetricEvent:
+    # 90 fast requests and 10 slow ones: the mean sits between them
+    latencies = [4.0] * 90 + [800.0] * 10
+    sketch = LatencySketch()
+    for latency in latencies:
+        sketch.add(latency)
+    return APIMetricEvent(
+        timestamp=timestamp.isoformat(),
+        type=API_METRICS_SUMMARY_TYPE,
+        data=APIMetricData(
+            method="GET", path="/api/v1/items", status_code=200,
+            response_time_ms=sum(latencies) / len(latencies), success=True, count=len(latencies),
+            response_time_min=4.0, response_time_max=800.0,
+            latency_bins=sketch.bins, latency_zero_count=sketch.zero_count
+        )
+    )
+
+def mapped_row(event: APIMetricEvent):
+    return message_handler._map_message_to_row(event, message_handler.topic_config["api-metrics"])
+
+def test_summary_rows_keep_their_spread(engine):
+    row = mapped_row(summary_event(datetime(2024, 5, 1, 12, 0, 30)))
+    assert (row["response_time_min"], row["response_time_max"], row["weight"]) == (4.0, 800.0, 100)
+    
+    with engine.begin() as connection:
+        connection.execute(message_handler.topic_config["api-metrics"]["db_model"].__table__.insert(), [row])
+        stored = connection.execute(text("SELECT response_time_min, response_time_max, latency_bins FROM api_metrics")).one()
+    assert stored[:2] == (4.0, 800.0)
+    assert stored[2]
+
+def test_rollups_fold_summary_distribution_into_histogram():
+    accumulator = APIRollupAccumulator()
+    accumulator.add_row(mapped_row(summary_event(datetime(2024, 5, 1, 12, 0, 30))))
+    
+    rollup = accumulator.pending[(60, datetime(2024, 5, 1, 12, 0), "/api/v1/items")]
+    assert (rollup["response_time_min"], rollup["response_time_max"]) == (4.0, 800.0)
+    # Requests land in the buckets of their own latency, not the bucket of the mean (83.6 ms)
+    assert rollup["bucket_le_5"] == 90
+    assert rollup["bucket_le_1000"] == 10
+    assert rollup["bucket_le_100"] == 0
+    assert rollup["request_count"] == 100
+
+def test_memory_summaries_report_the_summary_max():
+    storage = ColumnarMetricStorage()
+    event = summary_event(datetime.utcnow())
+    storage.add_row(datetime.utcnow().timestamp(), "GET", "/api/v1/items", 200, event.data.response_time_ms, True,
+                    event.data.count, None, event.data.response_time_min, event.data.response_time_max)
+    
+    summary = storage.summarize_since(0)
+    assert summary["response_time_min"] == 4.0
+    assert summary["response_time_max"] == 800.0
+    assert summary["paths"]["/api/v1/items"]["response_time_max"] == 800.0
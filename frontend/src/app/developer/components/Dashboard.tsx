@@ -24,6 +24,9 @@ interface DashboardData {
     system_stats: {
       avg_cpu: number;
       avg_memory: number;
+      avg_event_loop_lag_ms: number | null;
+      max_event_loop_lag_ms: number | null;
+      max_core_cpu: number | null;
       latest_metrics: any;
     };
   };
@@ -44,9 +47,27 @@ export default function Dashboard() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchDashboardData();
-    const interval = setInterval(fetchDashboardData, 5000); // Refresh every 5 seconds
-    return () => clearInterval(interval);
+    if (typeof EventSource === "undefined") {
+      fetchDashboardData();
+      const interval = setInterval(fetchDashboardData, 5000); // Refresh every 5 seconds
+      return () => clearInterval(interval);
+    }
+
+    // The stream sends a full snapshot, then only the sections that changed;
+    // EventSource reconnects on its own and each reconnect starts with a snapshot
+    const source = new EventSource(
+      `${api.defaults.baseURL}/api/log/dashboard-stream`
+    );
+    source.addEventListener("snapshot", (event) => {
+      setData(JSON.parse((event as MessageEvent).data).data);
+      setLoading(false);
+    });
+    source.addEventListener("delta", (event) => {
+      const { changes } = JSON.parse((event as MessageEvent).data);
+      setData((previous) => (previous ? { ...previous, ...changes } : previous));
+    });
+    source.onerror = () => setLoading(false);
+    return () => source.close();
   }, []);
 
   const fetchDashboardData = async () => {
@@ -183,6 +204,23 @@ export default function Dashboard() {
                 {system_stats.avg_memory.toFixed(1)}%
               </span>
             </div>
+            {system_stats.max_core_cpu != null && (
+              <div className={styles.healthItem}>
+                <span>Busiest Core</span>
+                <span className={styles.healthValue}>
+                  {system_stats.max_core_cpu.toFixed(1)}%
+                </span>
+              </div>
+            )}
+            {system_stats.avg_event_loop_lag_ms != null && (
+              <div className={styles.healthItem}>
+                <span>Event Loop Lag</span>
+                <span className={styles.healthValue}>
+                  {system_stats.avg_event_loop_lag_ms.toFixed(1)}ms
+                  {system_stats.max_event_loop_lag_ms != null && ` (max ${system_stats.max_event_loop_lag_ms.toFixed(0)}ms)`}
+                </span>
+              </div>
+            )}
           </div>
         </div>
 
@@ -11,7 +11,19 @@ const api = axios.create({
 });
 
 export const itemsApi = {
-  getAll: () => api.get<Item[]>("/api/v1/items"),
+  // The list endpoint is paginated; follow X-Next-Cursor until the last page
+  getAll: async () => {
+    const items: Item[] = [];
+    let cursor: string | undefined;
+    do {
+      const response = await api.get<Item[]>("/api/v1/items", {
+        params: { limit: 1000, cursor },
+      });
+      items.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+    return { data: items };
+  },
   get: (id: number) => api.get<Item>(`/api/v1/items/${id}`),
   create: (item: ItemCreate) => api.post<Item>("/api/v1/items", item),
   update: (id: number, item: Partial<ItemCreate>) =>